@@ -14,6 +14,29 @@ import subprocess
 import os
 import threading
 import sys
+import re
+import struct
+import mmap
+import hashlib
+import time
+import shutil
+import sqlite3
+import gzip
+import io
+import tarfile
+import zlib
+import platform
+import signal
+import argparse
+import asyncio
+import contextlib
+import errno
+import collections
+import difflib
+import concurrent.futures
+import http.client
+import http.server
+import urllib.parse
 from pathlib import Path
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -68,6 +91,5271 @@ STOP_TOKENS = {
     "Custom": []
 }
 
+# Dossier de travail partagé (registre, caches, historique...)
+APP_HOME = Path(os.environ.get("LORA_TO_OLLAMA_HOME", Path.home() / ".lora_to_ollama"))
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# FUSION DE PLUSIEURS LoRA
+# ═══════════════════════════════════════════════════════════════════════════════
+
+MERGE_MODES = {
+    "Concaténation des rangs": "concat",
+    "SVD (rang cible)": "svd"
+}
+
+# dtype safetensors -> (dtype numpy, taille en octets). BF16 est lu comme uint16.
+SAFETENSORS_DTYPES = {
+    "F64": ("float64", 8),
+    "F32": ("float32", 4),
+    "F16": ("float16", 2),
+    "BF16": ("uint16", 2)
+}
+
+
+def _print_log(message, level="info"):
+    """Logger par défaut hors interface graphique"""
+    sys.stdout.write(f"[{level}] {message}\n")
+    sys.stdout.flush()
+
+
+def _import_numpy():
+    """Importe numpy (dépendance optionnelle, requise pour la fusion)"""
+    try:
+        import numpy as np
+        return np
+    except ImportError:
+        raise Exception("numpy n'est pas installé. Installez-le avec: pip install numpy")
+
+
+def read_safetensors_header(path):
+    """Lit uniquement l'en-tête JSON d'un fichier .safetensors (sans numpy)"""
+    with open(path, 'rb') as f:
+        header_size = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_size))
+    header["__header_size__"] = header_size
+    return header
+
+
+class SafetensorsFile:
+    """Lecture paresseuse d'un fichier .safetensors via memmap (aucune copie complète en RAM)"""
+
+    def __init__(self, path):
+        np = _import_numpy()
+        self.path = path
+
+        header = read_safetensors_header(path)
+        header_size = header.pop("__header_size__")
+        self.metadata = header.pop("__metadata__", None) or {}
+        self.tensors = header
+        self._data_start = 8 + header_size
+        self._data = np.memmap(path, dtype=np.uint8, mode="r")
+
+    def keys(self):
+        return list(self.tensors.keys())
+
+    def shape(self, name):
+        return tuple(self.tensors[name]["shape"])
+
+    def dtype(self, name):
+        return self.tensors[name]["dtype"]
+
+    def get(self, name):
+        """Retourne le tenseur en float32 (seul ce tenseur est chargé en mémoire)"""
+        np = _import_numpy()
+        info = self.tensors[name]
+        if info["dtype"] not in SAFETENSORS_DTYPES:
+            raise Exception(f"dtype non supporté pour la fusion: {info['dtype']} ({name})")
+
+        start, end = info["data_offsets"]
+        raw = self._data[self._data_start + start:self._data_start + end]
+
+        if info["dtype"] == "BF16":
+            array = (raw.view(np.uint16).astype(np.uint32) << 16).view(np.float32)
+        else:
+            array = raw.view(SAFETENSORS_DTYPES[info["dtype"]][0]).astype(np.float32)
+        return array.reshape(info["shape"])
+
+
+def _to_safetensors_bytes(array, dtype):
+    """Convertit un tableau float32 vers les octets du dtype safetensors demandé"""
+    np = _import_numpy()
+    array = np.ascontiguousarray(array, dtype=np.float32)
+
+    if dtype == "BF16":
+        # Arrondi au plus proche (pair) avant troncature des 16 bits de poids faible
+        bits = array.view(np.uint32).astype(np.uint64)
+        bits = (bits + 0x7FFF + ((bits >> 16) & 1)) >> 16
+        return bits.astype("<u2").tobytes()
+
+    return array.astype("<" + np.dtype(SAFETENSORS_DTYPES[dtype][0]).str[1:]).tobytes()
+
+
+def write_safetensors(path, layout, chunks, metadata=None):
+    """
+    Écrit un fichier .safetensors en streaming.
+
+    layout : liste de (nom, dtype, shape) dans l'ordre d'écriture
+    chunks : itérable de (nom, tableau) produit dans le même ordre, un tenseur à la fois
+    """
+    header = {}
+    offset = 0
+    for name, dtype, shape in layout:
+        size = SAFETENSORS_DTYPES[dtype][1]
+        for dim in shape:
+            size *= dim
+        header[name] = {"dtype": dtype, "shape": list(shape), "data_offsets": [offset, offset + size]}
+        offset += size
+    if metadata:
+        header["__metadata__"] = metadata
+
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    header_bytes += b" " * (-len(header_bytes) % 8)
+
+    tmp_path = f"{path}.tmp"
+    expected = iter(layout)
+    with open(tmp_path, 'wb') as f:
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in chunks:
+            layout_name, dtype, shape = next(expected)
+            if name != layout_name or tuple(array.shape) != tuple(shape):
+                raise Exception(f"Tenseur inattendu lors de l'écriture: {name} {tuple(array.shape)}")
+            f.write(_to_safetensors_bytes(array, dtype))
+
+    os.replace(tmp_path, path)
+
+
+def _pattern_value(patterns, module_name, default):
+    """Résout rank_pattern / alpha_pattern de PEFT pour un module donné"""
+    for key, value in (patterns or {}).items():
+        if re.match(rf".*\.{key}$", module_name) or module_name == key:
+            return value
+    return default
+
+
+def _lora_pairs(keys):
+    """Associe chaque tenseur lora_A à son lora_B : {module: (clé_A, clé_B)}"""
+    pairs = {}
+    for key in keys:
+        for a_tag, b_tag in ((".lora_A.", ".lora_B."), (".lora_embedding_A", ".lora_embedding_B")):
+            if a_tag in key:
+                module = key.split(a_tag)[0]
+                pairs[module] = (key, key.replace(a_tag, b_tag))
+    return pairs
+
+
+def merge_lora_adapters(adapters, output_dir, mode="concat", target_rank=None, log=_print_log,
+                        check_cancelled=None, on_progress=None):
+    """
+    Fusionne plusieurs LoRA pondérés en un seul adaptateur PEFT.
+
+    adapters : liste de (adapter_model.safetensors, adapter_config.json, poids)
+    mode     : "concat" (rangs concaténés, fusion exacte) ou "svd" (re-factorisation au rang cible)
+
+    La fusion se fait module par module : seuls les tenseurs A/B d'un module sont en
+    mémoire à un instant donné, jamais la matrice delta complète (out x in).
+    check_cancelled est appelé avant chaque module (annulation, délai dépassé),
+    on_progress(modules fusionnés, total) après chacun.
+    Retourne le dossier contenant le LoRA fusionné.
+    """
+    np = _import_numpy()
+
+    if len(adapters) < 2:
+        raise Exception("La fusion nécessite au moins deux LoRA")
+    if mode not in MERGE_MODES.values():
+        raise Exception(f"Mode de fusion inconnu: {mode}")
+    if mode == "svd" and not target_rank:
+        raise Exception("Le mode SVD nécessite un rang cible")
+
+    files, configs, weights = [], [], []
+    for safetensors_path, config_path, weight in adapters:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            configs.append(json.load(f))
+        files.append(SafetensorsFile(safetensors_path))
+        weights.append(float(weight))
+
+    # Vérifier que tous les LoRA ciblent les mêmes modules
+    reference_keys = set(files[0].keys())
+    for st_file in files[1:]:
+        if set(st_file.keys()) != reference_keys:
+            missing = sorted(reference_keys.symmetric_difference(st_file.keys()))[:5]
+            raise Exception(f"Les LoRA n'ont pas les mêmes cibles ({st_file.path}): {missing}...")
+
+    base_models = {c.get("base_model_name_or_path") for c in configs}
+    if len(base_models) > 1:
+        log(f"Modèles de base différents entre les LoRA: {sorted(map(str, base_models))}", "warning")
+
+    pairs = _lora_pairs(reference_keys)
+    paired_keys = {k for pair in pairs.values() for k in pair}
+    passthrough = sorted(reference_keys - paired_keys)
+    if passthrough:
+        log(f"{len(passthrough)} tenseur(s) non-LoRA copiés depuis le premier adaptateur", "warning")
+
+    def module_scale(config, module, rank):
+        alpha = _pattern_value(config.get("alpha_pattern"), module, config.get("lora_alpha", rank))
+        if config.get("use_rslora"):
+            return alpha / (rank ** 0.5)
+        return alpha / rank
+
+    # Rangs de sortie par module (connus avant calcul pour écrire l'en-tête en premier)
+    modules = sorted(pairs)
+    out_ranks = {}
+    for module in modules:
+        a_key, b_key = pairs[module]
+        total_rank = sum(f.shape(a_key)[0] for f in files)
+        for st_file in files[1:]:
+            if st_file.shape(a_key)[1:] != files[0].shape(a_key)[1:] or st_file.shape(b_key)[0] != files[0].shape(b_key)[0]:
+                raise Exception(f"Dimensions incompatibles pour le module {module}")
+        if mode == "svd":
+            in_dim, out_dim = files[0].shape(a_key)[1], files[0].shape(b_key)[0]
+            out_ranks[module] = min(int(target_rank), total_rank, in_dim, out_dim)
+        else:
+            out_ranks[module] = total_rank
+
+    out_alpha = max(out_ranks.values()) if out_ranks else 1
+    out_dtype = files[0].dtype(pairs[modules[0]][0]) if modules else "F32"
+    if out_dtype not in SAFETENSORS_DTYPES:
+        out_dtype = "F32"
+
+    layout = []
+    for module in modules:
+        a_key, b_key = pairs[module]
+        rank = out_ranks[module]
+        layout.append((a_key, out_dtype, (rank,) + files[0].shape(a_key)[1:]))
+        layout.append((b_key, out_dtype, (files[0].shape(b_key)[0], rank)))
+    for key in passthrough:
+        # Refusé avant toute écriture plutôt qu'au moment de la copie
+        if files[0].dtype(key) not in SAFETENSORS_DTYPES:
+            raise Exception(f"dtype non supporté pour la fusion: {files[0].dtype(key)} ({key})")
+        layout.append((key, files[0].dtype(key), files[0].shape(key)))
+
+    energies = []
+
+    def produce():
+        for index, module in enumerate(modules, 1):
+            if check_cancelled:
+                check_cancelled()
+            a_key, b_key = pairs[module]
+            a_parts, b_parts = [], []
+            for st_file, config, weight in zip(files, configs, weights):
+                lora_a = st_file.get(a_key)
+                lora_b = st_file.get(b_key)
+                rank = lora_a.shape[0]
+                a_parts.append(lora_a.reshape(rank, -1))
+                b_parts.append(lora_b * (weight * module_scale(config, module, rank)))
+
+            a_cat = np.concatenate(a_parts, axis=0)
+            b_cat = np.concatenate(b_parts, axis=1)
+            rank = out_ranks[module]
+
+            if mode == "svd":
+                # delta = B @ A = Qb Rb Ra^T Qa^T : SVD du petit noyau Rb Ra^T uniquement
+                q_b, r_b = np.linalg.qr(b_cat)
+                q_a, r_a = np.linalg.qr(a_cat.T)
+                u, s, vt = np.linalg.svd(r_b @ r_a.T, full_matrices=False)
+                energies.append(float((s[:rank] ** 2).sum() / max((s ** 2).sum(), 1e-30)))
+                root = np.sqrt(s[:rank])
+                b_new = (q_b @ u[:, :rank]) * root
+                a_new = (root[:, None] * vt[:rank]) @ q_a.T
+            else:
+                a_new, b_new = a_cat, b_cat
+
+            # L'échelle appliquée à l'inférence vaut out_alpha / rang : on la compense dans B
+            b_new = b_new * (rank / out_alpha)
+            yield a_key, a_new.reshape((rank,) + files[0].shape(a_key)[1:])
+            yield b_key, b_new
+            if on_progress:
+                on_progress(index, len(modules))
+
+        for key in passthrough:
+            yield key, files[0].get(key)
+
+    os.makedirs(output_dir, exist_ok=True)
+    write_safetensors(
+        os.path.join(output_dir, "adapter_model.safetensors"),
+        layout,
+        produce(),
+        metadata={"format": "pt"}
+    )
+
+    merged_config = dict(configs[0])
+    merged_config["r"] = out_alpha
+    merged_config["lora_alpha"] = out_alpha
+    merged_config["use_rslora"] = False
+    merged_config["alpha_pattern"] = {}
+    merged_config["rank_pattern"] = {
+        module.replace("base_model.model.", "", 1): rank
+        for module, rank in out_ranks.items() if rank != out_alpha
+    }
+    with open(os.path.join(output_dir, "adapter_config.json"), 'w', encoding='utf-8') as f:
+        json.dump(merged_config, f, indent=2, ensure_ascii=False)
+
+    if energies:
+        log(f"SVD: énergie conservée min {min(energies):.2%}, moyenne {sum(energies) / len(energies):.2%}", "info")
+    log(f"{len(adapters)} LoRA fusionnés ({mode}, {len(modules)} modules, rang max {out_alpha})", "success")
+    return output_dir
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# REGISTRE DES MODÈLES DE BASE OLLAMA
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def fingerprint_path(path):
+    """
+    Empreinte rapide d'un fichier ou dossier de poids (chemins relatifs, tailles, dates).
+    Évite de hacher des dizaines de Go à chaque exécution.
+    """
+    digest = hashlib.sha256()
+    path = Path(path)
+    files = [path] if path.is_file() else sorted(
+        p for p in path.rglob("*") if p.is_file() and ".cache" not in p.parts
+    )
+    for file in files:
+        stat = file.stat()
+        relative = file.name if path.is_file() else file.relative_to(path).as_posix()
+        digest.update(f"{relative}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class BaseModelRegistry:
+    """
+    Associe un modèle de base (repo HF ou chemin local + empreinte) à un tag Ollama déjà créé,
+    pour que les Modelfiles suivants utilisent `FROM <tag>` au lieu de ré-importer les poids.
+    """
+
+    # Commun à toutes les instances : chaque job crée la sienne sur le même fichier
+    _lock = threading.Lock()
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else APP_HOME / "base_models.json"
+
+    def _load(self):
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return {}
+
+    def _save(self, entries):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{self.path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def make_key(identity, digest):
+        return f"{identity}@{digest}"
+
+    def lookup(self, identity, digest):
+        with self._lock:
+            return self._load().get(self.make_key(identity, digest))
+
+    def register(self, identity, digest, tag, source_path):
+        with self._lock:
+            entries = self._load()
+            entries[self.make_key(identity, digest)] = {
+                "tag": tag,
+                "source": str(source_path),
+                "created_at": time.strftime("%Y-%m-%d %H:%M:%S")
+            }
+            self._save(entries)
+
+    def forget(self, identity, digest):
+        with self._lock:
+            entries = self._load()
+            if entries.pop(self.make_key(identity, digest), None) is not None:
+                self._save(entries)
+
+
+def base_tag_name(identity, digest):
+    """Construit un nom de tag Ollama valide pour un modèle de base"""
+    slug = re.sub(r"[^a-z0-9._-]+", "-", Path(identity).name.lower()).strip("-.") or "model"
+    return f"base-{slug}:{digest[:12]}"
+
+
+def ensure_base_model_tag(base_model_path, identity, client=None, registry=None, log=_print_log):
+    """
+    Retourne le tag Ollama du modèle de base, en l'important une seule fois si nécessaire.
+    """
+    client = client or OllamaClient()
+    registry = registry or BaseModelRegistry()
+    digest = fingerprint_path(base_model_path)
+
+    entry = registry.lookup(identity, digest)
+    if entry and client.model_exists(entry["tag"]):
+        log(f"Modèle de base déjà enregistré dans Ollama: {entry['tag']}", "success")
+        return entry["tag"]
+    if entry:
+        log(f"Tag {entry['tag']} absent d'Ollama, ré-import du modèle de base", "warning")
+        registry.forget(identity, digest)
+
+    tag = base_tag_name(identity, digest)
+    modelfiles_dir = APP_HOME / "modelfiles"
+    modelfiles_dir.mkdir(parents=True, exist_ok=True)
+    modelfile_path = modelfiles_dir / f"{tag.replace(':', '_')}.Modelfile"
+    with open(modelfile_path, 'w', encoding='utf-8') as f:
+        f.write(f"FROM {os.path.abspath(base_model_path)}\n")
+
+    log(f"Import unique du modèle de base dans Ollama: {tag}", "info")
+    try:
+        create_model_from_modelfile(client, tag, str(modelfile_path), log=log)
+    except Exception as e:
+        raise Exception(f"Erreur lors de l'import du modèle de base: {str(e)}")
+
+    registry.register(identity, digest, tag, base_model_path)
+    log(f"Modèle de base enregistré: {tag}", "success")
+    return tag
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MATÉRIALISATION DES MODÈLES (STORE PARTAGÉ, SANS COPIE)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Ordre de préférence : reflink (copy-on-write), hardlink, symlink, puis copie physique
+MATERIALIZE_STRATEGIES = ["reflink", "hardlink", "symlink", "copy"]
+
+FICLONE = 0x40049409  # ioctl Linux (btrfs, XFS, bcachefs...)
+
+
+def _reflink(src, dst):
+    """Clone copy-on-write du fichier (aucun bloc dupliqué sur disque)"""
+    if sys.platform == "darwin":
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            raise OSError(ctypes.get_errno(), "clonefile")
+        return
+    if os.name == "nt":
+        # Pas de fcntl sous Windows (le clonage ReFS n'est pas pris en charge ici)
+        raise OSError(errno.EOPNOTSUPP, "reflink non disponible sous Windows")
+
+    import fcntl
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.remove(dst)
+            raise
+
+
+def materialize_file(src, dst, strategies=None):
+    """
+    Rend `src` disponible en `dst` avec la stratégie la moins coûteuse disponible.
+    Retourne la stratégie utilisée.
+    """
+    src = os.path.realpath(src)
+    tmp_dst = f"{dst}.tmp-{os.getpid()}"
+    if os.path.lexists(tmp_dst):
+        os.remove(tmp_dst)
+
+    for strategy in strategies or MATERIALIZE_STRATEGIES:
+        try:
+            if strategy == "reflink":
+                _reflink(src, tmp_dst)
+            elif strategy == "hardlink":
+                os.link(src, tmp_dst)
+            elif strategy == "symlink":
+                os.symlink(src, tmp_dst)
+            else:
+                shutil.copy2(src, tmp_dst)
+        except (OSError, AttributeError):
+            continue
+        os.replace(tmp_dst, dst)
+        return strategy
+
+    raise Exception(f"Impossible de matérialiser {src} vers {dst}")
+
+
+def materialize_tree(src_dir, dst_dir, log=_print_log):
+    """
+    Matérialise un dossier (ex: snapshot du cache HuggingFace) dans le store partagé.
+    Les fichiers déjà présents avec la bonne taille sont réutilisés tels quels.
+    Retourne un dict de statistiques (octets, octets copiés, durée, stratégies).
+    """
+    start = time.time()
+    stats = {"files": 0, "bytes": 0, "copied_bytes": 0, "reused": 0, "strategies": {}}
+
+    for root, _, filenames in os.walk(src_dir):
+        if ".cache" in Path(root).relative_to(src_dir).parts:
+            continue
+        for filename in filenames:
+            src = os.path.join(root, filename)
+            dst = os.path.join(dst_dir, os.path.relpath(src, src_dir))
+            size = os.path.getsize(src)
+            stats["files"] += 1
+            stats["bytes"] += size
+
+            if os.path.exists(dst) and os.path.getsize(dst) == size:
+                stats["reused"] += 1
+                continue
+
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            strategy = materialize_file(src, dst)
+            stats["strategies"][strategy] = stats["strategies"].get(strategy, 0) + 1
+            if strategy == "copy":
+                stats["copied_bytes"] += size
+
+    stats["duration"] = time.time() - start
+    strategies = ", ".join(f"{name}: {count}" for name, count in stats["strategies"].items()) or "aucune"
+    log(
+        f"Matérialisation: {stats['files']} fichiers, {stats['bytes'] / 1e9:.2f} Go "
+        f"({stats['reused']} déjà présents, {strategies}), "
+        f"{stats['copied_bytes'] / 1e9:.2f} Go copiés en {stats['duration']:.1f} s",
+        "info"
+    )
+    return stats
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# RÉSOLUTION HORS LIGNE DES MODÈLES HUGGINGFACE (RÉVISIONS ÉPINGLÉES)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+HF_COMMIT_RE = re.compile(r"^[0-9a-f]{40}$")
+HF_ETAG_RE = re.compile(r"^(?:[0-9a-f]{40}|[0-9a-f]{64})$")
+
+
+def hf_hub_cache():
+    """Dossier du cache HuggingFace Hub (mêmes variables d'environnement que huggingface_hub)"""
+    cache = os.environ.get("HF_HUB_CACHE") or os.environ.get("HUGGINGFACE_HUB_CACHE")
+    if cache:
+        return cache
+    hf_home = os.environ.get("HF_HOME", os.path.join(Path.home(), ".cache", "huggingface"))
+    return os.path.join(hf_home, "hub")
+
+
+def hf_repo_cache_dir(repo_id):
+    return os.path.join(hf_hub_cache(), f"models--{repo_id.replace('/', '--')}")
+
+
+def hf_local_commit(repo_id, revision=None):
+    """Commit correspondant à une révision d'après le cache local (hash direct ou refs/<branche>)"""
+    revision = revision or "main"
+    if HF_COMMIT_RE.match(revision):
+        return revision
+    try:
+        with open(os.path.join(hf_repo_cache_dir(repo_id), "refs", revision), 'r', encoding='utf-8') as f:
+            commit = f.read().strip()
+    except OSError:
+        return None
+    return commit if HF_COMMIT_RE.match(commit) else None
+
+
+def git_blob_sha1(path, chunk_size=1024 * 1024):
+    """Identifiant git d'un fichier (sha1 de 'blob <taille>\\0' + contenu), utilisé par HF hors LFS"""
+    sha = hashlib.sha1()
+    sha.update(f"blob {os.path.getsize(path)}\0".encode("ascii"))
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def manifest_from_model_info(info):
+    """Liste attendue des fichiers d'une révision (taille + sha256 LFS ou sha1 git) depuis HfApi.model_info"""
+    files = {}
+    for sibling in info.siblings:
+        lfs = sibling.lfs
+        if lfs:
+            sha256 = lfs["sha256"] if isinstance(lfs, dict) else lfs.sha256
+            size = lfs["size"] if isinstance(lfs, dict) else lfs.size
+            files[sibling.rfilename] = {"size": size, "sha256": sha256}
+        else:
+            files[sibling.rfilename] = {"size": sibling.size, "sha1": sibling.blob_id}
+    return files
+
+
+def manifest_from_snapshot(snapshot_dir):
+    """
+    Manifeste reconstruit depuis le cache HF : chaque fichier du snapshot pointe vers un blob
+    nommé d'après son empreinte (sha256 pour LFS, sha1 git sinon). La complétude n'est pas garantie.
+    """
+    files = {}
+    for path in Path(snapshot_dir).rglob("*"):
+        if not path.is_file():
+            continue
+        etag = os.path.basename(os.path.realpath(path))
+        if not HF_ETAG_RE.match(etag):
+            continue
+        algorithm = "sha256" if len(etag) == 64 else "sha1"
+        files[path.relative_to(snapshot_dir).as_posix()] = {"size": path.stat().st_size, algorithm: etag}
+    return files
+
+
+class ResolutionCache:
+    """
+    Résolutions vérifiées des modèles HuggingFace (repo@commit) : manifeste des fichiers attendus
+    et fichiers déjà vérifiés (taille, date), pour les exécutions suivantes sans réseau ni re-hachage.
+    """
+
+    # Commun à toutes les instances : chaque job crée la sienne sur le même fichier
+    _lock = threading.Lock()
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else APP_HOME / "resolutions.json"
+
+    def _load(self):
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return {}
+
+    def _save(self, entries):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{self.path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def lookup(self, repo_id, commit):
+        with self._lock:
+            return self._load().get(f"{repo_id}@{commit}")
+
+    def record(self, repo_id, commit, files, verified, complete):
+        with self._lock:
+            entries = self._load()
+            entries[f"{repo_id}@{commit}"] = {
+                "files": files,
+                "verified": verified,
+                "complete": complete,
+                "resolved_at": time.strftime("%Y-%m-%d %H:%M:%S")
+            }
+            self._save(entries)
+
+
+def verify_hf_snapshot(snapshot_dir, files, verified=None, digests=None, log=_print_log):
+    """
+    Vérifie qu'un snapshot contient tous les fichiers attendus avec les bonnes empreintes.
+    Les fichiers déjà vérifiés et inchangés (taille, date) ne sont pas re-hachés.
+    Retourne (liste des problèmes, fichiers vérifiés {chemin: [taille, mtime_ns]}).
+    """
+    digests = digests or DigestCache()
+    verified = dict(verified or {})
+    problems = []
+
+    for name, expected in sorted(files.items()):
+        path = os.path.join(snapshot_dir, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            problems.append(f"{name}: absent")
+            verified.pop(name, None)
+            continue
+        if expected.get("size") is not None and stat.st_size != expected["size"]:
+            problems.append(f"{name}: taille {stat.st_size} au lieu de {expected['size']}")
+            verified.pop(name, None)
+            continue
+        if verified.get(name) == [stat.st_size, stat.st_mtime_ns]:
+            continue
+
+        if expected.get("sha256"):
+            ok = digests.digest(path) == f"sha256:{expected['sha256']}"
+        elif expected.get("sha1"):
+            ok = git_blob_sha1(path) == expected["sha1"]
+        else:
+            ok = True
+        if ok:
+            verified[name] = [stat.st_size, stat.st_mtime_ns]
+        else:
+            problems.append(f"{name}: empreinte invalide")
+            verified.pop(name, None)
+
+    return problems, verified
+
+
+def resolve_local_snapshot(repo_id, commit, offline=False, cache=None, log=_print_log):
+    """
+    Retourne le snapshot local de repo@commit s'il est complet et vérifié, sans aucun accès réseau.
+    Sans manifeste enregistré, seul le mode hors ligne accepte un snapshot (complétude non garantie).
+    """
+    cache = cache or ResolutionCache()
+    snapshot_dir = os.path.join(hf_repo_cache_dir(repo_id), "snapshots", commit)
+    if not os.path.isdir(snapshot_dir):
+        return None
+
+    entry = cache.lookup(repo_id, commit)
+    if entry and entry.get("complete"):
+        files, complete = entry["files"], True
+    elif offline:
+        log("Aucun manifeste enregistré pour cette révision : complétude non vérifiable hors ligne", "warning")
+        files, complete = manifest_from_snapshot(snapshot_dir), False
+    else:
+        return None
+
+    start = time.time()
+    problems, verified = verify_hf_snapshot(snapshot_dir, files, entry.get("verified") if entry else None, log=log)
+    if problems:
+        log(f"Snapshot local incomplet ou corrompu ({len(problems)} problème(s)), ex: {problems[0]}", "warning")
+        return None
+
+    cache.record(repo_id, commit, files, verified, complete)
+    log(f"Révision {commit[:12]} résolue localement ({len(files)} fichiers vérifiés en "
+        f"{time.time() - start:.1f} s, sans réseau)", "success")
+    return snapshot_dir
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CLIENT API OLLAMA
+# ═══════════════════════════════════════════════════════════════════════════════
+
+DEFAULT_OLLAMA_HOST = "http://127.0.0.1:11434"
+
+# Fichiers d'un dossier de poids envoyés à Ollama (mêmes motifs que la CLI)
+MODEL_FILE_PATTERNS = [
+    "*.safetensors", "*.gguf", "*.tiktoken", "config.json", "generation_config.json",
+    "tokenizer.json", "tokenizer_config.json", "tokenizer.model",
+    "special_tokens_map.json", "added_tokens.json"
+]
+
+
+def normalize_ollama_host(host=None):
+    """Normalise une adresse Ollama (OLLAMA_HOST, 'host:port', URL...) en URL complète"""
+    host = (host or os.environ.get("OLLAMA_HOST") or DEFAULT_OLLAMA_HOST).strip().rstrip("/")
+    if "://" not in host:
+        host = f"http://{host}"
+    parsed = urllib.parse.urlsplit(host)
+    hostname = parsed.hostname or "127.0.0.1"
+    if hostname == "0.0.0.0":
+        hostname = "127.0.0.1"
+    port = parsed.port or (443 if parsed.scheme == "https" else 11434)
+    return f"{parsed.scheme}://{hostname}:{port}"
+
+
+class OllamaClient:
+    """Client minimal de l'API HTTP Ollama (bibliothèque standard uniquement)"""
+
+    def __init__(self, host=None, timeout=600):
+        self.host = normalize_ollama_host(host)
+        parsed = urllib.parse.urlsplit(self.host)
+        self._scheme = parsed.scheme
+        self._hostname = parsed.hostname
+        self._port = parsed.port
+        self.timeout = timeout
+
+    def _connection(self):
+        if self._scheme == "https":
+            return http.client.HTTPSConnection(self._hostname, self._port, timeout=self.timeout)
+        return http.client.HTTPConnection(self._hostname, self._port, timeout=self.timeout)
+
+    def request(self, method, path, payload=None):
+        """Requête simple : retourne (status, corps décodé en JSON si possible)"""
+        conn = self._connection()
+        try:
+            body = json.dumps(payload).encode("utf-8") if payload is not None else None
+            headers = {"Content-Type": "application/json"} if body is not None else {}
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+        except OSError as e:
+            raise Exception(f"Serveur Ollama injoignable ({self.host}): {e}")
+        finally:
+            conn.close()
+
+        try:
+            return response.status, json.loads(data) if data else {}
+        except json.JSONDecodeError:
+            return response.status, {"raw": data.decode("utf-8", "replace")}
+
+    def stream(self, path, payload, on_event=None):
+        """POST en streaming NDJSON : appelle on_event pour chaque objet, retourne le dernier"""
+        conn = self._connection()
+        last_event = {}
+        try:
+            conn.request("POST", path, body=json.dumps(payload).encode("utf-8"),
+                         headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            if response.status >= 400:
+                data = response.read().decode("utf-8", "replace")
+                raise Exception(f"Erreur API Ollama {path} ({response.status}): {data.strip()}")
+
+            for line in response:
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if "error" in event:
+                    raise Exception(f"Erreur API Ollama {path}: {event['error']}")
+                last_event = event
+                if on_event:
+                    on_event(event)
+        except OSError as e:
+            raise Exception(f"Serveur Ollama injoignable ({self.host}): {e}")
+        finally:
+            conn.close()
+        return last_event
+
+    def version(self):
+        status, data = self.request("GET", "/api/version")
+        return data.get("version") if status == 200 else None
+
+    def model_exists(self, model):
+        status, _ = self.request("POST", "/api/show", {"model": model})
+        return status == 200
+
+    def list_models(self):
+        status, data = self.request("GET", "/api/tags")
+        return data.get("models", []) if status == 200 else []
+
+    def has_blob(self, digest):
+        status, _ = self.request("HEAD", f"/api/blobs/{digest}")
+        return status == 200
+
+    def push_blob(self, path, digest, on_progress=None, chunk_size=1024 * 1024):
+        """Envoie un fichier comme blob Ollama en streaming (pas de chargement complet en RAM)"""
+        with open(path, 'rb') as f:
+            self.push_blob_stream(f, os.path.getsize(path), digest, on_progress, chunk_size)
+
+    def push_blob_stream(self, stream, size, digest, on_progress=None, chunk_size=1024 * 1024):
+        """Envoie `size` octets lus dans `stream` comme blob (ex: membre d'une archive, sans l'extraire)"""
+        conn = self._connection()
+        try:
+            conn.putrequest("POST", f"/api/blobs/{digest}")
+            conn.putheader("Content-Length", str(size))
+            conn.putheader("Content-Type", "application/octet-stream")
+            conn.endheaders()
+            sent = 0
+            while sent < size:
+                chunk = stream.read(min(chunk_size, size - sent))
+                if not chunk:
+                    raise Exception(f"Flux interrompu après {sent} octets sur {size} ({digest})")
+                conn.send(chunk)
+                sent += len(chunk)
+                if on_progress:
+                    on_progress(len(chunk))
+            response = conn.getresponse()
+            data = response.read().decode("utf-8", "replace")
+        except OSError as e:
+            raise Exception(f"Serveur Ollama injoignable ({self.host}): {e}")
+        finally:
+            conn.close()
+
+        if response.status not in (200, 201):
+            raise Exception(f"Erreur lors de l'envoi du blob {digest} ({response.status}): {data.strip()}")
+
+    def create(self, payload, on_event=None):
+        return self.stream("/api/create", dict(payload, stream=True), on_event)
+
+
+class DigestCache:
+    """Cache des empreintes sha256 des fichiers (clé : chemin réel, taille, date de modification)"""
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else APP_HOME / "digests.json"
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def digest(self, path, on_progress=None, chunk_size=8 * 1024 * 1024):
+        """Retourne 'sha256:<hex>' du fichier, recalculé uniquement s'il a changé"""
+        real_path = os.path.realpath(path)
+        stat = os.stat(real_path)
+        key = f"{real_path}|{stat.st_size}|{stat.st_mtime_ns}"
+
+        with self._lock:
+            cached = self._load().get(key)
+        if cached:
+            if on_progress:
+                on_progress(stat.st_size)
+            return cached
+
+        sha = hashlib.sha256()
+        with open(real_path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                sha.update(chunk)
+                if on_progress:
+                    on_progress(len(chunk))
+        digest = f"sha256:{sha.hexdigest()}"
+
+        with self._lock:
+            entries = self._load()
+            entries[key] = digest
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = f"{self.path}.tmp-{os.getpid()}-{threading.get_ident()}"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        return digest
+
+
+def parse_modelfile(text):
+    """
+    Analyse un Modelfile (sous-ensemble généré par l'application) :
+    FROM, ADAPTER, SYSTEM, TEMPLATE, PARAMETER.
+    """
+    spec = {"from": None, "adapters": [], "system": None, "template": None, "parameters": {}}
+    lines = text.splitlines()
+    index = 0
+
+    while index < len(lines):
+        line = lines[index].strip()
+        index += 1
+        if not line or line.startswith("#"):
+            continue
+
+        command, _, value = line.partition(" ")
+        command = command.upper()
+        value = value.strip()
+
+        # Valeurs multi-lignes entre triples guillemets
+        if value.startswith('"""'):
+            value = value[3:]
+            if value.endswith('"""') and len(value) >= 3:
+                value = value[:-3]
+            else:
+                block = [value] if value else []
+                while index < len(lines) and not lines[index].rstrip().endswith('"""'):
+                    block.append(lines[index])
+                    index += 1
+                if index < len(lines):
+                    last = lines[index].rstrip()[:-3]
+                    if last:
+                        block.append(last)
+                    index += 1
+                value = "\n".join(block)
+
+        if command == "FROM":
+            spec["from"] = value
+        elif command == "ADAPTER":
+            spec["adapters"].append(value)
+        elif command == "SYSTEM":
+            spec["system"] = value
+        elif command == "TEMPLATE":
+            spec["template"] = value
+        elif command == "PARAMETER":
+            name, _, param = value.partition(" ")
+            param = param.strip()
+            if len(param) >= 2 and param[0] == param[-1] == '"':
+                param = param[1:-1]
+            spec["parameters"].setdefault(name, []).append(param)
+
+    return spec
+
+
+def _parameter_value(name, values):
+    """Convertit les valeurs PARAMETER du Modelfile vers les types attendus par l'API"""
+    def convert(value):
+        for cast in (int, float):
+            try:
+                return cast(value)
+            except ValueError:
+                pass
+        return value
+
+    if name == "stop":
+        return list(values)
+    return convert(values[-1])
+
+
+def model_files(path):
+    """Liste les fichiers de poids à envoyer pour un FROM local (fichier GGUF ou dossier)"""
+    path = Path(path)
+    if path.is_file():
+        return [(path.name, path)]
+    files = []
+    for pattern in MODEL_FILE_PATTERNS:
+        for file in sorted(path.glob(pattern)):
+            if file.is_file() and (file.name, file) not in files:
+                files.append((file.name, file))
+    if not files:
+        raise Exception(f"Aucun fichier de modèle reconnu dans: {path}")
+    return files
+
+
+def model_file_digests(path, digests=None):
+    """Empreintes des fichiers de poids d'un FROM local : ({nom: digest}, [(chemin, digest)])"""
+    digests = digests or DigestCache()
+    files, uploads = {}, []
+    for name, file in model_files(path):
+        files[name] = digests.digest(file)
+        uploads.append((file, files[name]))
+    return files, uploads
+
+
+def prepare_create_request(model_name, modelfile_path, digests=None):
+    """
+    Traduit un Modelfile en requête /api/create sans rien envoyer :
+    retourne (payload, [(chemin, digest)] des blobs référencés).
+    """
+    digests = digests or DigestCache()
+    with open(modelfile_path, 'r', encoding='utf-8') as f:
+        modelfile = parse_modelfile(f.read())
+
+    base_dir = os.path.dirname(os.path.abspath(modelfile_path))
+
+    def local_path(value):
+        candidate = value if os.path.isabs(value) else os.path.join(base_dir, value)
+        return candidate if os.path.exists(candidate) else None
+
+    payload = {"model": model_name}
+    uploads = []
+
+    base_path = local_path(modelfile["from"]) if modelfile["from"] else None
+    if base_path:
+        payload["files"], uploads = model_file_digests(base_path, digests)
+    elif modelfile["from"]:
+        payload["from"] = modelfile["from"]
+    else:
+        raise Exception(f"Instruction FROM manquante dans {modelfile_path}")
+
+    if modelfile["adapters"]:
+        payload["adapters"] = {}
+        for adapter in modelfile["adapters"]:
+            adapter_path = local_path(adapter)
+            if not adapter_path:
+                raise Exception(f"Adaptateur introuvable: {adapter}")
+            digest = digests.digest(adapter_path)
+            payload["adapters"][os.path.basename(adapter_path)] = digest
+            uploads.append((adapter_path, digest))
+
+    for key in ("system", "template"):
+        if modelfile[key]:
+            payload[key] = modelfile[key]
+    if modelfile["parameters"]:
+        payload["parameters"] = {
+            name: _parameter_value(name, values) for name, values in modelfile["parameters"].items()
+        }
+
+    return payload, uploads
+
+
+def build_create_request(client, model_name, modelfile_path, digests=None, on_upload=None, log=_print_log):
+    """
+    Prépare la requête /api/create à partir d'un Modelfile : calcule les empreintes,
+    envoie les blobs manquants et retourne (payload, octets envoyés).
+    """
+    payload, uploads = prepare_create_request(model_name, modelfile_path, digests)
+
+    missing = [(path, digest) for path, digest in uploads if not client.has_blob(digest)]
+    total_bytes = sum(os.path.getsize(path) for path, _ in missing)
+    for path, digest in missing:
+        log(f"Envoi du blob {os.path.basename(path)} ({os.path.getsize(path) / 1e6:.1f} Mo)", "info")
+        client.push_blob(
+            path, digest,
+            on_progress=(lambda amount: on_upload(amount, total_bytes)) if on_upload else None
+        )
+
+    return payload, total_bytes
+
+
+def create_model_from_modelfile(client, model_name, modelfile_path, progress=None, stage="create", log=_print_log,
+                                check_cancelled=None):
+    """Crée un modèle via l'API Ollama en remontant la progression (octets envoyés puis 'completed/total')"""
+    uploaded = [0]
+
+    def on_upload(amount, total):
+        if check_cancelled:
+            check_cancelled()
+        uploaded[0] += amount
+        if progress:
+            progress.update(stage, uploaded[0], total)
+
+    def on_event(event):
+        if check_cancelled:
+            check_cancelled()
+        if progress and event.get("total"):
+            progress.update(stage, event.get("completed", 0), event["total"])
+        status = event.get("status")
+        if status and status != "success" and not event.get("total"):
+            log(f"ollama: {status}", "info")
+
+    payload, _ = build_create_request(client, model_name, modelfile_path, on_upload=on_upload, log=log)
+    return client.create(payload, on_event)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# DÉPLOIEMENT SUR PLUSIEURS HÔTES OLLAMA
+# ═══════════════════════════════════════════════════════════════════════════════
+
+DEPLOY_MAX_CONNECTIONS = 2    # envois de blobs simultanés par hôte
+DEPLOY_RETRIES = 3            # tentatives par requête avant d'abandonner un hôte
+
+
+def parse_host_list(value):
+    """Liste d'hôtes Ollama depuis une liste ou une chaîne séparée par des virgules/espaces"""
+    if isinstance(value, str):
+        value = [value]
+    return [host for item in value or [] for host in re.split(r"[,\s]+", item) if host]
+
+
+def with_retries(fn, what, retries=DEPLOY_RETRIES, log=_print_log, delay=1.0, check_cancelled=None):
+    """Exécute fn avec nouvelles tentatives (attente exponentielle) sur erreur"""
+    for attempt in range(1, retries + 1):
+        if check_cancelled:
+            check_cancelled()
+        try:
+            return fn()
+        except (JobCancelled, StageTimeout):
+            raise
+        except Exception as e:
+            if attempt == retries:
+                raise
+            log(f"{what}: échec ({e}), nouvelle tentative {attempt + 1}/{retries}", "warning")
+            time.sleep(delay * 2 ** (attempt - 1))
+
+
+def deploy_to_host(host, payload, uploads, base_fallback=None, max_connections=DEPLOY_MAX_CONNECTIONS,
+                   retries=DEPLOY_RETRIES, on_upload=None, log=_print_log, check_cancelled=None, timeout=600):
+    """
+    Déploie un modèle sur un hôte : envoie les blobs absents (connexions bornées),
+    crée le modèle puis vérifie sa présence. Retourne le rapport de l'hôte ;
+    l'annulation (et le délai de l'étape) interrompt le déploiement au lieu d'être rapportée.
+    """
+    client = OllamaClient(host, timeout=timeout)
+    report = {"host": client.host, "status": "failed", "pushed_blobs": 0, "skipped_blobs": 0,
+              "uploaded_bytes": 0, "upload_time": 0.0, "create_time": 0.0, "error": None}
+    start = time.time()
+
+    def host_log(message, level="info"):
+        log(f"[{client.host}] {message}", level)
+
+    try:
+        with_retries(client.version, f"{client.host} /api/version", retries, host_log,
+                     check_cancelled=check_cancelled)
+
+        payload = dict(payload)
+        uploads = list(uploads)
+        # FROM <tag> : le modèle de base n'existe pas forcément sur cet hôte, on envoie alors ses fichiers
+        if payload.get("from") and not client.model_exists(payload["from"]):
+            if not base_fallback:
+                raise Exception(f"Modèle de base '{payload['from']}' absent et aucun fichier local à envoyer")
+            host_log(f"Modèle de base '{payload.pop('from')}' absent, envoi des fichiers", "info")
+            payload["files"], base_uploads = base_fallback()
+            uploads = base_uploads + uploads
+
+        # Un même blob peut être référencé deux fois (ex: fichiers identiques)
+        uploads = list({digest: (path, digest) for path, digest in uploads}.values())
+        missing = [(path, digest) for path, digest in uploads if not client.has_blob(digest)]
+        report["skipped_blobs"] = len(uploads) - len(missing)
+
+        upload_start = time.time()
+
+        def push(item):
+            path, digest = item
+            size = os.path.getsize(path)
+            sent = [0]
+
+            def on_progress(amount):
+                sent[0] += amount
+                if on_upload:
+                    on_upload(amount)
+
+            def attempt():
+                # Une tentative interrompue repart de zéro : on retire ce qui avait été compté
+                if sent[0] and on_upload:
+                    on_upload(-sent[0])
+                sent[0] = 0
+                client.push_blob(path, digest, on_progress=on_progress)
+
+            host_log(f"Envoi du blob {os.path.basename(path)} ({size / 1e6:.1f} Mo)", "info")
+            with_retries(attempt, f"{client.host} blob {digest[:19]}", retries, host_log,
+                         check_cancelled=check_cancelled)
+            return size
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_connections)) as pool:
+            for size in pool.map(push, missing):
+                report["pushed_blobs"] += 1
+                report["uploaded_bytes"] += size
+        report["upload_time"] = time.time() - upload_start
+
+        create_start = time.time()
+        # Chaque événement du flux de création est l'occasion de vérifier l'annulation
+        on_event = (lambda event: check_cancelled()) if check_cancelled else None
+        with_retries(lambda: client.create(payload, on_event), f"{client.host} /api/create", retries, host_log,
+                     check_cancelled=check_cancelled)
+        report["create_time"] = time.time() - create_start
+
+        if not with_retries(lambda: client.model_exists(payload["model"]), f"{client.host} /api/show",
+                            retries, host_log, check_cancelled=check_cancelled):
+            raise Exception(f"Modèle '{payload['model']}' absent après création")
+        report["status"] = "ok"
+        host_log(
+            f"✅ Déployé en {report['upload_time'] + report['create_time']:.1f} s "
+            f"({report['pushed_blobs']} blobs envoyés, {report['skipped_blobs']} déjà présents)",
+            "success"
+        )
+    except (JobCancelled, StageTimeout):
+        raise
+    except Exception as e:
+        report["error"] = str(e)
+        host_log(f"Échec du déploiement: {e}", "error")
+    report["total_time"] = time.time() - start
+    return report
+
+
+def deploy_model(hosts, model_name, modelfile_path, base_model_path=None, max_connections=DEPLOY_MAX_CONNECTIONS,
+                 retries=DEPLOY_RETRIES, progress=None, stage="deploy", log=_print_log, check_cancelled=None,
+                 timeout=600):
+    """
+    Déploie en parallèle un modèle (Modelfile + blobs) sur plusieurs hôtes Ollama.
+    Les empreintes sont calculées une seule fois ; chaque hôte ne reçoit que les blobs qui lui manquent.
+    Retourne la liste des rapports par hôte ; lève une exception si un hôte a échoué.
+    """
+    hosts = list(dict.fromkeys(normalize_ollama_host(host) for host in hosts))
+    digests = DigestCache()
+    payload, uploads = prepare_create_request(model_name, modelfile_path, digests)
+
+    base_files = []
+    base_lock = threading.Lock()
+
+    def base_fallback():
+        # Empreintes du modèle de base calculées au plus une fois, à la demande
+        with base_lock:
+            if not base_files:
+                base_files.append(model_file_digests(base_model_path, digests))
+        return base_files[0]
+
+    # Octets envoyés, tous hôtes confondus
+    uploaded = [0]
+    uploaded_lock = threading.Lock()
+
+    def on_upload(amount):
+        if check_cancelled:
+            check_cancelled()
+        with uploaded_lock:
+            uploaded[0] += amount
+            completed = uploaded[0]
+        if progress:
+            progress.update(stage, completed)
+
+    log(f"Déploiement de '{model_name}' sur {len(hosts)} hôte(s): {', '.join(hosts)}", "info")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(hosts))) as pool:
+        reports = list(pool.map(
+            lambda host: deploy_to_host(
+                host, payload, uploads,
+                base_fallback=base_fallback if base_model_path else None,
+                max_connections=max_connections, retries=retries, on_upload=on_upload, log=log,
+                check_cancelled=check_cancelled, timeout=timeout
+            ),
+            hosts
+        ))
+
+    for report in reports:
+        rate = report["uploaded_bytes"] / report["upload_time"] / 1e6 if report["upload_time"] else 0
+        log(
+            f"{report['host']}: {report['status']} — {report['uploaded_bytes'] / 1e6:.1f} Mo en "
+            f"{report['upload_time']:.1f} s ({rate:.1f} Mo/s), création {report['create_time']:.1f} s, "
+            f"total {report['total_time']:.1f} s",
+            "success" if report["status"] == "ok" else "error"
+        )
+
+    if check_cancelled:
+        check_cancelled()
+    failed = [report["host"] for report in reports if report["status"] != "ok"]
+    if failed:
+        raise Exception(f"Déploiement échoué sur {len(failed)}/{len(hosts)} hôte(s): {', '.join(failed)}")
+    return reports
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# BUNDLES PORTABLES (EXPORT / IMPORT POUR NŒUDS HORS LIGNE)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+BUNDLE_FORMAT = "lora-to-ollama-bundle"
+BUNDLE_VERSION = 1
+BUNDLE_MANIFEST = "manifest.json"
+BUNDLE_BLOCK_SIZE = 4 * 1024 * 1024    # bloc compressé indépendamment (un membre gzip)
+BUNDLE_DEFAULT_LEVEL = 6               # 0 : archive tar non compressée
+
+# Un bundle est un flux tar : manifest.json d'abord (requête /api/create + empreintes),
+# puis le Modelfile, puis un membre blobs/sha256-<hex> par blob embarqué.
+
+
+class ParallelGzipWriter:
+    """
+    Flux gzip compressé sur plusieurs threads (à la pigz) : des blocs indépendants sont compressés
+    en parallèle (zlib libère le GIL) puis écrits dans l'ordre, chacun comme un membre gzip.
+    Une suite de membres gzip est un fichier gzip valide pour tout décompresseur.
+    """
+
+    def __init__(self, fileobj, level=BUNDLE_DEFAULT_LEVEL, threads=None, block_size=BUNDLE_BLOCK_SIZE):
+        self.fileobj = fileobj
+        self.level = level
+        self.block_size = block_size
+        workers = max(1, threads or os.cpu_count() or 1)
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        # Blocs en vol bornés : la mémoire reste ~ 2 × threads × block_size
+        self._pending = collections.deque()
+        self._max_pending = 2 * workers
+        self._buffer = bytearray()
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+
+    def write(self, data):
+        self._buffer += data
+        self.raw_bytes += len(data)
+        while len(self._buffer) >= self.block_size:
+            self._submit(bytes(self._buffer[:self.block_size]))
+            del self._buffer[:self.block_size]
+        return len(data)
+
+    def _submit(self, block):
+        # wbits=31 : conteneur gzip (en-tête + CRC32 + taille) autour du flux deflate
+        self._pending.append(self._pool.submit(zlib.compress, block, self.level, 31))
+        while len(self._pending) > self._max_pending:
+            self._write_next()
+
+    def _write_next(self):
+        data = self._pending.popleft().result()
+        self.fileobj.write(data)
+        self.compressed_bytes += len(data)
+
+    def close(self):
+        try:
+            if self._buffer:
+                self._submit(bytes(self._buffer))
+                self._buffer.clear()
+            while self._pending:
+                self._write_next()
+        finally:
+            self._pool.shutdown()
+
+
+class HashingReader:
+    """Lecteur qui calcule le sha256 et compte les octets lus au passage (vérification en flux)"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.sha = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.sha.update(data)
+        self.size += len(data)
+        return data
+
+    @property
+    def digest(self):
+        return f"sha256:{self.sha.hexdigest()}"
+
+
+def _blob_member_name(digest):
+    return f"blobs/{digest.replace(':', '-')}"
+
+
+def export_bundle(modelfile_path, output, model_name=None, base_model_path=None, include_base=True,
+                  level=BUNDLE_DEFAULT_LEVEL, threads=None, log=_print_log):
+    """
+    Exporte un modèle (Modelfile, adaptateurs GGUF, poids de base) dans une archive unique écrite
+    en flux (`output` : chemin ou objet fichier, ex: stdout). Sans include_base, les poids de base
+    ne sont référencés que par leurs empreintes : la cible doit déjà les avoir.
+    Retourne le manifeste.
+    """
+    model_name = model_name or Path(modelfile_path).name.removesuffix(".Modelfile")
+    digests = DigestCache()
+    payload, uploads = prepare_create_request(model_name, modelfile_path, digests)
+    with open(modelfile_path, 'rb') as f:
+        modelfile = f.read()
+
+    base_digests = set(payload.get("files", {}).values())
+    base_fallback = None
+    if payload.get("from") and base_model_path:
+        # FROM <tag> : fichiers locaux embarqués pour les cibles qui n'ont pas ce tag
+        files, base_uploads = model_file_digests(base_model_path, digests)
+        base_fallback = files
+        base_digests |= set(files.values())
+        uploads = base_uploads + uploads
+
+    blobs, paths = {}, {}
+    for path, digest in uploads:
+        if digest in blobs:
+            continue
+        embedded = include_base or digest not in base_digests
+        blobs[digest] = {"name": os.path.basename(path), "size": os.path.getsize(path), "embedded": embedded}
+        if embedded:
+            paths[digest] = path
+
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "version": BUNDLE_VERSION,
+        "model": model_name,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "created_by": platform.node(),
+        "payload": payload,
+        "base_fallback": base_fallback,
+        "modelfile_sha256": hashlib.sha256(modelfile).hexdigest(),
+        "blobs": blobs
+    }
+    embedded_bytes = sum(blobs[digest]["size"] for digest in paths)
+    log(f"Export de '{model_name}': {len(paths)} blob(s) embarqué(s) ({embedded_bytes / 1e6:.1f} Mo), "
+        f"{len(blobs) - len(paths)} référencé(s) par empreinte", "info")
+
+    def add(tar, name, size, fileobj):
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = int(time.time())
+        info.mode = 0o644
+        tar.addfile(info, fileobj)
+
+    start = time.time()
+    with contextlib.ExitStack() as stack:
+        out = output if hasattr(output, "write") else stack.enter_context(open(output, 'wb'))
+        writer = ParallelGzipWriter(out, level, threads) if level else out
+        try:
+            with tarfile.open(fileobj=writer, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+                data = json.dumps(manifest, indent=2, ensure_ascii=False).encode("utf-8")
+                add(tar, BUNDLE_MANIFEST, len(data), io.BytesIO(data))
+                add(tar, "Modelfile", len(modelfile), io.BytesIO(modelfile))
+                for digest, path in paths.items():
+                    log(f"Ajout du blob {blobs[digest]['name']} ({blobs[digest]['size'] / 1e6:.1f} Mo)", "info")
+                    with open(path, 'rb') as f:
+                        add(tar, _blob_member_name(digest), blobs[digest]["size"], f)
+        finally:
+            if level:
+                writer.close()
+
+    elapsed = time.time() - start
+    ratio = f", taille compressée {100 * writer.compressed_bytes / writer.raw_bytes:.0f} %" if level else ""
+    log(f"✅ Bundle écrit en {elapsed:.1f} s ({embedded_bytes / 1e6 / max(elapsed, 1e-6):.1f} Mo/s{ratio})",
+        "success")
+    return manifest
+
+
+def import_bundle(source, host=None, model_name=None, log=_print_log):
+    """
+    Importe un bundle sur un serveur Ollama en un seul passage, sans rien extraire sur disque :
+    chaque blob est envoyé directement depuis l'archive. Ollama vérifie le sha256 à la réception et
+    refuse un blob altéré avant de le publier ; le sha256 calculé au fil de la lecture sert à le
+    signaler comme corruption du bundle (et à vérifier les blobs qui ne sont pas envoyés).
+    `source` : chemin ou objet fichier (ex: stdin). Retourne le rapport d'import.
+    """
+    client = OllamaClient(host)
+    report = {"host": client.host, "model": None, "pushed_blobs": 0, "skipped_blobs": 0,
+              "uploaded_bytes": 0, "duration": 0.0}
+    start = time.time()
+
+    try:
+        with contextlib.ExitStack() as stack:
+            raw = source if hasattr(source, "read") else stack.enter_context(open(source, 'rb'))
+            raw = io.BufferedReader(raw) if not hasattr(raw, "peek") else raw
+            # gzip (un ou plusieurs membres) détecté par son magic, sinon tar brut
+            stream = gzip.GzipFile(fileobj=raw, mode='rb') if raw.peek(2)[:2] == b"\x1f\x8b" else raw
+            tar = stack.enter_context(tarfile.open(fileobj=stream, mode="r|"))
+
+            manifest, payload, needed, seen = None, None, set(), set()
+            for member in tar:
+                if manifest is None:
+                    if member.name != BUNDLE_MANIFEST:
+                        raise Exception(f"Bundle invalide: {BUNDLE_MANIFEST} attendu en tête, trouvé '{member.name}'")
+                    manifest = json.load(tar.extractfile(member))
+                    if manifest.get("format") != BUNDLE_FORMAT or manifest.get("version", 0) > BUNDLE_VERSION:
+                        raise Exception(f"Format de bundle non pris en charge: {manifest.get('format')} "
+                                        f"v{manifest.get('version')}")
+                    payload = dict(manifest["payload"])
+                    payload["model"] = model_name or manifest["model"]
+                    report["model"] = payload["model"]
+                    client.version()
+                    log(f"Import de '{payload['model']}' vers {client.host} "
+                        f"(bundle du {manifest['created_at']}, {manifest.get('created_by')})", "info")
+
+                    # FROM <tag> absent de la cible : on bascule sur les fichiers de base embarqués
+                    if payload.get("from") and not client.model_exists(payload["from"]):
+                        if not manifest.get("base_fallback"):
+                            raise Exception(f"Modèle de base '{payload['from']}' absent de {client.host} "
+                                            f"et non inclus dans le bundle")
+                        log(f"Modèle de base '{payload.pop('from')}' absent, utilisation des fichiers du bundle",
+                            "info")
+                        payload["files"] = manifest["base_fallback"]
+
+                    # Blobs non embarqués : la cible doit déjà les avoir, vérifié avant tout envoi
+                    needed = set(payload.get("files", {}).values()) | set(payload.get("adapters", {}).values())
+                    missing = [manifest["blobs"][digest]["name"] for digest in sorted(needed)
+                               if not manifest["blobs"][digest]["embedded"] and not client.has_blob(digest)]
+                    if missing:
+                        raise Exception(f"Blob(s) absent(s) de {client.host} et non inclus dans le bundle: "
+                                        f"{', '.join(missing)}")
+                    continue
+
+                if member.name == "Modelfile":
+                    reader = HashingReader(tar.extractfile(member))
+                    while reader.read(1024 * 1024):
+                        pass
+                    if reader.sha.hexdigest() != manifest.get("modelfile_sha256"):
+                        raise Exception("Bundle corrompu: empreinte du Modelfile invalide")
+                    continue
+
+                digest = member.name[len("blobs/"):].replace("-", ":", 1) if member.name.startswith("blobs/") else None
+                info = manifest["blobs"].get(digest) if digest else None
+                if not info or not info["embedded"] or info["size"] != member.size:
+                    raise Exception(f"Bundle invalide: membre inattendu '{member.name}'")
+
+                reader = HashingReader(tar.extractfile(member))
+                if digest not in needed or client.has_blob(digest):
+                    # Déjà présent ou inutile (base embarquée alors que la cible a le tag) : lu pour vérification
+                    while reader.read(1024 * 1024):
+                        pass
+                    report["skipped_blobs"] += 1
+                else:
+                    log(f"Envoi du blob {info['name']} ({info['size'] / 1e6:.1f} Mo) depuis le bundle", "info")
+                    try:
+                        client.push_blob_stream(reader, member.size, digest)
+                    except Exception:
+                        # Blob altéré refusé par Ollama (empreinte vérifiée à la réception) : signalé ci-dessous
+                        if reader.size != info["size"] or reader.digest == digest:
+                            raise
+                    else:
+                        report["pushed_blobs"] += 1
+                        report["uploaded_bytes"] += member.size
+                if reader.digest != digest or reader.size != info["size"]:
+                    raise Exception(f"Bundle corrompu: empreinte invalide pour {info['name']} "
+                                    f"({reader.digest} au lieu de {digest})")
+                seen.add(digest)
+    except (tarfile.TarError, EOFError, zlib.error, gzip.BadGzipFile) as e:
+        # Archive coupée (copie interrompue, disque plein) ou qui n'en est pas une
+        raise Exception(f"Bundle tronqué ou illisible: {e}")
+
+    if manifest is None:
+        raise Exception("Bundle vide")
+    truncated = [info["name"] for digest, info in manifest["blobs"].items() if info["embedded"] and digest not in seen]
+    if truncated:
+        raise Exception(f"Bundle incomplet, blob(s) manquant(s): {', '.join(truncated)}")
+
+    client.create(payload)
+    if not client.model_exists(payload["model"]):
+        raise Exception(f"Modèle '{payload['model']}' absent après création")
+    report["duration"] = time.time() - start
+    log(f"✅ '{payload['model']}' importé en {report['duration']:.1f} s ({report['pushed_blobs']} blobs envoyés, "
+        f"{report['skipped_blobs']} déjà présents, {report['uploaded_bytes'] / 1e6:.1f} Mo)", "success")
+    return report
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# PROGRESSION DES ÉTAPES
+# ═══════════════════════════════════════════════════════════════════════════════
+
+STAGE_LABELS = {
+    "config": "Configuration",
+    "merge": "Fusion des LoRA",
+    "llama_cpp": "llama.cpp",
+    "download": "Téléchargement",
+    "convert": "Conversion GGUF",
+    "verify": "Vérification GGUF",
+    "base_import": "Import du modèle de base",
+    "modelfile": "Modelfile",
+    "create": "Création Ollama",
+    "deploy": "Déploiement"
+}
+
+
+class ProgressTracker:
+    """
+    Agrège la progression de chaque étape (octets, tenseurs...) et la diffuse aux abonnés
+    sous forme d'événements : pourcentage, débit et temps restant estimé.
+    """
+
+    def __init__(self, listeners=None, min_interval=0.25, window=5.0):
+        self.listeners = list(listeners or [])
+        self.min_interval = min_interval
+        self.window = window
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def emit(self, event):
+        for listener in list(self.listeners):
+            try:
+                listener(event)
+            except Exception:
+                pass
+
+    def start(self, stage, total=None, unit="B", status="running"):
+        now = time.time()
+        with self._lock:
+            self._stages[stage] = {
+                "total": total, "completed": 0, "unit": unit,
+                "started": now, "samples": [(now, 0)], "last_emit": 0.0
+            }
+            event = self._event(stage, status)
+        self.emit(event)
+
+    def update(self, stage, completed=None, total=None, advance=None, force=False):
+        now = time.time()
+        with self._lock:
+            state = self._stages.get(stage)
+            if state is None:
+                return
+            if total is not None and total != state["total"]:
+                # Nouvelle mesure (ex: envoi des blobs puis création) : on repart de zéro pour le débit
+                state["total"] = total
+                state["samples"] = [(now, completed or 0)]
+            if advance is not None:
+                completed = state["completed"] + advance
+            if completed is not None:
+                state["completed"] = completed
+                state["samples"].append((now, completed))
+                while len(state["samples"]) > 2 and now - state["samples"][0][0] > self.window:
+                    state["samples"].pop(0)
+            if not force and now - state["last_emit"] < self.min_interval:
+                return
+            state["last_emit"] = now
+            event = self._event(stage, "running")
+        self.emit(event)
+
+    def finish(self, stage, status="done"):
+        with self._lock:
+            state = self._stages.get(stage)
+            if state is None:
+                return
+            if status == "done" and state["total"]:
+                state["completed"] = state["total"]
+            event = self._event(stage, status)
+        self.emit(event)
+
+    def _event(self, stage, status):
+        state = self._stages[stage]
+        now = time.time()
+        (t0, c0), (t1, c1) = state["samples"][0], state["samples"][-1]
+        rate = (c1 - c0) / (t1 - t0) if t1 > t0 else None
+        total, completed = state["total"], state["completed"]
+        eta = None
+        if total and rate and rate > 0 and status == "running":
+            eta = max(total - completed, 0) / rate
+        return {
+            "event": "progress",
+            "stage": stage,
+            "status": status,
+            "completed": completed,
+            "total": total,
+            "unit": state["unit"],
+            "percent": round(100.0 * completed / total, 2) if total else None,
+            "rate": rate,
+            "eta": eta,
+            "elapsed": now - state["started"],
+            "timestamp": now
+        }
+
+
+def format_duration(seconds):
+    """Formate une durée en texte court (ex: '1 min 20 s')"""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600} h {seconds % 3600 // 60:02d} min"
+    if seconds >= 60:
+        return f"{seconds // 60} min {seconds % 60:02d} s"
+    return f"{seconds} s"
+
+
+def format_progress(event):
+    """Représentation lisible d'un événement de progression"""
+    label = STAGE_LABELS.get(event["stage"], event["stage"])
+    if event["status"] == "waiting":
+        return f"{label} : en attente de ressources"
+    if event["status"] != "running":
+        status = {"done": "terminé", "failed": "échec", "cancelled": "annulé"}.get(event["status"], event["status"])
+        return f"{label} : {status} ({format_duration(event['elapsed'])})"
+
+    parts = [label]
+    if event["percent"] is not None:
+        parts.append(f"{event['percent']:.1f} %")
+    if event["rate"]:
+        if event["unit"] == "B":
+            parts.append(f"{event['rate'] / 1e6:.1f} Mo/s")
+        else:
+            parts.append(f"{event['rate']:.1f} {event['unit']}/s")
+    if event["eta"] is not None:
+        parts.append(f"ETA {format_duration(event['eta'])}")
+    return " — ".join(parts)
+
+
+class JsonEventWriter:
+    """Émet les logs et la progression en JSON Lines (exécutions sans interface)"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            self.stream.write(json.dumps(event, ensure_ascii=False) + "\n")
+            self.stream.flush()
+
+    def log(self, message, level="info"):
+        self({"event": "log", "level": level, "message": message, "timestamp": time.time()})
+
+
+class DirectoryGrowthMonitor:
+    """Mesure périodiquement la taille d'un dossier (ex: blobs du cache HF pendant un téléchargement)"""
+
+    def __init__(self, directory, callback, interval=0.5):
+        self.directory = directory
+        self.callback = callback
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def size(self):
+        total = 0
+        for root, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                try:
+                    total += os.path.getsize(os.path.join(root, filename))
+                except OSError:
+                    pass
+        return total
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.callback(self.size())
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.callback(self.size())
+
+
+def kill_process_tree(process, grace=5.0):
+    """Arrête un processus enfant et tout son groupe (SIGTERM, puis SIGKILL après `grace` s)"""
+    if process.poll() is not None:
+        return
+    try:
+        if sys.platform == "win32":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True)
+        else:
+            os.killpg(process.pid, signal.SIGTERM)
+            try:
+                process.wait(grace)
+            except subprocess.TimeoutExpired:
+                os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+    except OSError:
+        pass
+
+
+def run_process(cmd, on_line=None, cwd=None, env=None, check_cancelled=None, poll_interval=0.5, isolation=None,
+                name=None, log=_print_log):
+    """
+    Lance un processus enfant en lisant sa sortie (stdout + stderr) ligne par ligne.
+    Retourne (code de retour, sortie complète).
+
+    Le processus est lancé dans son propre groupe : si check_cancelled lève une exception
+    (annulation, délai dépassé), tout le groupe est arrêté et l'exception est propagée.
+    Avec `isolation` (ProcessIsolation), les contraintes sont appliquées et journalisées.
+    """
+    name = name or os.path.basename(cmd[0])
+    if isolation is not None and isolation.enabled:
+        cmd, env = isolation.wrap(cmd, env)
+    else:
+        isolation = None
+
+    if sys.platform == "win32":
+        group = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        group = {"start_new_session": True}
+
+    process = subprocess.Popen(
+        cmd,
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+        bufsize=1,
+        **group
+    )
+
+    stopped = []
+    finished = threading.Event()
+
+    def watch():
+        while not finished.wait(poll_interval):
+            try:
+                check_cancelled()
+            except Exception as e:
+                stopped.append(e)
+                kill_process_tree(process)
+                return
+
+    watcher = threading.Thread(target=watch, daemon=True) if check_cancelled else None
+    if watcher:
+        watcher.start()
+
+    output = []
+    try:
+        for line in process.stdout:
+            if isolation and line.startswith(ISOLATION_MARKER):
+                isolation.report(line.strip(), name, log)
+                continue
+            output.append(line)
+            if on_line:
+                on_line(line.rstrip("\n"))
+        process.wait()
+    finally:
+        finished.set()
+        if watcher:
+            watcher.join()
+        # Sortie anormale (exception, Ctrl+C) : ne pas laisser de processus orphelin
+        kill_process_tree(process)
+
+    if stopped:
+        raise stopped[0]
+    return process.returncode, "".join(output)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# ISOLATION DES PROCESSUS ENFANTS (PRIORITÉ, CPU, MÉMOIRE, THREADS)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Réglages par défaut : aucune contrainte (comportement historique)
+DEFAULT_ISOLATION = {
+    "nice": None,             # priorité CPU absolue (0-19, plus grand = moins prioritaire)
+    "ionice": None,           # priorité E/S : "idle" ou "best-effort[:0-7]"
+    "cpus": None,             # affinité CPU : "0-3,6" ou liste d'indices
+    "memory_limit_gb": None,  # mémoire maximale (cgroup via systemd-run)
+    "memory_rlimit": False,   # sans cgroup : appliquer memory_limit_gb en RLIMIT_AS (mémoire virtuelle)
+    "threads": None           # threads OpenMP/MKL/BLAS (par défaut : nombre de CPU autorisés)
+}
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS",
+                   "VECLIB_MAXIMUM_THREADS")
+IONICE_CLASSES = {"realtime": "1", "best-effort": "2", "idle": "3"}
+ISOLATION_MARKER = "LORA_TO_OLLAMA_ISOLATION:"
+
+# Lanceur intermédiaire : applique nice, affinité et RLIMIT_AS à lui-même, rapporte les valeurs
+# effectivement en vigueur puis se remplace par la commande (exec : héritées par l'enfant).
+# Évite preexec_fn, non sûr dans un processus multi-thread.
+ISOLATION_LAUNCHER = r'''
+import json, os, sys
+settings, cmd = json.loads(sys.argv[1]), sys.argv[2:]
+if settings.get("nice") is not None:
+    # Valeur absolue (os.nice ajouterait à celle héritée) ; sans privilège on ne peut que la relever
+    os.setpriority(os.PRIO_PROCESS, 0, max(settings["nice"], os.getpriority(os.PRIO_PROCESS, 0)))
+if settings.get("cpus") and hasattr(os, "sched_setaffinity"):
+    os.sched_setaffinity(0, settings["cpus"])
+if settings.get("rlimit_as"):
+    import resource
+    resource.setrlimit(resource.RLIMIT_AS, (settings["rlimit_as"], settings["rlimit_as"]))
+applied = {"nice": os.getpriority(os.PRIO_PROCESS, 0)}
+if hasattr(os, "sched_getaffinity"):
+    applied["cpus"] = sorted(os.sched_getaffinity(0))
+if settings.get("rlimit_as"):
+    import resource
+    applied["rlimit_as"] = resource.getrlimit(resource.RLIMIT_AS)[0]
+try:
+    with open("/proc/self/cgroup") as f:
+        applied["cgroup"] = f.read().strip().splitlines()[-1].split(":", 2)[-1]
+except OSError:
+    pass
+print("LORA_TO_OLLAMA_ISOLATION:" + json.dumps(applied), flush=True)
+os.execvp(cmd[0], cmd)
+'''
+
+# systemd-run --user --scope utilisable (session utilisateur systemd) : testé une seule fois
+_SYSTEMD_SCOPE = {}
+
+
+def parse_cpu_list(value):
+    """Liste d'indices de CPU depuis "0-3,6" ou une liste"""
+    if isinstance(value, (list, tuple)):
+        return sorted({int(cpu) for cpu in value})
+    cpus = set()
+    for part in str(value).replace(" ", "").split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.update(range(int(first), int(last or first) + 1))
+    return sorted(cpus)
+
+
+def validate_isolation(settings):
+    """Valide les réglages d'isolation, retourne la liste des erreurs"""
+    errors = []
+    unknown = set(settings) - set(DEFAULT_ISOLATION)
+    if unknown:
+        errors.append(f"Réglage d'isolation inconnu: {', '.join(sorted(unknown))}")
+    nice = settings.get("nice")
+    if nice is not None and (isinstance(nice, bool) or not isinstance(nice, int) or not 0 <= nice <= 19):
+        errors.append(f"nice doit être un entier entre 0 et 19: {nice}")
+    ionice = settings.get("ionice")
+    if ionice:
+        io_class, _, level = str(ionice).partition(":")
+        if io_class not in IONICE_CLASSES or (level and not (level.isdigit() and int(level) <= 7)):
+            errors.append(f"ionice invalide (idle, best-effort[:0-7]): {ionice}")
+    if settings.get("cpus") not in (None, "", []):
+        try:
+            if not parse_cpu_list(settings["cpus"]):
+                raise ValueError
+        except (TypeError, ValueError):
+            errors.append(f"Liste de CPU invalide: {settings['cpus']}")
+    for name in ("memory_limit_gb", "threads"):
+        value = settings.get(name)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0):
+            errors.append(f"{name} doit être un nombre positif: {value}")
+    if not isinstance(settings.get("memory_rlimit", False), bool):
+        errors.append(f"memory_rlimit doit être un booléen: {settings['memory_rlimit']}")
+    return errors
+
+
+def systemd_scope_available():
+    if "available" not in _SYSTEMD_SCOPE:
+        available = False
+        if sys.platform.startswith("linux") and shutil.which("systemd-run"):
+            try:
+                available = subprocess.run(
+                    ["systemd-run", "--user", "--scope", "--quiet", "true"],
+                    capture_output=True, timeout=10
+                ).returncode == 0
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+        _SYSTEMD_SCOPE["available"] = available
+    return _SYSTEMD_SCOPE["available"]
+
+
+class ProcessIsolation:
+    """
+    Contraintes appliquées à chaque processus enfant du pipeline (clone, téléchargement, conversion) :
+    nice, ionice, affinité CPU, limite mémoire (cgroup, ou RLIMIT_AS si memory_rlimit) et threads.
+    L'import et la quantification par le serveur Ollama ne sont pas concernés.
+    """
+
+    def __init__(self, settings=None):
+        self.settings = dict(DEFAULT_ISOLATION)
+        self.settings.update({k: v for k, v in (settings or {}).items() if v not in (None, "", [])})
+        self.cpus = parse_cpu_list(self.settings["cpus"]) if self.settings["cpus"] else None
+        self.threads = self.settings["threads"] or (len(self.cpus) if self.cpus else None)
+        memory_gb = self.settings["memory_limit_gb"]
+        self.memory_bytes = int(memory_gb * GB) if memory_gb else None
+
+    @property
+    def enabled(self):
+        return any(self.settings[name] for name in DEFAULT_ISOLATION if name != "memory_rlimit")
+
+    def describe(self):
+        parts = []
+        if self.settings["nice"]:
+            parts.append(f"nice {self.settings['nice']}")
+        if self.settings["ionice"]:
+            parts.append(f"E/S {self.settings['ionice']}")
+        if self.cpus:
+            parts.append(f"CPU {','.join(map(str, self.cpus))}")
+        if self.memory_bytes:
+            method = self.memory_method()
+            parts.append(f"mémoire ≤ {self.memory_bytes / GB:.1f} Go ({method})" if method
+                         else f"mémoire ≤ {self.memory_bytes / GB:.1f} Go non appliquée")
+        if self.threads:
+            parts.append(f"{self.threads} thread(s) OMP/MKL/BLAS")
+        return ", ".join(parts) or "aucune contrainte"
+
+    def memory_cgroup(self):
+        return bool(self.memory_bytes) and systemd_scope_available()
+
+    def memory_method(self):
+        """Mécanisme de la limite mémoire : cgroup, RLIMIT_AS sur demande explicite, sinon None"""
+        if self.memory_cgroup():
+            return "cgroup systemd"
+        if self.memory_bytes and self.settings["memory_rlimit"]:
+            return "RLIMIT_AS"
+        return None
+
+    def wrap(self, cmd, env=None):
+        """Retourne (commande, environnement) appliquant les contraintes à la commande"""
+        if not self.enabled:
+            return cmd, env
+        env = dict(env if env is not None else os.environ)
+        if self.threads:
+            for name in THREAD_ENV_VARS:
+                env[name] = str(self.threads)
+        if sys.platform == "win32":
+            # Seules les variables de threads s'appliquent (pas de nice/affinité/rlimit portables)
+            return cmd, env
+
+        launcher = {"nice": self.settings["nice"], "cpus": self.cpus}
+        prefix = []
+        if self.memory_cgroup():
+            # Scope systemd transitoire : la limite couvre le cache de pages et tous les descendants
+            prefix += ["systemd-run", "--user", "--scope", "--quiet", "-p", f"MemoryMax={self.memory_bytes}",
+                       "-p", "MemorySwapMax=0"]
+        elif self.memory_method() == "RLIMIT_AS":
+            launcher["rlimit_as"] = self.memory_bytes
+        if self.settings["ionice"] and shutil.which("ionice"):
+            io_class, _, level = str(self.settings["ionice"]).partition(":")
+            prefix += ["ionice", "-c", IONICE_CLASSES[io_class]] + (["-n", level] if level else [])
+        return prefix + [sys.executable, "-c", ISOLATION_LAUNCHER, json.dumps(launcher)] + list(cmd), env
+
+    def report(self, line, name, log=_print_log):
+        """Journalise les contraintes effectivement en vigueur, rapportées par le lanceur"""
+        applied = json.loads(line[len(ISOLATION_MARKER):])
+        parts = [f"nice {applied['nice']}"]
+        if self.settings["ionice"]:
+            parts.append(f"E/S {self.settings['ionice']}" if shutil.which("ionice") else "E/S non appliquée (ionice absent)")
+        if "cpus" in applied:
+            parts.append(f"CPU {','.join(map(str, applied['cpus']))}")
+        if applied.get("rlimit_as"):
+            parts.append(f"RLIMIT_AS {applied['rlimit_as'] / GB:.1f} Go")
+        if self.memory_cgroup():
+            parts.append(f"cgroup {applied.get('cgroup', '?')} (MemoryMax {self.memory_bytes / GB:.1f} Go)")
+        if self.threads:
+            parts.append(f"{self.threads} thread(s) OMP/MKL/BLAS")
+        log(f"Isolation appliquée à {name}: {', '.join(parts)}", "info")
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# VÉRIFICATION D'INTÉGRITÉ GGUF
+# ═══════════════════════════════════════════════════════════════════════════════
+
+GGUF_MAGIC = b"GGUF"
+GGUF_DEFAULT_ALIGNMENT = 32
+GGUF_MAX_DIMS = 4
+
+# Types de valeurs des métadonnées GGUF : id -> (nom, format struct)
+GGUF_VALUE_TYPES = {
+    0: ("UINT8", "<B"), 1: ("INT8", "<b"), 2: ("UINT16", "<H"), 3: ("INT16", "<h"),
+    4: ("UINT32", "<I"), 5: ("INT32", "<i"), 6: ("FLOAT32", "<f"), 7: ("BOOL", "<?"),
+    8: ("STRING", None), 9: ("ARRAY", None), 10: ("UINT64", "<Q"), 11: ("INT64", "<q"),
+    12: ("FLOAT64", "<d")
+}
+
+# Types de tenseurs ggml : id -> (nom, éléments par bloc, octets par bloc)
+GGML_TYPES = {
+    0: ("F32", 1, 4), 1: ("F16", 1, 2), 2: ("Q4_0", 32, 18), 3: ("Q4_1", 32, 20),
+    6: ("Q5_0", 32, 22), 7: ("Q5_1", 32, 24), 8: ("Q8_0", 32, 34), 9: ("Q8_1", 32, 36),
+    10: ("Q2_K", 256, 84), 11: ("Q3_K", 256, 110), 12: ("Q4_K", 256, 144), 13: ("Q5_K", 256, 176),
+    14: ("Q6_K", 256, 210), 15: ("Q8_K", 256, 292), 16: ("IQ2_XXS", 256, 66), 17: ("IQ2_XS", 256, 74),
+    18: ("IQ3_XXS", 256, 98), 19: ("IQ1_S", 256, 50), 20: ("IQ4_NL", 32, 18), 21: ("IQ3_S", 256, 110),
+    22: ("IQ2_S", 256, 82), 23: ("IQ4_XS", 256, 136), 24: ("I8", 1, 1), 25: ("I16", 1, 2),
+    26: ("I32", 1, 4), 27: ("I64", 1, 8), 28: ("F64", 1, 8), 29: ("IQ1_M", 256, 56),
+    30: ("BF16", 1, 2), 34: ("TQ1_0", 256, 54), 35: ("TQ2_0", 256, 66)
+}
+
+
+class GGUFError(Exception):
+    """Fichier GGUF invalide, tronqué ou incohérent"""
+
+
+class _GGUFCursor:
+    """Lecture séquentielle bornée dans un buffer (mmap) : toute lecture hors fichier est une erreur"""
+
+    def __init__(self, buffer, offset=0):
+        self.buffer = buffer
+        self.offset = offset
+        self.size = len(buffer)
+
+    def read(self, fmt):
+        size = struct.calcsize(fmt)
+        if self.offset + size > self.size:
+            raise GGUFError(f"Fichier tronqué (lecture de {size} octets à l'offset {self.offset})")
+        value = struct.unpack_from(fmt, self.buffer, self.offset)[0]
+        self.offset += size
+        return value
+
+    def skip(self, size):
+        if self.offset + size > self.size:
+            raise GGUFError(f"Fichier tronqué (saut de {size} octets à l'offset {self.offset})")
+        self.offset += size
+
+    def string(self):
+        length = self.read("<Q")
+        if self.offset + length > self.size:
+            raise GGUFError(f"Chaîne de {length} octets hors du fichier (offset {self.offset})")
+        value = bytes(self.buffer[self.offset:self.offset + length])
+        self.offset += length
+        try:
+            return value.decode("utf-8")
+        except UnicodeDecodeError:
+            raise GGUFError(f"Chaîne non UTF-8 à l'offset {self.offset - length}")
+
+    def value(self, value_type, keep_arrays=True):
+        if value_type not in GGUF_VALUE_TYPES:
+            raise GGUFError(f"Type de métadonnée inconnu: {value_type} (offset {self.offset})")
+        name, fmt = GGUF_VALUE_TYPES[value_type]
+        if name == "STRING":
+            return self.string()
+        if name != "ARRAY":
+            return self.read(fmt)
+
+        item_type = self.read("<I")
+        count = self.read("<Q")
+        if item_type not in GGUF_VALUE_TYPES:
+            raise GGUFError(f"Type d'élément de tableau inconnu: {item_type}")
+        item_fmt = GGUF_VALUE_TYPES[item_type][1]
+        if item_fmt and not keep_arrays:
+            # Tableaux numériques (ex: scores du tokenizer) : simple saut, pas de décodage
+            self.skip(count * struct.calcsize(item_fmt))
+            return {"type": GGUF_VALUE_TYPES[item_type][0], "count": count}
+        items = [self.value(item_type, keep_arrays) for _ in range(count)]
+        return items if keep_arrays else {"type": GGUF_VALUE_TYPES[item_type][0], "count": count}
+
+
+def read_gguf_metadata(path, keep_arrays=False):
+    """
+    Lit l'en-tête, les métadonnées et le répertoire des tenseurs d'un GGUF (mmap, sans lire les poids).
+    Les tableaux ne sont décodés que si keep_arrays=True (le vocabulaire peut être volumineux).
+    """
+    file_size = os.path.getsize(path)
+    if file_size < 24:
+        raise GGUFError(f"Fichier trop petit pour un GGUF ({file_size} octets)")
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        cursor = _GGUFCursor(buffer)
+        if buffer[:4] != GGUF_MAGIC:
+            raise GGUFError(f"Signature invalide: {bytes(buffer[:4])!r} (attendu {GGUF_MAGIC!r})")
+        cursor.skip(4)
+
+        version = cursor.read("<I")
+        if version not in (2, 3):
+            if version.to_bytes(4, "little") in ((2).to_bytes(4, "big"), (3).to_bytes(4, "big")):
+                raise GGUFError("GGUF big-endian non supporté")
+            raise GGUFError(f"Version GGUF non supportée: {version}")
+
+        tensor_count = cursor.read("<Q")
+        kv_count = cursor.read("<Q")
+        # Chaque entrée occupe au moins 8 octets : borne grossière contre un en-tête corrompu
+        if (tensor_count + kv_count) * 8 > file_size:
+            raise GGUFError(f"Compteurs incohérents: {tensor_count} tenseurs, {kv_count} métadonnées")
+
+        metadata = {}
+        for _ in range(kv_count):
+            key = cursor.string()
+            if key in metadata:
+                raise GGUFError(f"Clé de métadonnée dupliquée: {key}")
+            metadata[key] = cursor.value(cursor.read("<I"), keep_arrays)
+
+        tensors = []
+        for _ in range(tensor_count):
+            name = cursor.string()
+            n_dims = cursor.read("<I")
+            if not 1 <= n_dims <= GGUF_MAX_DIMS:
+                raise GGUFError(f"Tenseur {name}: nombre de dimensions invalide ({n_dims})")
+            shape = [cursor.read("<Q") for _ in range(n_dims)]
+            tensors.append({
+                "name": name,
+                "shape": shape,
+                "type": cursor.read("<I"),
+                "offset": cursor.read("<Q")
+            })
+
+        alignment = metadata.get("general.alignment", GGUF_DEFAULT_ALIGNMENT)
+        if not isinstance(alignment, int) or alignment <= 0 or alignment & (alignment - 1):
+            raise GGUFError(f"general.alignment invalide: {alignment}")
+        data_offset = cursor.offset + (-cursor.offset % alignment)
+
+    return {
+        "version": version,
+        "metadata": metadata,
+        "tensors": tensors,
+        "alignment": alignment,
+        "data_offset": data_offset,
+        "file_size": file_size
+    }
+
+
+def ggml_tensor_nbytes(tensor):
+    """Taille en octets des données d'un tenseur GGUF"""
+    if tensor["type"] not in GGML_TYPES:
+        raise GGUFError(f"Tenseur {tensor['name']}: type ggml inconnu ({tensor['type']})")
+    type_name, block_size, type_size = GGML_TYPES[tensor["type"]]
+    if any(dim <= 0 for dim in tensor["shape"]):
+        raise GGUFError(f"Tenseur {tensor['name']}: dimension nulle {tensor['shape']}")
+    if tensor["shape"][0] % block_size:
+        raise GGUFError(f"Tenseur {tensor['name']}: {tensor['shape'][0]} non multiple du bloc {type_name} ({block_size})")
+    elements = 1
+    for dim in tensor["shape"]:
+        elements *= dim
+    return elements // block_size * type_size
+
+
+def verify_gguf(path, checksum=False, expect_adapter=False, log=_print_log):
+    """
+    Vérifie un fichier GGUF sans le charger : en-tête, métadonnées, répertoire des tenseurs,
+    offsets, alignement et taille totale par rapport à la taille du fichier.
+    Avec checksum=True, calcule aussi le sha256 des données des tenseurs.
+    Lève GGUFError au premier problème, retourne un résumé sinon.
+    """
+    start = time.time()
+    info = read_gguf_metadata(path)
+    alignment, data_offset, file_size = info["alignment"], info["data_offset"], info["file_size"]
+
+    names = set()
+    spans = []
+    for tensor in info["tensors"]:
+        if tensor["name"] in names:
+            raise GGUFError(f"Tenseur dupliqué: {tensor['name']}")
+        names.add(tensor["name"])
+        if tensor["offset"] % alignment:
+            raise GGUFError(f"Tenseur {tensor['name']}: offset {tensor['offset']} non aligné sur {alignment}")
+        nbytes = ggml_tensor_nbytes(tensor)
+        end = data_offset + tensor["offset"] + nbytes
+        if end > file_size:
+            raise GGUFError(
+                f"Tenseur {tensor['name']}: données hors fichier (fin {end} > taille {file_size}), fichier tronqué ?"
+            )
+        spans.append((tensor["offset"], tensor["offset"] + nbytes, tensor["name"]))
+
+    spans.sort()
+    for (_, previous_end, previous), (offset, _, name) in zip(spans, spans[1:]):
+        if offset < previous_end:
+            raise GGUFError(f"Tenseurs qui se chevauchent: {previous} et {name}")
+
+    data_end = data_offset + (spans[-1][1] if spans else 0)
+    if file_size > data_end + (-data_end % alignment):
+        raise GGUFError(f"{file_size - data_end} octets inattendus après les données des tenseurs")
+
+    metadata = info["metadata"]
+    if expect_adapter and (metadata.get("general.type") != "adapter" or metadata.get("adapter.type") != "lora"):
+        raise GGUFError(
+            f"Ce n'est pas un adaptateur LoRA (general.type={metadata.get('general.type')}, "
+            f"adapter.type={metadata.get('adapter.type')})"
+        )
+
+    summary = {
+        "path": path,
+        "version": info["version"],
+        "tensors": len(info["tensors"]),
+        "metadata": len(metadata),
+        "data_bytes": data_end - data_offset,
+        "file_size": file_size
+    }
+
+    if checksum:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            view = memoryview(buffer)
+            try:
+                for chunk_start in range(data_offset, data_end, 16 * 1024 * 1024):
+                    sha.update(view[chunk_start:min(chunk_start + 16 * 1024 * 1024, data_end)])
+            finally:
+                view.release()
+        summary["sha256"] = sha.hexdigest()
+
+    summary["duration"] = time.time() - start
+    log(
+        f"GGUF valide: {summary['tensors']} tenseurs, {summary['metadata']} métadonnées, "
+        f"{summary['data_bytes'] / 1e6:.1f} Mo de données (vérifié en {summary['duration'] * 1000:.1f} ms)",
+        "success"
+    )
+    return summary
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# ESTIMATION MÉMOIRE ET DISQUE (POIDS, KV-CACHE, num_ctx)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Octets par élément du cache KV selon OLLAMA_KV_CACHE_TYPE (q8_0/q4_0 : blocs de 32 + échelle f16)
+KV_CACHE_TYPE_BYTES = {"f16": 2.0, "q8_0": 34 / 32, "q4_0": 18 / 32}
+TORCH_DTYPE_BYTES = {"float64": 8, "float32": 4, "float16": 2, "bfloat16": 2}
+
+OLLAMA_DEFAULT_NUM_CTX = 4096         # num_ctx appliqué par Ollama quand le Modelfile n'en fixe pas
+NUM_CTX_STEP = 256                    # granularité du plafonnement automatique
+RUNTIME_OVERHEAD_BYTES = 768 * 1024 ** 2   # tampons de calcul et runtime Ollama (approximation)
+ESTIMATE_CONTEXTS = (2048, 4096, 8192, 16384, 32768, 65536, 131072)
+NUM_CTX_POLICIES = ("warn", "cap")
+
+
+def _config_value(config, *names):
+    for name in names:
+        if isinstance(config.get(name), (int, float)) and not isinstance(config.get(name), bool):
+            return config[name]
+    return None
+
+
+def _safetensors_weight_bytes(files):
+    """
+    Taille des poids une fois importés dans Ollama, d'après les en-têtes safetensors :
+    les tenseurs flottants sont convertis en 16 bits, les autres gardent leur taille.
+    """
+    total = 0
+    for file in files:
+        header = read_safetensors_header(file)
+        header.pop("__header_size__")
+        header.pop("__metadata__", None)
+        for info in header.values():
+            start, end = info["data_offsets"]
+            dtype_bytes = SAFETENSORS_DTYPES.get(info["dtype"], (None, None))[1]
+            if dtype_bytes:
+                elements = (end - start) // dtype_bytes
+                total += elements * min(dtype_bytes, 2)
+            else:
+                total += end - start
+    return total
+
+
+def _architecture_from_gguf(path):
+    gguf = read_gguf_metadata(path)
+    metadata = gguf["metadata"]
+    arch = metadata.get("general.architecture", "")
+
+    def key(name):
+        value = metadata.get(f"{arch}.{name}")
+        # Valeurs par couche (tableaux) non décodées : considérées comme inconnues
+        return value if isinstance(value, int) else None
+
+    heads = key("attention.head_count")
+    hidden_size = key("embedding_length")
+    return {
+        "source": "gguf",
+        "architecture": arch or "inconnue",
+        "layers": key("block_count"),
+        "hidden_size": hidden_size,
+        "heads": heads,
+        "kv_heads": key("attention.head_count_kv") or heads,
+        "head_dim": key("attention.key_length") or (hidden_size // heads if hidden_size and heads else None),
+        "context_length": key("context_length"),
+        "dtype": "gguf",
+        "weight_bytes": sum(ggml_tensor_nbytes(t) for t in gguf["tensors"]),
+        "file_bytes": gguf["file_size"]
+    }
+
+
+def _architecture_from_config(directory):
+    with open(os.path.join(directory, "config.json"), 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    # Modèles multimodaux : les hyperparamètres du LLM sont dans text_config
+    text_config = config.get("text_config") or config
+
+    hidden_size = _config_value(text_config, "hidden_size", "n_embd", "d_model")
+    heads = _config_value(text_config, "num_attention_heads", "n_head")
+    dtype = text_config.get("torch_dtype") or text_config.get("dtype") or config.get("torch_dtype") or "float16"
+
+    weights = sorted(Path(directory).glob("*.safetensors"))
+    file_bytes = sum(file.stat().st_size for file in weights)
+    if weights:
+        weight_bytes = _safetensors_weight_bytes(weights)
+    else:
+        # Poids pas encore téléchargés : taille annoncée par l'index, ramenée en 16 bits
+        weight_bytes = None
+        index_path = os.path.join(directory, "model.safetensors.index.json")
+        if os.path.exists(index_path):
+            with open(index_path, 'r', encoding='utf-8') as f:
+                total_size = json.load(f).get("metadata", {}).get("total_size")
+            if total_size:
+                weight_bytes = int(total_size * 2 / max(2, TORCH_DTYPE_BYTES.get(dtype, 2)))
+
+    return {
+        "source": "config.json",
+        "architecture": (config.get("architectures") or [config.get("model_type", "inconnue")])[0],
+        "layers": _config_value(text_config, "num_hidden_layers", "n_layer", "num_layers"),
+        "hidden_size": hidden_size,
+        "heads": heads,
+        "kv_heads": _config_value(text_config, "num_key_value_heads", "multi_query_group_num") or heads,
+        "head_dim": _config_value(text_config, "head_dim") or (hidden_size // heads if hidden_size and heads else None),
+        "context_length": _config_value(text_config, "max_position_embeddings", "n_positions", "seq_length"),
+        "dtype": dtype,
+        "weight_bytes": weight_bytes,
+        "file_bytes": file_bytes
+    }
+
+
+def read_model_architecture(path):
+    """
+    Hyperparamètres utiles aux estimations (couches, dimension, têtes KV, contexte max, dtype)
+    et taille des poids, depuis config.json (dossier HuggingFace) ou les métadonnées d'un GGUF.
+    """
+    path = Path(path)
+    if path.is_dir():
+        if (path / "config.json").exists():
+            arch = _architecture_from_config(path)
+        else:
+            ggufs = sorted(path.glob("*.gguf"), key=lambda p: p.stat().st_size, reverse=True)
+            if not ggufs:
+                raise Exception(f"Ni config.json ni fichier GGUF dans: {path}")
+            arch = _architecture_from_gguf(ggufs[0])
+    else:
+        arch = _architecture_from_gguf(path)
+
+    missing = [name for name in ("layers", "kv_heads", "head_dim") if not arch[name]]
+    if missing:
+        raise Exception(f"Hyperparamètres introuvables ({', '.join(missing)}) dans: {path}")
+    return arch
+
+
+def kv_cache_type():
+    """Type du cache KV du serveur Ollama (OLLAMA_KV_CACHE_TYPE, f16 par défaut)"""
+    value = os.environ.get("OLLAMA_KV_CACHE_TYPE", "").lower()
+    return value if value in KV_CACHE_TYPE_BYTES else "f16"
+
+
+def ollama_num_parallel():
+    """Requêtes parallèles par modèle (OLLAMA_NUM_PARALLEL) : le contexte est alloué pour chacune"""
+    value = os.environ.get("OLLAMA_NUM_PARALLEL", "")
+    return int(value) if value.isdigit() and int(value) > 0 else 1
+
+
+def kv_cache_bytes_per_token(arch, cache_type=None, parallel=1):
+    """Octets de cache KV par position de contexte : K et V, pour chaque couche et tête KV"""
+    element_bytes = KV_CACHE_TYPE_BYTES[cache_type or kv_cache_type()]
+    return 2 * arch["layers"] * arch["kv_heads"] * arch["head_dim"] * element_bytes * parallel
+
+
+def estimate_memory(arch, num_ctx, adapter_bytes=0, cache_type=None, parallel=1):
+    """Mémoire nécessaire pour servir le modèle avec num_ctx : poids, LoRA, cache KV et marge"""
+    estimate = {
+        "num_ctx": num_ctx,
+        "weights": arch["weight_bytes"] or 0,
+        "adapter": adapter_bytes,
+        "kv_cache": int(kv_cache_bytes_per_token(arch, cache_type, parallel) * num_ctx),
+        "overhead": RUNTIME_OVERHEAD_BYTES
+    }
+    estimate["total"] = estimate["weights"] + estimate["adapter"] + estimate["kv_cache"] + estimate["overhead"]
+    return estimate
+
+
+def max_num_ctx(arch, budget_bytes, adapter_bytes=0, cache_type=None, parallel=1):
+    """Plus grand num_ctx (multiple de NUM_CTX_STEP, borné par le contexte du modèle) tenant dans le budget"""
+    fixed = (arch["weight_bytes"] or 0) + adapter_bytes + RUNTIME_OVERHEAD_BYTES
+    if budget_bytes <= fixed:
+        return 0
+    num_ctx = int((budget_bytes - fixed) / kv_cache_bytes_per_token(arch, cache_type, parallel))
+    num_ctx -= num_ctx % NUM_CTX_STEP
+    if arch["context_length"]:
+        num_ctx = min(num_ctx, arch["context_length"])
+    return num_ctx
+
+
+def estimate_disk(arch, adapter_bytes, download=True, merge=False, import_base=True):
+    """Espace disque nécessaire à une exécution : téléchargement, LoRA fusionné et GGUF, blobs Ollama"""
+    estimate = {
+        "download": arch["file_bytes"] if download else 0,
+        "merged_lora": adapter_bytes if merge else 0,
+        # GGUF du LoRA en f16 : au plus la taille de l'adaptateur
+        "lora_gguf": adapter_bytes,
+        "ollama_blobs": ((arch["weight_bytes"] or 0) if import_base else 0) + adapter_bytes
+    }
+    estimate["total"] = sum(estimate.values())
+    return estimate
+
+
+def _gb(value):
+    return f"{value / GB:.2f} Go"
+
+
+def format_memory_estimate(arch, adapter_bytes=0, budget_bytes=None, num_ctx=None, cache_type=None, parallel=1,
+                           download=True):
+    """Tableau texte : mémoire par longueur de contexte, num_ctx maximal pour le budget, disque"""
+    cache_type = cache_type or kv_cache_type()
+    per_token = kv_cache_bytes_per_token(arch, cache_type, parallel)
+    lines = [
+        f"Modèle : {arch['architecture']} ({arch['source']}, {arch['dtype']}) — {arch['layers']} couches, "
+        f"dimension {arch['hidden_size'] or '?'}, {arch['heads'] or '?'} têtes dont {arch['kv_heads']} KV "
+        f"(head_dim {arch['head_dim']}), contexte max {arch['context_length'] or '?'}",
+        f"Poids en mémoire : {_gb(arch['weight_bytes'] or 0)} — LoRA : {adapter_bytes / 1e6:.1f} Mo — "
+        f"cache KV {cache_type} × {parallel} : {per_token / 1024:.1f} Kio par token",
+        ""
+    ]
+
+    contexts = sorted(set(c for c in ESTIMATE_CONTEXTS if not arch["context_length"] or c <= arch["context_length"])
+                      | ({num_ctx} if num_ctx else set()))
+    rows = [("num_ctx", "Cache KV", "Total") + (("Budget",) if budget_bytes else ())]
+    for context in contexts:
+        estimate = estimate_memory(arch, context, adapter_bytes, cache_type, parallel)
+        row = (str(context) + (" *" if context == num_ctx else ""), _gb(estimate["kv_cache"]), _gb(estimate["total"]))
+        if budget_bytes:
+            row += ("✅" if estimate["total"] <= budget_bytes else "❌",)
+        rows.append(row)
+    lines.append(_text_table(rows))
+
+    if budget_bytes:
+        limit = max_num_ctx(arch, budget_bytes, adapter_bytes, cache_type, parallel)
+        lines += ["", f"num_ctx maximal pour {_gb(budget_bytes)} : {limit}" if limit else
+                  f"Le modèle ne tient pas dans {_gb(budget_bytes)}, même sans contexte"]
+
+    disk = estimate_disk(arch, adapter_bytes, download=download)
+    lines += ["", f"Disque pour une exécution : {_gb(disk['total'])} (téléchargement {_gb(disk['download'])}, "
+                  f"GGUF du LoRA {_gb(disk['lora_gguf'])}, blobs Ollama {_gb(disk['ollama_blobs'])})"]
+    return "\n".join(lines)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# PROFILAGE (cProfile + PILES ÉCHANTILLONNÉES, PROCESSUS ENFANTS COMPRIS)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+PROFILE_SAMPLE_INTERVAL = 0.01   # période d'échantillonnage des piles (s)
+PROFILE_TOP_FUNCTIONS = 40       # fonctions listées dans le résumé texte
+
+# Amorce d'un processus enfant Python profilé : cProfile + échantillonnage de la pile du thread
+# principal, puis exécution du script comme __main__. Écrit <préfixe>.pstats et <préfixe>.collapsed.
+PROFILE_CHILD_SCRIPT = r'''
+import collections, cProfile, os, runpy, sys, threading, time
+prefix, script = sys.argv[1], sys.argv[2]
+sys.argv = sys.argv[2:]
+sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+main_id, stacks, done = threading.get_ident(), collections.Counter(), threading.Event()
+
+def sample():
+    while not done.wait(float(os.environ.get("PROFILE_SAMPLE_INTERVAL", "0.01"))):
+        frame, stack = sys._current_frames().get(main_id), []
+        while frame is not None:
+            code = frame.f_code
+            # Cadres de l'amorce et de runpy omis : la pile commence au module du script
+            if code.co_filename != "<string>" and "runpy" not in code.co_filename:
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        if stack:
+            stacks[";".join(reversed(stack)).replace(" ", "_")] += 1
+
+threading.Thread(target=sample, daemon=True).start()
+profiler = cProfile.Profile()
+profiler.enable()
+try:
+    runpy.run_path(script, run_name="__main__")
+finally:
+    profiler.disable()
+    done.set()
+    profiler.dump_stats(prefix + ".pstats")
+    with open(prefix + ".collapsed", "w", encoding="utf-8") as f:
+        f.writelines(f"{stack} {count}\n" for stack, count in stacks.items())
+'''
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(" ", "_")
+
+
+class StackSampler:
+    """
+    Échantillonne périodiquement la pile d'un thread (format « collapsed » des flame graphs).
+    Les cadres de `outer_frames` (appelants communs, ex: thread du job) ne sont pas repris.
+    """
+
+    def __init__(self, thread_id, interval=PROFILE_SAMPLE_INTERVAL, outer_frames=()):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.outer_frames = set(outer_frames)
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame, stack = sys._current_frames().get(self.thread_id), []
+            while frame is not None and frame not in self.outer_frames:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if self._stop.is_set():
+                # Échantillon pris pendant stop() : pile de l'arrêt, pas de l'étape
+                break
+            # Pile vide : temps passé directement dans le corps de l'étape
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.outer_frames = set()
+
+
+class RunProfiler:
+    """
+    Profil d'une exécution : chaque étape tourne sous cProfile et sous échantillonnage de pile,
+    les scripts Python enfants (conversion llama.cpp) se profilent eux-mêmes via PROFILE_CHILD_SCRIPT.
+    write_report() fusionne le tout : profile.pstats, profile.collapsed et un résumé profile.txt.
+    """
+
+    def __init__(self, directory, interval=PROFILE_SAMPLE_INTERVAL, log=_print_log):
+        self.directory = directory
+        self.interval = interval
+        self.log = log
+        self.stats = None
+        self.stacks = collections.Counter()
+        self.stage_times = {}
+        self.children = []
+        os.makedirs(directory, exist_ok=True)
+
+    @contextlib.contextmanager
+    def profile(self, stage):
+        import cProfile
+        import pstats
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Un seul cProfile actif à la fois depuis Python 3.12 (jobs profilés en parallèle)
+            self.log(f"cProfile indisponible pour l'étape {stage}: {e}", "warning")
+            profiler = None
+        outer_frames, frame = [], sys._getframe()
+        while frame is not None:
+            outer_frames.append(frame)
+            frame = frame.f_back
+        sampler = StackSampler(threading.get_ident(), self.interval, outer_frames)
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if profiler:
+                profiler.disable()
+            sampler.stop()
+            self.stage_times[stage] = self.stage_times.get(stage, 0.0) + time.perf_counter() - start
+            if profiler:
+                if self.stats is None:
+                    self.stats = pstats.Stats(profiler)
+                else:
+                    self.stats.add(profiler)
+            for stack, count in sampler.stacks.items():
+                self.stacks[f"{stage};{stack}" if stack else stage] += count
+
+    def child_command(self, stage, cmd):
+        """Commande [python, script, args...] réécrite pour exécuter le script sous profilage"""
+        prefix = os.path.join(self.directory, f"{stage}-{len(self.children)}-child")
+        self.children.append((stage, os.path.basename(cmd[1]), prefix))
+        return [cmd[0], "-c", PROFILE_CHILD_SCRIPT, prefix] + list(cmd[1:])
+
+    def child_env(self, env=None):
+        env = dict(env or os.environ)
+        env["PROFILE_SAMPLE_INTERVAL"] = str(self.interval)
+        return env
+
+    def write_report(self):
+        """Fusionne profils du processus et des enfants, retourne le chemin du résumé"""
+        import pstats
+
+        for stage, script, prefix in self.children:
+            if os.path.exists(prefix + ".pstats"):
+                if self.stats is None:
+                    self.stats = pstats.Stats(prefix + ".pstats")
+                else:
+                    self.stats.add(prefix + ".pstats")
+            if os.path.exists(prefix + ".collapsed"):
+                # Piles de l'enfant rattachées à l'étape qui l'a lancé
+                with open(prefix + ".collapsed", 'r', encoding='utf-8') as f:
+                    for line in f:
+                        stack, _, count = line.rstrip("\n").rpartition(" ")
+                        if stack and count.isdigit():
+                            self.stacks[f"{stage};[enfant]_{script};{stack}"] += int(count)
+
+        collapsed_path = os.path.join(self.directory, "profile.collapsed")
+        with open(collapsed_path, 'w', encoding='utf-8') as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+        summary = ["Durée par étape :"]
+        summary += [f"  {STAGE_LABELS.get(stage, stage):<28} {seconds:8.2f} s" for stage, seconds in self.stage_times.items()]
+        if self.stats is not None:
+            self.stats.dump_stats(os.path.join(self.directory, "profile.pstats"))
+            stream = io.StringIO()
+            self.stats.stream = stream
+            self.stats.sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+            summary += ["", "Fonctions les plus coûteuses (cumulé, processus et enfants) :", stream.getvalue()]
+
+        summary_path = os.path.join(self.directory, "profile.txt")
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(summary) + "\n")
+        return summary_path
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# PIPELINE DE CONVERSION
+# ═══════════════════════════════════════════════════════════════════════════════
+
+DEFAULT_JOB_SPEC = {
+    # LoRA
+    "adapter_model": "",
+    "adapter_config": "",
+    "base_model_name": "",
+    "extra_adapters": [],
+    "main_weight": 1.0,
+    "merge_mode": "concat",
+    "target_rank": None,
+    # Modèle de base
+    "model_source": "huggingface",
+    "hf_repo": "",
+    "hf_token": "",
+    "hf_revision": "",        # commit (épinglé), branche ou tag ; vide : main
+    "offline": False,         # résolution depuis le cache local uniquement (aucun accès réseau)
+    "local_model": "",
+    "reuse_base": True,
+    # llama.cpp
+    "llama_cpp_path": "",
+    "verify_checksum": False,
+    # Modelfile
+    "template_name": "ChatML (Qwen, etc.)",
+    "template": None,
+    "system_prompt": "",
+    "temperature": "",
+    "top_p": "",
+    "top_k": "",
+    "num_ctx": "",
+    "memory_budget_gb": None,  # mémoire des nœuds de service ; None : pas de contrôle de num_ctx
+    "num_ctx_policy": "warn",  # "warn" : avertir, "cap" : plafonner num_ctx pour tenir dans le budget
+    # Sortie
+    "model_name": "",
+    "output_dir": "",
+    "ollama_host": "",
+    "deploy_hosts": [],
+    # Délais maximaux par étape (secondes), en plus de DEFAULT_STAGE_TIMEOUTS
+    "stage_timeouts": {},
+    # Dossier des rapports de profilage (vide : pas de profilage)
+    "profile_dir": "",
+    # Contraintes des processus enfants (voir DEFAULT_ISOLATION)
+    "isolation": {}
+}
+
+
+class JobCancelled(Exception):
+    """Levée quand un job est annulé par l'utilisateur"""
+
+
+class StageTimeout(Exception):
+    """Levée quand une étape dépasse son délai maximal"""
+
+
+# Délai maximal par étape en secondes (None : illimité), surchargeable par job via "stage_timeouts"
+DEFAULT_STAGE_TIMEOUTS = {
+    "llama_cpp": 15 * 60,
+    "download": 6 * 3600,
+    "merge": 3600,
+    "convert": 2 * 3600,
+    "base_import": 2 * 3600,
+    "create": 2 * 3600,
+    "deploy": 2 * 3600
+}
+
+# Téléchargement HuggingFace dans un processus enfant (arrêtable) ; le jeton passe par HF_TOKEN
+HF_DOWNLOAD_SCRIPT = (
+    "import sys\n"
+    "from huggingface_hub import snapshot_download\n"
+    "revision = sys.argv[2] if len(sys.argv) > 2 else None\n"
+    "print('SNAPSHOT:' + snapshot_download(repo_id=sys.argv[1], revision=revision), flush=True)\n"
+)
+
+
+class SingleFlight:
+    """
+    Déduplique les appels concurrents : pour une même clé, le premier appelant exécute
+    la fonction, les suivants attendent et reçoivent le même résultat (ou la même erreur).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, on_wait=None, check=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"done": threading.Event(), "result": None, "error": None}
+                self._calls[key] = call
+
+        if not leader:
+            if on_wait:
+                on_wait()
+            # check() permet à un appelant en attente d'abandonner (annulation, délai dépassé)
+            while not call["done"].wait(0.5):
+                if check:
+                    check()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+
+
+# Téléchargements partagés entre tous les jobs du processus (GUI, file, serveur)
+SHARED_FLIGHTS = SingleFlight()
+
+LOCK_HEARTBEAT_INTERVAL = 10   # s entre deux signes de vie du producteur (date du fichier verrou)
+LOCK_STALE_AFTER = 120         # s sans signe de vie : verrou considéré comme abandonné
+
+
+def _pid_alive(pid):
+    if sys.platform == "win32":
+        return True  # pas de test fiable sans dépendance : seul le délai LOCK_STALE_AFTER s'applique
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class FileSingleFlight:
+    """
+    Équivalent inter-processus de SingleFlight (plusieurs utilisateurs, jobs CI) : un fichier verrou
+    par ressource dans un dossier d'état partagé. Le premier processus produit la ressource ; les autres
+    attendent la libération du verrou et réutilisent le résultat publié. Le verrou d'un producteur mort
+    (pid absent sur cette machine) ou muet depuis `stale_after` secondes est récupéré.
+    """
+
+    def __init__(self, directory=None, stale_after=LOCK_STALE_AFTER, heartbeat=LOCK_HEARTBEAT_INTERVAL,
+                 poll_interval=0.5):
+        self._directory = Path(directory) if directory else None
+        self.stale_after = stale_after
+        self.heartbeat = heartbeat
+        self.poll_interval = poll_interval
+
+    @property
+    def directory(self):
+        return self._directory or APP_HOME / "locks"
+
+    def paths(self, key):
+        name = hashlib.sha256(json.dumps(key, default=str).encode("utf-8")).hexdigest()[:24]
+        return self.directory / f"{name}.lock", self.directory / f"{name}.json"
+
+    @staticmethod
+    def read_json(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _try_acquire(self, lock_path, key):
+        owner = {
+            "pid": os.getpid(),
+            "host": platform.node(),
+            "token": os.urandom(8).hex(),
+            "key": json.dumps(key, default=str),
+            "since": time.time()
+        }
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return None
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(owner, f)
+        return owner
+
+    def is_stale(self, lock_path, owner):
+        try:
+            age = time.time() - os.path.getmtime(lock_path)
+        except OSError:
+            return False
+        if owner and owner.get("host") == platform.node() and not _pid_alive(owner.get("pid", -1)):
+            return True
+        return age > self.stale_after
+
+    def _break(self, lock_path, owner):
+        """Retire un verrou abandonné ; s'il a été repris entre-temps par un autre processus, il est rendu"""
+        stale_path = f"{lock_path}.stale-{os.getpid()}-{threading.get_ident()}"
+        try:
+            os.rename(lock_path, stale_path)
+        except OSError:
+            return
+        if (self.read_json(stale_path) or {}).get("token") != (owner or {}).get("token"):
+            with contextlib.suppress(OSError):
+                os.link(stale_path, lock_path)
+        with contextlib.suppress(OSError):
+            os.remove(stale_path)
+
+    def _release(self, lock_path, owner):
+        if (self.read_json(lock_path) or {}).get("token") == owner["token"]:
+            with contextlib.suppress(OSError):
+                os.remove(lock_path)
+
+    def do(self, key, fn, on_wait=None, check=None, is_valid=None, log=_print_log):
+        """
+        Exécute fn sous le verrou de `key`. Un processus qui a attendu réutilise le résultat publié
+        pendant son attente (s'il est encore valide) ; sinon il produit la ressource à son tour.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        lock_path, result_path = self.paths(key)
+        waiting_since = None
+
+        while True:
+            owner = self._try_acquire(lock_path, key)
+            if owner:
+                break
+            current = self.read_json(lock_path)
+            if self.is_stale(lock_path, current):
+                current = current or {}
+                log(f"Verrou abandonné récupéré (pid {current.get('pid', '?')} sur {current.get('host', '?')})",
+                    "warning")
+                self._break(lock_path, current)
+                continue
+            if waiting_since is None:
+                waiting_since = time.time()
+                if on_wait:
+                    on_wait(current or {})
+            if check:
+                check()
+            time.sleep(self.poll_interval)
+
+        stop_heartbeat = threading.Event()
+
+        def beat():
+            while not stop_heartbeat.wait(self.heartbeat):
+                with contextlib.suppress(OSError):
+                    os.utime(lock_path)
+
+        heartbeat = threading.Thread(target=beat, daemon=True)
+        heartbeat.start()
+        try:
+            if waiting_since is not None:
+                published = self.read_json(result_path)
+                if (published and published.get("finished_at", 0) >= waiting_since
+                        and (is_valid is None or is_valid(published["result"]))):
+                    log(f"Ressource produite par un autre processus (pid {published.get('pid')}), réutilisée", "success")
+                    return published["result"]
+
+            result = fn()
+            tmp_path = f"{result_path}.tmp-{os.getpid()}-{threading.get_ident()}"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"result": result, "finished_at": time.time(), "pid": os.getpid(),
+                           "host": platform.node()}, f, default=str)
+            os.replace(tmp_path, result_path)
+            return result
+        finally:
+            stop_heartbeat.set()
+            heartbeat.join()
+            self._release(lock_path, owner)
+
+
+# Coordination entre processus partageant APP_HOME (plusieurs utilisateurs, jobs CI, serveurs)
+PROCESS_FLIGHTS = FileSingleFlight()
+
+# Marqueur écrit dans un clone de llama.cpp une fois celui-ci terminé
+LLAMA_CPP_CLONE_MARKER = ".lora_to_ollama-clone-complete"
+
+
+def llama_cpp_ready(path):
+    """Dossier llama.cpp utilisable : clone terminé (marqueur) ou script de conversion présent"""
+    return (os.path.exists(os.path.join(path, LLAMA_CPP_CLONE_MARKER))
+            or os.path.exists(os.path.join(path, "convert_lora_to_gguf.py")))
+
+
+# Ligne émise par convert_lora_to_gguf.py (--verbose) pour chaque tenseur écrit
+CONVERT_TENSOR_LINE = re.compile(r"-->\s*\w+, shape = ")
+
+
+def make_job_spec(values=None):
+    """Complète une spécification de job avec les valeurs par défaut (ValueError si mal formée)"""
+    if values is not None and not isinstance(values, dict):
+        raise ValueError("la spécification doit être un objet JSON")
+    spec = dict(DEFAULT_JOB_SPEC)
+    spec.update(values or {})
+
+    if not isinstance(spec.get("extra_adapters") or [], (list, tuple)):
+        raise ValueError("extra_adapters doit être une liste")
+    extra_adapters = []
+    for adapter in spec.get("extra_adapters") or []:
+        if isinstance(adapter, str):
+            adapter = {"path": adapter}
+        elif isinstance(adapter, (list, tuple)):
+            adapter = dict(zip(("path", "weight"), adapter))
+        if not isinstance(adapter, dict) or not isinstance(adapter.get("path"), str):
+            raise ValueError(f"LoRA additionnel invalide: {adapter}")
+        adapter = dict(adapter)
+        adapter.setdefault("config", os.path.join(os.path.dirname(adapter["path"]), "adapter_config.json"))
+        adapter.setdefault("weight", 1.0)
+        extra_adapters.append(adapter)
+    spec["extra_adapters"] = extra_adapters
+    spec["deploy_hosts"] = parse_host_list(spec["deploy_hosts"])
+
+    if spec["template"] is None:
+        spec["template"] = TEMPLATES.get(spec["template_name"], "")
+    return spec
+
+
+def validate_job_spec(spec):
+    """Valide une spécification de job, retourne la liste des erreurs"""
+    errors = []
+
+    if not spec["adapter_model"]:
+        errors.append("Le chemin vers adapter_model.safetensors est requis")
+    elif not os.path.exists(spec["adapter_model"]):
+        errors.append("Le fichier adapter_model.safetensors n'existe pas")
+
+    if not spec["adapter_config"]:
+        errors.append("Le chemin vers adapter_config.json est requis")
+    elif not os.path.exists(spec["adapter_config"]):
+        errors.append("Le fichier adapter_config.json n'existe pas")
+
+    for adapter in spec["extra_adapters"]:
+        if not os.path.exists(adapter["path"]):
+            errors.append(f"Le LoRA additionnel n'existe pas: {adapter['path']}")
+        elif not os.path.exists(adapter["config"]):
+            errors.append(f"adapter_config.json introuvable à côté de: {adapter['path']}")
+        try:
+            float(adapter["weight"])
+        except (TypeError, ValueError):
+            errors.append(f"Poids invalide pour {adapter['path']}: {adapter['weight']}")
+
+    if spec["extra_adapters"]:
+        try:
+            float(spec["main_weight"])
+        except (TypeError, ValueError):
+            errors.append("Le poids du LoRA principal doit être un nombre")
+        if spec["merge_mode"] not in MERGE_MODES.values():
+            errors.append(f"Mode de fusion inconnu: {spec['merge_mode']}")
+        elif spec["merge_mode"] == "svd" and not str(spec["target_rank"] or "").isdigit():
+            errors.append("Le rang cible (SVD) doit être un entier")
+
+    if spec["model_source"] == "huggingface":
+        if not spec["hf_repo"]:
+            errors.append("Le nom du repo HuggingFace est requis")
+    else:
+        if not spec["local_model"]:
+            errors.append("Le chemin vers le modèle local est requis")
+        elif not os.path.exists(spec["local_model"]):
+            errors.append("Le fichier du modèle local n'existe pas")
+
+    if not spec["model_name"]:
+        errors.append("Le nom du modèle Ollama est requis")
+
+    if spec["num_ctx"] and not (str(spec["num_ctx"]).isdigit() and int(spec["num_ctx"]) > 0):
+        errors.append(f"num_ctx doit être un entier positif: {spec['num_ctx']}")
+    if spec["memory_budget_gb"] not in (None, ""):
+        try:
+            if float(spec["memory_budget_gb"]) <= 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            errors.append(f"Budget mémoire invalide: {spec['memory_budget_gb']}")
+    if spec["num_ctx_policy"] not in NUM_CTX_POLICIES:
+        errors.append(f"Politique num_ctx inconnue: {spec['num_ctx_policy']}")
+
+    if not isinstance(spec["stage_timeouts"] or {}, dict):
+        errors.append("stage_timeouts doit être un objet JSON {étape: secondes}")
+    else:
+        for name, timeout in (spec["stage_timeouts"] or {}).items():
+            if name not in STAGE_LABELS:
+                errors.append(f"Étape inconnue dans stage_timeouts: {name}")
+            elif timeout is not None and (isinstance(timeout, bool) or not isinstance(timeout, (int, float))
+                                          or timeout <= 0):
+                errors.append(f"Délai invalide pour l'étape {name}: {timeout}")
+
+    for host in spec["deploy_hosts"]:
+        try:
+            normalize_ollama_host(host)
+        except ValueError:
+            errors.append(f"Hôte de déploiement invalide: {host}")
+
+    if not isinstance(spec["isolation"], dict):
+        errors.append("isolation doit être un objet JSON")
+    else:
+        errors += validate_isolation(spec["isolation"])
+
+    return errors
+
+
+def load_job_spec(path):
+    """Charge une spécification de job depuis un fichier JSON"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return make_job_spec(json.load(f))
+
+
+class ConversionPipeline:
+    """Exécute les étapes de conversion d'un job, indépendamment de l'interface graphique"""
+
+    def __init__(self, spec, log=_print_log, progress=None, scheduler=None, cancel_event=None):
+        self.spec = make_job_spec(spec)
+        self.log = log
+        self.progress = progress or ProgressTracker()
+        self.scheduler = scheduler
+        self.cancel_event = cancel_event or threading.Event()
+        self.timeouts = dict(DEFAULT_STAGE_TIMEOUTS)
+        self.timeouts.update(self.spec["stage_timeouts"] or {})
+        self.current_stage = None
+        self.deadline = None
+        self.partials = []
+        self.cache_hits = {}
+        self.base_model_path = None
+        self.client = OllamaClient(self.spec["ollama_host"] or None)
+        self.result = {"model_name": self.spec["model_name"]}
+        self.isolation = ProcessIsolation(self.spec["isolation"])
+        self.profiler = None
+        if self.spec["profile_dir"]:
+            self.profiler = RunProfiler(
+                os.path.join(self.spec["profile_dir"], f"{self.spec['model_name']}-{time.strftime('%Y%m%d-%H%M%S')}"),
+                log=log
+            )
+
+    @contextlib.contextmanager
+    def stage(self, name, total=None, unit="B"):
+        """
+        Délimite une étape : début, fin et échec sont remontés à la progression.
+        Le délai de l'étape court à partir de l'obtention des ressources ; en cas d'échec,
+        d'annulation ou de dépassement, les sorties partielles de l'étape sont supprimées.
+        """
+        self.check_cancelled()
+        started = False
+        try:
+            with self.reserve_resources(name, unit):
+                self.check_cancelled()
+                timeout = self.timeouts.get(name)
+                self.current_stage = name
+                self.deadline = time.time() + timeout if timeout else None
+                self.partials = []
+                self.progress.start(name, total, unit)
+                started = True
+                try:
+                    with self.profiler.profile(name) if self.profiler else contextlib.nullcontext():
+                        yield
+                finally:
+                    self.deadline = None
+                self.progress.finish(name)
+        except BaseException as e:
+            # Étape interrompue, y compris pendant l'attente des ressources
+            self.progress.finish(name, "cancelled" if isinstance(e, JobCancelled) else "failed")
+            if started:
+                self.cleanup_partials()
+            raise
+
+    def adapter_bytes(self):
+        """Taille cumulée des LoRA du job (base des estimations mémoire/disque)"""
+        paths = [self.spec["adapter_model"]] + [a["path"] for a in self.spec["extra_adapters"]]
+        return sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+
+    def reserve_resources(self, name, unit="B"):
+        """Réserve auprès du scheduler les ressources d'une étape lourde (sans effet sinon)"""
+        kind = HEAVY_STAGES.get(name)
+        if not self.scheduler or not kind:
+            return contextlib.nullcontext()
+        if name == "download" and self.spec["model_source"] == "local":
+            return contextlib.nullcontext()
+        if name == "base_import" and self.base_already_imported():
+            # Simple vérification du registre : inutile d'attendre une place de transfert
+            return contextlib.nullcontext()
+
+        if kind == "downloads":
+            hf_home = os.environ.get("HF_HOME", os.path.join(Path.home(), ".cache", "huggingface"))
+            ram_bytes, disk_bytes = 0, 0
+            disk_path = hf_home if name == "download" else os.getcwd()
+        else:
+            # Conversion : import de torch (~1.5 Go) + tenseurs du LoRA en float32
+            adapter_bytes = self.adapter_bytes()
+            ram_bytes = int(1.5 * GB) + 4 * adapter_bytes if name == "convert" else 3 * adapter_bytes
+            disk_bytes, disk_path = 2 * adapter_bytes, self.output_dir
+
+        def on_wait(reason):
+            self.log(f"{STAGE_LABELS.get(name, name)}: en attente de ressources ({reason})", "warning")
+            self.progress.start(name, None, unit, status="waiting")
+
+        return self.scheduler.slot(kind, ram_bytes, disk_bytes, disk_path, on_wait=on_wait,
+                                   check_cancelled=self.check_cancelled)
+
+    def check_cancelled(self):
+        """Lève JobCancelled si le job est annulé, StageTimeout si l'étape a dépassé son délai"""
+        if self.cancel_event.is_set():
+            raise JobCancelled("Job annulé")
+        if self.deadline is not None and time.time() > self.deadline:
+            name = self.current_stage
+            raise StageTimeout(
+                f"Délai dépassé pour l'étape {STAGE_LABELS.get(name, name)} "
+                f"({format_duration(self.timeouts[name])})"
+            )
+
+    def remaining_time(self, default):
+        """Temps restant avant le délai de l'étape (borné par `default`), pour les timeouts réseau"""
+        if self.deadline is None:
+            return default
+        return max(1.0, min(default, self.deadline - time.time()))
+
+    def track_partial(self, path):
+        """Enregistre une sortie de l'étape en cours, supprimée si l'étape n'aboutit pas"""
+        self.partials.append(path)
+
+    def cleanup_partials(self):
+        for path in reversed(self.partials):
+            try:
+                if os.path.isdir(path) and not os.path.islink(path):
+                    shutil.rmtree(path)
+                elif os.path.lexists(path):
+                    os.remove(path)
+                else:
+                    continue
+                self.log(f"Sortie partielle supprimée: {path}", "warning")
+            except OSError as e:
+                self.log(f"Impossible de supprimer {path}: {e}", "warning")
+        self.partials = []
+
+    @property
+    def output_dir(self):
+        return self.spec["output_dir"] or os.path.dirname(self.spec["adapter_model"])
+
+    def _shared(self, key, fn, is_valid=os.path.exists):
+        """
+        Exécute fn une seule fois pour les jobs concurrents qui demandent la même ressource,
+        dans ce processus (SingleFlight) comme dans les autres processus (FileSingleFlight).
+        Le résultat (par défaut un chemin) n'est réutilisé que si is_valid le confirme.
+        """
+        def on_wait():
+            self.log("Ressource déjà en préparation par un autre job, attente du résultat...", "info")
+
+        def on_process_wait(owner):
+            self.log(f"Ressource en préparation par un autre processus (pid {owner.get('pid', '?')} sur "
+                     f"{owner.get('host', '?')}), attente du résultat...", "info")
+
+        def produce():
+            return PROCESS_FLIGHTS.do(key, fn, on_wait=on_process_wait, check=self.check_cancelled,
+                                      is_valid=is_valid, log=self.log)
+
+        while True:
+            try:
+                return SHARED_FLIGHTS.do(key, produce, on_wait=on_wait, check=self.check_cancelled)
+            except (JobCancelled, StageTimeout):
+                # Le job qui préparait la ressource a été interrompu : on reprend si ce job-ci ne l'est pas
+                self.check_cancelled()
+                self.log("Préparation partagée interrompue par un autre job, nouvelle tentative", "warning")
+
+    def run(self):
+        """Exécute le processus de conversion complet, retourne les artefacts produits"""
+        if self.isolation.enabled:
+            self.log(f"Isolation des processus enfants: {self.isolation.describe()}", "info")
+            if self.isolation.memory_bytes and not self.isolation.memory_method():
+                self.log("Limite mémoire ignorée : cgroup systemd indisponible (memory_rlimit / --memory-rlimit "
+                         "pour la remplacer par RLIMIT_AS)", "warning")
+        try:
+            return self.run_stages()
+        finally:
+            if self.profiler:
+                self.write_profile()
+
+    def write_profile(self):
+        """Écrit le rapport de profilage, y compris pour un job échoué ou annulé"""
+        try:
+            summary_path = self.profiler.write_report()
+        except (OSError, ValueError) as e:
+            self.log(f"Rapport de profilage non écrit: {e}", "warning")
+            return
+        self.result["profile"] = self.profiler.directory
+        self.log(f"Profil écrit: {summary_path} (pstats et piles « collapsed » pour flame graph à côté)", "info")
+
+    def run_stages(self):
+        # 1. Modifier adapter_config.json
+        with self.stage("config"):
+            self.log("Modification de adapter_config.json...", "info")
+            self.update_adapter_config()
+
+        # 1b. Fusionner les LoRA additionnels (optionnel)
+        lora_dir = os.path.dirname(self.spec["adapter_model"])
+        if self.spec["extra_adapters"]:
+            with self.stage("merge", unit="modules"):
+                self.log("Fusion des LoRA...", "info")
+                lora_dir = self.merge_adapters()
+
+        # 2. Préparer llama.cpp
+        with self.stage("llama_cpp"):
+            self.log("Vérification de llama.cpp...", "info")
+            llama_cpp_path = self.prepare_llama_cpp()
+
+        # 3. Préparer le modèle de base
+        with self.stage("download"):
+            self.log("Préparation du modèle de base...", "info")
+            base_model_path = self.prepare_base_model()
+            self.base_model_path = base_model_path
+
+        # 4. Convertir LoRA en GGUF
+        with self.stage("convert", unit="tenseurs"):
+            self.log("Conversion du LoRA en GGUF...", "info")
+            lora_gguf_path = self.convert_lora_shared(llama_cpp_path, lora_dir)
+
+        # 4b. Vérifier le GGUF produit avant de l'envoyer à Ollama
+        with self.stage("verify"):
+            self.log("Vérification du GGUF...", "info")
+            self.verify_lora_gguf(lora_gguf_path)
+
+        # 5. Importer le modèle de base dans Ollama une seule fois (FROM <tag> pour les jobs suivants)
+        base_reference = base_model_path
+        if self.spec["reuse_base"]:
+            with self.stage("base_import"):
+                self.log("Recherche du modèle de base dans Ollama...", "info")
+                base_reference = self.resolve_base_reference(base_model_path)
+
+        # 5b. Générer le Modelfile
+        with self.stage("modelfile"):
+            self.log("Génération du Modelfile...", "info")
+            self.check_memory_budget(base_model_path, lora_gguf_path)
+            modelfile_path = self.generate_modelfile(base_reference, lora_gguf_path)
+
+        # 6. Créer le modèle Ollama
+        with self.stage("create"):
+            self.log("Création du modèle Ollama...", "info")
+            self.create_ollama_model(modelfile_path)
+
+        # 7. Déployer sur les autres hôtes Ollama (optionnel)
+        if self.spec["deploy_hosts"]:
+            with self.stage("deploy"):
+                self.log("Déploiement sur les hôtes Ollama...", "info")
+                self.deploy_to_hosts(modelfile_path, base_model_path)
+
+        self.log("🎉 Conversion terminée avec succès !", "success")
+        self.log(f"Vous pouvez maintenant utiliser: ollama run {self.spec['model_name']}", "success")
+        return self.result
+
+    def verify_lora_gguf(self, lora_gguf_path):
+        """Vérifie la structure du LoRA GGUF (et son sha256 si demandé)"""
+        try:
+            summary = verify_gguf(
+                lora_gguf_path,
+                checksum=self.spec["verify_checksum"],
+                expect_adapter=True,
+                log=self.log
+            )
+        except GGUFError as e:
+            raise Exception(f"GGUF invalide ({lora_gguf_path}): {e}")
+        if summary.get("sha256"):
+            self.log(f"sha256 des tenseurs: {summary['sha256']}", "info")
+            self.result["lora_sha256"] = summary["sha256"]
+        return summary
+
+    def update_adapter_config(self):
+        """Met à jour le adapter_config.json avec le bon base_model_name_or_path"""
+        config_path = self.spec["adapter_config"]
+        new_base_model = self.spec["base_model_name"]
+
+        if not new_base_model:
+            self.log("base_model_name_or_path non modifié (champ vide)", "warning")
+            return
+
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+
+        old_base_model = config.get("base_model_name_or_path", "")
+
+        # Ne modifier que si la valeur a changé
+        if old_base_model == new_base_model:
+            self.log(f"base_model_name_or_path inchangé: {old_base_model}", "info")
+            return
+
+        config["base_model_name_or_path"] = new_base_model
+
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump(config, f, indent=2, ensure_ascii=False)
+
+        self.log(f"base_model_name_or_path modifié: {old_base_model} → {new_base_model}", "success")
+
+    def merge_adapters(self):
+        """Fusionne le LoRA principal et les LoRA additionnels en un seul adaptateur"""
+        adapters = [(self.spec["adapter_model"], self.spec["adapter_config"], self.spec["main_weight"])]
+        adapters += [(a["path"], a["config"], a["weight"]) for a in self.spec["extra_adapters"]]
+
+        merged_dir = os.path.join(self.output_dir, f"{self.spec['model_name']}-merged-lora")
+        target_rank = self.spec["target_rank"]
+        self.track_partial(merged_dir)
+        merged = merge_lora_adapters(
+            adapters,
+            merged_dir,
+            mode=self.spec["merge_mode"],
+            target_rank=int(target_rank) if target_rank else None,
+            log=self.log,
+            check_cancelled=self.check_cancelled,
+            on_progress=lambda done, total: self.progress.update("merge", done, total)
+        )
+        self.result["merged_lora"] = merged
+        return merged
+
+    def prepare_llama_cpp(self):
+        """Prépare llama.cpp (chemin existant ou téléchargement)"""
+        llama_cpp_path = self.spec["llama_cpp_path"]
+
+        self.cache_hits["llama_cpp"] = True
+        if llama_cpp_path and os.path.exists(llama_cpp_path):
+            self.log(f"Utilisation de llama.cpp existant: {llama_cpp_path}", "success")
+            return llama_cpp_path
+
+        # Télécharger llama.cpp ; la présence d'un clone n'est testée que sous le verrou partagé,
+        # pour ne pas réutiliser celui qu'un autre job ou processus est en train d'écrire
+        default_path = os.path.join(os.getcwd(), "llama.cpp")
+
+        def prepare():
+            if llama_cpp_ready(default_path):
+                self.log(f"llama.cpp trouvé localement: {default_path}", "success")
+                return default_path
+            self.cache_hits["llama_cpp"] = False
+            return self.clone_llama_cpp(default_path)
+
+        return self._shared(("llama_cpp", default_path), prepare, is_valid=llama_cpp_ready)
+
+    def clone_llama_cpp(self, default_path):
+        """Clone llama.cpp dans le dossier courant"""
+        if os.path.exists(default_path):
+            # Clone interrompu (processus tué) : recommencé depuis zéro
+            self.log(f"Clone de llama.cpp incomplet, suppression: {default_path}", "warning")
+            shutil.rmtree(default_path)
+        self.log("Téléchargement de llama.cpp (cela peut prendre un moment)...", "warning")
+
+        self.track_partial(default_path)
+        try:
+            returncode, output = run_process(
+                ["git", "clone", "--depth", "1", "https://github.com/ggerganov/llama.cpp.git", default_path],
+                check_cancelled=self.check_cancelled,
+                isolation=self.isolation,
+                log=self.log
+            )
+        except FileNotFoundError:
+            raise Exception("Git n'est pas installé. Veuillez installer Git ou spécifier le chemin vers llama.cpp.")
+
+        if returncode != 0:
+            raise Exception(f"Erreur lors du téléchargement de llama.cpp: {output}")
+
+        with open(os.path.join(default_path, LLAMA_CPP_CLONE_MARKER), 'w', encoding='utf-8') as f:
+            f.write(f"{time.time()}\n")
+        self.log("llama.cpp téléchargé avec succès", "success")
+        return default_path
+
+    def prepare_base_model(self):
+        """Prépare le modèle de base (téléchargement HuggingFace ou chemin local)"""
+        if self.spec["model_source"] == "local":
+            path = self.spec["local_model"]
+            self.log(f"Utilisation du modèle local: {path}", "success")
+            return path
+
+        key = ("base_model", self.spec["hf_repo"], self.spec["hf_revision"] or "main")
+        return self._shared(key, self.download_base_model)
+
+    @property
+    def offline(self):
+        """Mode hors ligne : champ du job ou HF_HUB_OFFLINE"""
+        env = os.environ.get("HF_HUB_OFFLINE", "").strip().lower()
+        return bool(self.spec["offline"]) or env in ("1", "true", "yes", "on")
+
+    def download_base_model(self):
+        """
+        Prépare le modèle de base HuggingFace et le matérialise dans le store.
+        Une révision épinglée (hash de commit) présente et vérifiée localement est utilisée
+        sans aucun accès réseau ; en mode hors ligne, le réseau n'est jamais utilisé.
+        """
+        repo_id = self.spec["hf_repo"]
+        revision = self.spec["hf_revision"] or None
+        token = self.spec["hf_token"] or None
+        resolutions = ResolutionCache()
+
+        if self.offline or (revision and HF_COMMIT_RE.match(revision)):
+            commit = hf_local_commit(repo_id, revision)
+            snapshot_dir = resolve_local_snapshot(repo_id, commit, self.offline, resolutions, self.log) if commit else None
+            if snapshot_dir:
+                self.cache_hits["download"] = True
+                return self.materialize_base_model(repo_id, snapshot_dir)
+            if self.offline:
+                raise Exception(
+                    f"{repo_id}@{revision or 'main'} absent ou incomplet dans le cache local "
+                    f"({hf_hub_cache()}) et mode hors ligne activé"
+                )
+
+        try:
+            from huggingface_hub import HfApi
+
+            self.cache_hits["download"] = False
+            self.log(f"Téléchargement du modèle depuis HuggingFace: {repo_id}@{revision or 'main'}...", "info")
+
+            # Commit exact et fichiers attendus (tailles, empreintes) : pourcentage, ETA et vérification
+            total, files, commit = None, None, revision
+            try:
+                info = HfApi().model_info(repo_id, revision=revision, token=token, files_metadata=True)
+                files, commit = manifest_from_model_info(info), info.sha
+                total = sum(f["size"] or 0 for f in files.values()) or None
+            except Exception:
+                self.log("Métadonnées du dépôt indisponibles, progression sans pourcentage ni vérification", "warning")
+
+            blobs_dir = os.path.join(hf_repo_cache_dir(repo_id), "blobs")
+
+            def on_size(size):
+                self.progress.update("download", min(size, total) if total else size, total)
+
+            # Télécharger dans le cache HF (une seule copie physique, partagée), dans un processus
+            # enfant pour pouvoir l'interrompre proprement (annulation, délai dépassé)
+            env = dict(os.environ, HF_HUB_DISABLE_PROGRESS_BARS="1")
+            if token:
+                env["HF_TOKEN"] = token
+            try:
+                with DirectoryGrowthMonitor(blobs_dir, on_size):
+                    returncode, output = run_process(
+                        [sys.executable, "-c", HF_DOWNLOAD_SCRIPT, repo_id] + ([commit] if commit else []),
+                        env=env,
+                        check_cancelled=self.check_cancelled,
+                        isolation=self.isolation,
+                        name="téléchargement HuggingFace",
+                        log=self.log
+                    )
+            except (JobCancelled, StageTimeout):
+                self.remove_incomplete_downloads(blobs_dir)
+                raise
+            snapshot_dirs = [line[len("SNAPSHOT:"):] for line in output.splitlines() if line.startswith("SNAPSHOT:")]
+            if returncode != 0 or not snapshot_dirs:
+                raise Exception(output.strip().splitlines()[-1] if output.strip() else f"code {returncode}")
+            snapshot_dir = snapshot_dirs[-1]
+            commit = os.path.basename(os.path.normpath(snapshot_dir))
+
+            # Vérifier et mémoriser la résolution : les exécutions suivantes épinglées sur ce commit
+            # n'auront besoin ni du réseau ni de re-hacher les fichiers
+            if files:
+                entry = resolutions.lookup(repo_id, commit) or {}
+                problems, verified = verify_hf_snapshot(snapshot_dir, files, entry.get("verified"), log=self.log)
+                if problems:
+                    raise Exception(f"Fichiers téléchargés invalides: {'; '.join(problems[:3])}")
+                resolutions.record(repo_id, commit, files, verified, True)
+                if not revision or not HF_COMMIT_RE.match(revision):
+                    self.log(f"Révision résolue: {commit} (épinglez-la avec hf_revision pour les builds hors ligne)", "info")
+
+            return self.materialize_base_model(repo_id, snapshot_dir)
+
+        except ImportError:
+            raise Exception("huggingface_hub n'est pas installé. Installez-le avec: pip install huggingface_hub")
+        except (JobCancelled, StageTimeout):
+            raise
+        except Exception as e:
+            raise Exception(f"Erreur lors du téléchargement du modèle: {str(e)}")
+
+    def materialize_base_model(self, repo_id, snapshot_dir):
+        """Matérialise un snapshot HF dans le store partagé (reflink/hardlink plutôt que copie)"""
+        commit = os.path.basename(os.path.normpath(snapshot_dir))
+        model_dir = os.path.join(APP_HOME, "models", f"{repo_id.replace('/', '_')}@{commit[:12]}")
+        if not os.path.exists(model_dir):
+            self.track_partial(model_dir)
+        materialize_tree(snapshot_dir, model_dir, log=self.log)
+
+        self.log(f"Modèle disponible dans: {model_dir}", "success")
+        self.result["base_revision"] = commit
+        return model_dir
+
+    def remove_incomplete_downloads(self, blobs_dir):
+        """Supprime les fichiers partiels laissés par un téléchargement HF interrompu"""
+        for path in Path(blobs_dir).glob("*.incomplete"):
+            try:
+                path.unlink()
+                self.log(f"Téléchargement partiel supprimé: {path.name}", "warning")
+            except OSError:
+                pass
+
+    def base_identity(self, base_model_path):
+        """Clé du modèle de base dans le registre : (repo HF ou chemin absolu, empreinte)"""
+        if self.spec["model_source"] == "huggingface":
+            identity = self.spec["hf_repo"]
+        else:
+            identity = os.path.abspath(base_model_path)
+        return identity, fingerprint_path(base_model_path)
+
+    def base_already_imported(self):
+        """Le modèle de base de ce job est-il déjà enregistré et présent dans Ollama ?"""
+        if not self.base_model_path:
+            return False
+        try:
+            entry = BaseModelRegistry().lookup(*self.base_identity(self.base_model_path))
+            return bool(entry) and self.client.model_exists(entry["tag"])
+        except Exception:
+            return False
+
+    def resolve_base_reference(self, base_model_path):
+        """Retourne le tag Ollama du modèle de base (import unique via le registre)"""
+        identity, digest = self.base_identity(base_model_path)
+        registry = BaseModelRegistry()
+        self.cache_hits["base_import"] = registry.lookup(identity, digest) is not None
+        # Deux jobs sur la même base n'importent qu'une fois (ce processus comme les autres)
+        return self._shared(
+            ("base_tag", identity, digest),
+            lambda: ensure_base_model_tag(base_model_path, identity, client=self.client, registry=registry,
+                                          log=self.log),
+            is_valid=self.client.model_exists
+        )
+
+    @property
+    def lora_gguf_path(self):
+        return os.path.join(self.output_dir, f"{self.spec['model_name']}-LoRA.gguf")
+
+    def convert_lora_shared(self, llama_cpp_path, lora_dir):
+        """
+        Conversion partagée : un même adaptateur converti au même moment par un autre job (ou un autre
+        processus) n'est converti qu'une fois, son GGUF est recopié vers la sortie de ce job.
+        """
+        convert_script = os.path.join(llama_cpp_path, "convert_lora_to_gguf.py")
+        try:
+            key = ("lora_gguf", fingerprint_path(os.path.join(lora_dir, "adapter_model.safetensors")),
+                   fingerprint_path(os.path.join(lora_dir, "adapter_config.json")), os.path.realpath(convert_script))
+        except OSError:
+            return self.convert_lora_to_gguf(llama_cpp_path, lora_dir)
+
+        self.cache_hits["convert"] = False
+        produced = self._shared(key, lambda: self.convert_lora_to_gguf(llama_cpp_path, lora_dir))
+        output_file = self.lora_gguf_path
+        if os.path.realpath(produced) != os.path.realpath(output_file):
+            # Copie (ou reflink) plutôt que lien : une conversion ultérieure réécrit le fichier sur place
+            self.track_partial(output_file)
+            materialize_file(produced, output_file, ["reflink", "copy"])
+            self.cache_hits["convert"] = True
+            self.log(f"GGUF du LoRA réutilisé depuis une conversion concurrente: {produced}", "success")
+            self.result["lora_gguf"] = output_file
+        return output_file
+
+    def convert_lora_to_gguf(self, llama_cpp_path, lora_dir):
+        """Convertit le LoRA (dossier PEFT) en GGUF"""
+        convert_script = os.path.join(llama_cpp_path, "convert_lora_to_gguf.py")
+
+        if not os.path.exists(convert_script):
+            raise Exception(f"Script de conversion non trouvé: {convert_script}")
+
+        # Chemin de sortie
+        output_file = self.lora_gguf_path
+
+        # Nombre de tenseurs attendus, lu dans l'en-tête safetensors
+        try:
+            header = read_safetensors_header(os.path.join(lora_dir, "adapter_model.safetensors"))
+            total = sum(1 for key in header if ".lora_" in key) or None
+        except (OSError, ValueError, struct.error):
+            total = None
+        self.progress.update("convert", 0, total)
+
+        self.log(f"Conversion en cours...", "info")
+
+        written = [0]
+
+        def on_line(line):
+            if CONVERT_TENSOR_LINE.search(line):
+                written[0] += 1
+                self.progress.update("convert", written[0], total)
+
+        cmd = [sys.executable, convert_script, "--verbose", "--outfile", output_file, lora_dir]
+        env = None
+        if self.profiler:
+            cmd, env = self.profiler.child_command("convert", cmd), self.profiler.child_env()
+
+        self.track_partial(output_file)
+        try:
+            returncode, output = run_process(
+                cmd,
+                on_line=on_line,
+                cwd=llama_cpp_path,
+                env=env,
+                check_cancelled=self.check_cancelled,
+                isolation=self.isolation,
+                name=os.path.basename(convert_script),
+                log=self.log
+            )
+
+            if returncode != 0:
+                self.log(f"Stderr: {output}", "warning")
+                raise Exception(f"Erreur de conversion: {output}")
+
+            self.log(f"LoRA converti: {output_file}", "success")
+            self.result["lora_gguf"] = output_file
+            return output_file
+
+        except (JobCancelled, StageTimeout):
+            raise
+        except Exception as e:
+            raise Exception(f"Erreur lors de la conversion: {str(e)}")
+
+    def check_memory_budget(self, base_model_path, lora_gguf_path):
+        """
+        Estime la mémoire nécessaire au service (poids, LoRA, cache KV pour num_ctx) avant l'écriture
+        du Modelfile ; au-delà du budget, avertit ou plafonne num_ctx selon num_ctx_policy.
+        """
+        try:
+            arch = read_model_architecture(base_model_path)
+        except Exception as e:
+            self.log(f"Estimation mémoire impossible: {e}", "warning")
+            return
+
+        adapter_bytes = os.path.getsize(lora_gguf_path)
+        cache_type, parallel = kv_cache_type(), ollama_num_parallel()
+        requested = int(self.spec["num_ctx"]) if self.spec["num_ctx"] else None
+        num_ctx = requested or OLLAMA_DEFAULT_NUM_CTX
+        estimate = estimate_memory(arch, num_ctx, adapter_bytes, cache_type, parallel)
+        self.log(
+            f"Mémoire estimée (num_ctx {num_ctx}{'' if requested else ', défaut Ollama'}): "
+            f"poids {_gb(estimate['weights'])} + LoRA {adapter_bytes / 1e6:.1f} Mo + "
+            f"cache KV {_gb(estimate['kv_cache'])} + marge {_gb(estimate['overhead'])} = {_gb(estimate['total'])}",
+            "info"
+        )
+        self.result["memory_estimate"] = estimate
+
+        if arch["context_length"] and num_ctx > arch["context_length"]:
+            self.log(f"num_ctx {num_ctx} dépasse le contexte d'entraînement du modèle ({arch['context_length']})",
+                     "warning")
+
+        if not self.spec["memory_budget_gb"]:
+            return
+        budget = float(self.spec["memory_budget_gb"]) * GB
+        if estimate["total"] <= budget:
+            self.log(f"Budget mémoire respecté ({_gb(estimate['total'])} ≤ {_gb(budget)})", "success")
+            return
+
+        limit = max_num_ctx(arch, budget, adapter_bytes, cache_type, parallel)
+        if not limit:
+            message = f"Le modèle ne tient pas dans le budget de {_gb(budget)}, même avec un contexte minimal"
+            if self.spec["num_ctx_policy"] == "cap":
+                raise Exception(message)
+            self.log(message, "warning")
+        elif self.spec["num_ctx_policy"] == "cap":
+            self.spec["num_ctx"] = str(limit)
+            self.result["memory_estimate"] = estimate_memory(arch, limit, adapter_bytes, cache_type, parallel)
+            self.log(f"num_ctx plafonné à {limit} (au lieu de {num_ctx}) pour tenir dans {_gb(budget)}", "warning")
+        else:
+            self.log(f"num_ctx {num_ctx} dépasse le budget de {_gb(budget)} ({_gb(estimate['total'])} estimés) : "
+                     f"num_ctx maximal {limit}", "warning")
+
+    def generate_modelfile(self, base_model_path, lora_gguf_path):
+        """Génère le Modelfile pour Ollama"""
+        output_dir = self.spec["output_dir"] or os.path.dirname(lora_gguf_path)
+        model_name = self.spec["model_name"]
+        modelfile_path = os.path.join(output_dir, f"{model_name}.Modelfile")
+
+        # Construire le contenu
+        lines = []
+
+        # FROM
+        lines.append(f"FROM {base_model_path}")
+        lines.append("")
+
+        # ADAPTER
+        lines.append(f"ADAPTER {lora_gguf_path}")
+        lines.append("")
+
+        # SYSTEM
+        system_prompt = (self.spec["system_prompt"] or "").strip()
+        if system_prompt:
+            lines.append(f'SYSTEM """')
+            lines.append(system_prompt)
+            lines.append('"""')
+            lines.append("")
+
+        # TEMPLATE
+        template = (self.spec["template"] or "").strip()
+        if template:
+            lines.append('TEMPLATE """')
+            lines.append(template)
+            lines.append('"""')
+            lines.append("")
+
+        # PARAMETERS
+        for name in ("temperature", "top_p", "top_k", "num_ctx"):
+            if self.spec[name]:
+                lines.append(f"PARAMETER {name} {self.spec[name]}")
+
+        # Stop tokens
+        for stop_token in STOP_TOKENS.get(self.spec["template_name"], []):
+            lines.append(f'PARAMETER stop "{stop_token}"')
+
+        # Écrire le fichier
+        with open(modelfile_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines))
+
+        self.log(f"Modelfile créé: {modelfile_path}", "success")
+        self.result["modelfile"] = modelfile_path
+        return modelfile_path
+
+    def create_ollama_model(self, modelfile_path):
+        """Crée le modèle Ollama via l'API (/api/create) avec suivi de progression"""
+        model_name = self.spec["model_name"]
+
+        self.log(f"Création via l'API Ollama ({self.client.host}): {model_name} ← {modelfile_path}", "info")
+
+        try:
+            # Timeout réseau borné par le délai de l'étape (un serveur muet ne bloque pas le job)
+            client = OllamaClient(self.client.host, timeout=self.remaining_time(self.client.timeout))
+            create_model_from_modelfile(
+                client, model_name, modelfile_path, self.progress, log=self.log,
+                check_cancelled=self.check_cancelled
+            )
+
+            if self.verify_model_exists(model_name, 6, 20):
+                self.log(f"✅ Modèle '{model_name}' créé et vérifié avec succès !", "success")
+            else:
+                self.log(f"⚠️ Le modèle semble créé mais n'apparaît pas dans 'ollama list'", "warning")
+
+        except (JobCancelled, StageTimeout):
+            raise
+        except Exception as e:
+            self.check_cancelled()
+            raise Exception(f"Erreur lors de la création du modèle: {str(e)}")
+
+    def deploy_to_hosts(self, modelfile_path, base_model_path):
+        """Déploie le modèle créé sur les hôtes additionnels (l'hôte principal est ignoré)"""
+        hosts = [
+            host for host in self.spec["deploy_hosts"]
+            if normalize_ollama_host(host) != self.client.host
+        ]
+        if not hosts:
+            self.log("Aucun hôte de déploiement autre que l'hôte principal", "info")
+            return
+        self.result["deployments"] = deploy_model(
+            hosts, self.spec["model_name"], modelfile_path,
+            base_model_path=base_model_path,
+            progress=self.progress,
+            log=self.log,
+            check_cancelled=self.check_cancelled,
+            timeout=self.remaining_time(600)
+        )
+
+    def verify_model_exists(self, model_name, max_attempts=5, delay=2):
+        """Vérifie que le modèle est bien enregistré dans Ollama (attente interrompue par l'annulation)"""
+        for attempt in range(max_attempts):
+            self.check_cancelled()
+            try:
+                if self.client.model_exists(model_name):
+                    return True
+            except Exception as e:
+                self.log(f"Erreur lors de la vérification: {str(e)}", "warning")
+
+            # Attendre avant la prochaine tentative
+            if attempt < max_attempts - 1:
+                self.cancel_event.wait(self.remaining_time(delay))
+
+        return False
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# HISTORIQUE DES EXÉCUTIONS (SQLite)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    model_name TEXT NOT NULL,
+    state TEXT NOT NULL,
+    error TEXT,
+    spec TEXT NOT NULL,
+    result TEXT,
+    hostname TEXT,
+    submitted_at REAL,
+    started_at REAL,
+    finished_at REAL,
+    duration REAL
+);
+CREATE TABLE IF NOT EXISTS stages (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at REAL,
+    duration REAL,
+    wait_time REAL,
+    completed REAL,
+    total REAL,
+    unit TEXT,
+    cache_hit INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_started_at ON runs(started_at);
+CREATE INDEX IF NOT EXISTS stages_stage ON stages(stage);
+"""
+
+# Champs de la spécification jamais enregistrés en clair
+HISTORY_REDACTED_FIELDS = ("hf_token",)
+
+
+class StageRecorder:
+    """Abonné de ProgressTracker : durée, attente de ressources et volume traité par étape"""
+
+    def __init__(self):
+        self.stages = {}
+        self._waiting_since = {}
+
+    def __call__(self, event):
+        stage = event["stage"]
+        if event["status"] == "waiting":
+            self._waiting_since.setdefault(stage, event["timestamp"])
+        elif event["status"] in ("done", "failed", "cancelled"):
+            started_at = event["timestamp"] - event["elapsed"]
+            waiting_since = self._waiting_since.get(stage)
+            self.stages[stage] = {
+                "stage": stage,
+                "status": event["status"],
+                "started_at": started_at,
+                "duration": event["elapsed"],
+                "wait_time": max(0.0, started_at - waiting_since) if waiting_since else 0.0,
+                "completed": event["completed"],
+                "total": event["total"],
+                "unit": event["unit"]
+            }
+
+
+class RunHistory:
+    """Historique persistant des jobs (spécification, durées par étape, volumes, cache, résultat)"""
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else APP_HOME / "history.db"
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.executescript(HISTORY_SCHEMA)
+        return conn
+
+    def record(self, job, stages, cache_hits=None):
+        """Enregistre un job terminé et ses étapes, retourne l'identifiant de l'exécution"""
+        spec = dict(job.spec)
+        for field in HISTORY_REDACTED_FIELDS:
+            if spec.get(field):
+                spec[field] = "***"
+        cache_hits = cache_hits or {}
+        duration = job.finished_at - job.started_at if job.started_at and job.finished_at else None
+
+        with self._lock, contextlib.closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                "INSERT INTO runs (model_name, state, error, spec, result, hostname, submitted_at, started_at, "
+                "finished_at, duration) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.spec["model_name"], job.state, job.error, json.dumps(spec, ensure_ascii=False),
+                 json.dumps(job.result, ensure_ascii=False, default=str) if job.result else None,
+                 platform.node(), job.submitted_at, job.started_at, job.finished_at, duration)
+            )
+            run_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO stages (run_id, stage, status, started_at, duration, wait_time, completed, total, "
+                "unit, cache_hit) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (run_id, s["stage"], s["status"], s["started_at"], s["duration"], s["wait_time"],
+                     s["completed"], s["total"], s["unit"],
+                     None if s["stage"] not in cache_hits else int(bool(cache_hits[s["stage"]])))
+                    for s in stages.values()
+                ]
+            )
+        return run_id
+
+    def runs(self, since=None, model=None):
+        query, params = "SELECT * FROM runs WHERE started_at >= ?", [since or 0]
+        if model:
+            query += " AND model_name LIKE ?"
+            params.append(model)
+        with self._lock, contextlib.closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute(query + " ORDER BY started_at", params)]
+
+    def stages(self, since=None, model=None):
+        query = ("SELECT stages.*, runs.model_name FROM stages JOIN runs ON runs.id = stages.run_id "
+                 "WHERE runs.started_at >= ?")
+        params = [since or 0]
+        if model:
+            query += " AND runs.model_name LIKE ?"
+            params.append(model)
+        with self._lock, contextlib.closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute(query + " ORDER BY stages.started_at", params)]
+
+
+def _short_duration(seconds):
+    if seconds is None:
+        return "—"
+    return f"{seconds:.1f} s" if seconds < 60 else format_duration(seconds)
+
+
+def _text_table(rows):
+    widths = [max(len(str(row[i])) for row in rows) for i in range(len(rows[0]))]
+    lines = ["  ".join(str(value).ljust(width) for value, width in zip(row, widths)).rstrip() for row in rows]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
+
+
+def format_history_report(history=None, days=30, model=None, slowest=10):
+    """
+    Rapport texte de l'historique : percentiles par étape, tendance hebdomadaire
+    (durée médiane) et exécutions les plus lentes, pour repérer les régressions.
+    """
+    history = history or RunHistory()
+    since = time.time() - days * 86400
+    runs = history.runs(since, model)
+    if not runs:
+        return f"Aucune exécution enregistrée sur les {days} derniers jours ({history.path})"
+    stages = [s for s in history.stages(since, model) if s["status"] == "done"]
+
+    states = collections.Counter(run["state"] for run in runs)
+    lines = [
+        f"Historique : {len(runs)} exécution(s) sur {days} jours — {states['done']} réussie(s), "
+        f"{states['failed']} échec(s), {states['cancelled']} annulée(s)",
+        ""
+    ]
+
+    order = list(STAGE_LABELS)
+    by_stage = collections.defaultdict(list)
+    for stage in stages:
+        by_stage[stage["stage"]].append(stage)
+    names = sorted(by_stage, key=lambda name: order.index(name) if name in order else len(order))
+
+    rows = [("Étape", "N", "p50", "p95", "max", "attente p95", "débit moyen", "cache")]
+    for name in names:
+        records = by_stage[name]
+        durations = [r["duration"] for r in records]
+        byte_records = [r for r in records if r["unit"] == "B" and r["completed"] and r["duration"]]
+        rate = (sum(r["completed"] for r in byte_records) / sum(r["duration"] for r in byte_records)
+                if byte_records else None)
+        hits = [r["cache_hit"] for r in records if r["cache_hit"] is not None]
+        rows.append((
+            STAGE_LABELS.get(name, name), len(records),
+            _short_duration(percentile(durations, 50)), _short_duration(percentile(durations, 95)),
+            _short_duration(max(durations)), _short_duration(percentile([r["wait_time"] or 0 for r in records], 95)),
+            f"{rate / 1e6:.1f} Mo/s" if rate else "—",
+            f"{100 * sum(hits) / len(hits):.0f} %" if hits else "—"
+        ))
+    lines += ["Durées par étape (étapes réussies) :", _text_table(rows), ""]
+
+    # Tendance : durée médiane par semaine, pour chaque étape
+    weeks = sorted({time.strftime("%G-W%V", time.localtime(s["started_at"])) for s in stages})[-6:]
+    if len(weeks) > 1:
+        rows = [("Étape",) + tuple(weeks)]
+        for name in names:
+            row = [STAGE_LABELS.get(name, name)]
+            for week in weeks:
+                durations = [r["duration"] for r in by_stage[name]
+                             if time.strftime("%G-W%V", time.localtime(r["started_at"])) == week]
+                row.append(_short_duration(percentile(durations, 50)) if durations else "—")
+            rows.append(tuple(row))
+        lines += ["Tendance hebdomadaire (durée médiane) :", _text_table(rows), ""]
+
+    slowest_stage = {}
+    for stage in history.stages(since, model):
+        if stage["duration"] is not None and stage["duration"] > slowest_stage.get(stage["run_id"], ("", -1))[1]:
+            slowest_stage[stage["run_id"]] = (stage["stage"], stage["duration"])
+    rows = [("Run", "Date", "Modèle", "État", "Durée", "Étape la plus longue")]
+    for run in sorted(runs, key=lambda r: r["duration"] or 0, reverse=True)[:slowest]:
+        stage, duration = slowest_stage.get(run["id"], (None, None))
+        rows.append((
+            f"#{run['id']}", time.strftime("%Y-%m-%d %H:%M", time.localtime(run["started_at"])),
+            run["model_name"], run["state"], _short_duration(run["duration"]),
+            f"{STAGE_LABELS.get(stage, stage)} ({_short_duration(duration)})" if stage else "—"
+        ))
+    lines += ["Exécutions les plus lentes :", _text_table(rows)]
+    return "\n".join(lines)
+
+
+def run_history_command(args):
+    """Affiche les statistiques de l'historique des exécutions"""
+    history = RunHistory(args.db) if args.db else RunHistory()
+    sys.stdout.write(format_history_report(history, args.days, args.model, args.slowest) + "\n")
+    return 0
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MÉTRIQUES (FORMAT TEXTE PROMETHEUS)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+METRICS_PREFIX = "lora_to_ollama"
+METRICS_DURATION_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, 21600)
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Familles exposées : nom -> (type, description)
+METRIC_FAMILIES = {
+    "runs_total": ("counter", "Jobs terminés, par état final"),
+    "run_duration_seconds": ("histogram", "Durée totale des jobs"),
+    "stage_duration_seconds": ("histogram", "Durée des étapes réussies"),
+    "stage_wait_seconds": ("histogram", "Attente de ressources avant chaque étape"),
+    "stage_failures_total": ("counter", "Étapes échouées ou annulées, par étape et statut"),
+    "stage_bytes_total": ("counter", "Octets traités par étape (téléchargés, envoyés à Ollama)"),
+    "written_bytes_total": ("counter", "Octets écrits sur disque par artefact (GGUF, LoRA fusionné, Modelfile)"),
+    "cache_lookups_total": ("counter", "Consultations des caches par étape (result=hit|miss)"),
+    "queue_depth": ("gauge", "Jobs en attente dans la file"),
+    "jobs_running": ("gauge", "Jobs en cours d'exécution"),
+    "start_time_seconds": ("gauge", "Démarrage du processus (timestamp Unix)")
+}
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _metric_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in labels) + "}"
+
+
+def _metric_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metrics:
+    """
+    Compteurs, jauges et histogrammes du convertisseur, exposés au format texte Prometheus
+    (endpoint HTTP /metrics ou fichier pour le textfile collector de node_exporter).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {name: {} for name in METRIC_FAMILIES}
+        self._collectors = []
+        self.set("start_time_seconds", time.time())
+
+    def add_collector(self, collector):
+        """Fonction appelée avant chaque rendu (jauges lues à la demande, ex: profondeur de file)"""
+        self._collectors.append(collector)
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[name][key] = self._values[name].get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._values[name][tuple(sorted(labels.items()))] = value
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            histogram = self._values[name].setdefault(
+                key, {"buckets": [0] * len(METRICS_DURATION_BUCKETS), "sum": 0.0, "count": 0}
+            )
+            for index, bound in enumerate(METRICS_DURATION_BUCKETS):
+                if value <= bound:
+                    histogram["buckets"][index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def record_job(self, job, stages, cache_hits=None):
+        """Comptabilise un job terminé à partir des étapes relevées par StageRecorder"""
+        self.inc("runs_total", state=job.state)
+        if job.started_at and job.finished_at:
+            self.observe("run_duration_seconds", job.finished_at - job.started_at)
+
+        for stage in stages.values():
+            name = stage["stage"]
+            if stage["wait_time"]:
+                self.observe("stage_wait_seconds", stage["wait_time"], stage=name)
+            if stage["status"] == "done":
+                self.observe("stage_duration_seconds", stage["duration"], stage=name)
+            else:
+                self.inc("stage_failures_total", stage=name, status=stage["status"])
+            if stage["unit"] == "B" and stage["completed"]:
+                self.inc("stage_bytes_total", stage["completed"], stage=name)
+
+        for name, hit in (cache_hits or {}).items():
+            self.inc("cache_lookups_total", stage=name, result="hit" if hit else "miss")
+
+        for artifact in ("lora_gguf", "merged_lora", "modelfile"):
+            path = (job.result or {}).get(artifact)
+            if path and os.path.exists(path):
+                size = (sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+                        if os.path.isdir(path) else os.path.getsize(path))
+                self.inc("written_bytes_total", size, artifact=artifact)
+
+    def render(self):
+        """Exposition au format texte Prometheus 0.0.4"""
+        for collector in self._collectors:
+            collector(self)
+
+        lines = []
+        with self._lock:
+            for name, (kind, description) in METRIC_FAMILIES.items():
+                full_name = f"{METRICS_PREFIX}_{name}"
+                lines += [f"# HELP {full_name} {description}", f"# TYPE {full_name} {kind}"]
+                for labels, value in sorted(self._values[name].items()):
+                    if kind != "histogram":
+                        lines.append(f"{full_name}{_metric_labels(labels)} {_metric_number(value)}")
+                        continue
+                    for bound, count in zip(METRICS_DURATION_BUCKETS + (float("inf"),),
+                                            value["buckets"] + [value["count"]]):
+                        bucket_labels = labels + (("le", _metric_number(bound)),)
+                        lines.append(f"{full_name}_bucket{_metric_labels(bucket_labels)} {count}")
+                    lines.append(f"{full_name}_sum{_metric_labels(labels)} {value['sum']:.3f}")
+                    lines.append(f"{full_name}_count{_metric_labels(labels)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Écrit les métriques dans un fichier (remplacement atomique, lisible par node_exporter)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+class MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+    """GET /metrics : exposition des métriques du processus"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if urllib.parse.urlsplit(self.path).path != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", METRICS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(metrics, port, host="127.0.0.1"):
+    """Sert /metrics dans un thread d'arrière-plan, retourne le serveur (shutdown() pour l'arrêter)"""
+    server = http.server.ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    server.daemon_threads = True
+    server.metrics = metrics
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# FILE D'ATTENTE ET ORDONNANCEMENT DES RESSOURCES
+# ═══════════════════════════════════════════════════════════════════════════════
+
+DEFAULT_BUDGETS = {
+    "max_jobs": 4,            # jobs exécutés en parallèle (étapes légères comprises)
+    "max_downloads": 1,       # transferts simultanés (modèles de base, llama.cpp, import dans Ollama)
+    "max_conversions": 1,     # fusions / conversions GGUF simultanées
+    "ram_budget_gb": None,    # RAM réservable par les étapes lourdes (None : RAM disponible)
+    "min_free_disk_gb": 10    # espace disque à conserver libre
+}
+
+# Étapes lourdes et ressource qu'elles consomment ; les autres étapes ne sont pas limitées
+HEAVY_STAGES = {
+    "llama_cpp": "downloads",
+    "download": "downloads",
+    "base_import": "downloads",
+    "merge": "conversions",
+    "convert": "conversions"
+}
+
+GB = 1024 ** 3
+
+
+def available_memory():
+    """RAM disponible en octets (None si indéterminable sur ce système)"""
+    try:
+        with open("/proc/meminfo", 'r') as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    if sys.platform == "win32":
+        import ctypes
+
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                        ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                        ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                        ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                        ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullAvailPhys
+
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def free_disk_space(path):
+    """Espace libre en octets sur le disque contenant `path` (premier parent existant)"""
+    path = os.path.abspath(path or os.getcwd())
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return shutil.disk_usage(path).free
+
+
+class ResourceScheduler:
+    """
+    Arbitre les étapes lourdes de tous les jobs : nombre de téléchargements et de
+    conversions simultanés, RAM réservée et espace disque libre.
+    """
+
+    def __init__(self, budgets=None):
+        self.budgets = dict(DEFAULT_BUDGETS)
+        self.budgets.update(budgets or {})
+        self._cond = threading.Condition()
+        self._active = {"downloads": 0, "conversions": 0}
+        self._reserved_ram = 0
+        self._reserved_disk = 0
+        self.waiting = 0
+
+    def configure(self, budgets):
+        with self._cond:
+            self.budgets.update({k: v for k, v in budgets.items() if k in DEFAULT_BUDGETS})
+            self._cond.notify_all()
+
+    def _limit(self, kind):
+        return int(self.budgets[f"max_{kind}"] or 1)
+
+    def _check(self, kind, ram_bytes, disk_bytes, disk_path):
+        """Retourne None si la réservation est possible, sinon la raison de l'attente"""
+        if self._active[kind] >= self._limit(kind):
+            return f"{self._active[kind]} {kind} en cours"
+
+        busy = any(self._active.values())
+        if ram_bytes:
+            budget = self.budgets["ram_budget_gb"]
+            budget = budget * GB if budget else available_memory()
+            # Une étape seule est toujours autorisée, même si elle dépasse le budget
+            if budget is not None and busy and self._reserved_ram + ram_bytes > budget:
+                return f"RAM insuffisante ({(budget - self._reserved_ram) / GB:.1f} Go libres)"
+
+        if disk_path:
+            margin = (self.budgets["min_free_disk_gb"] or 0) * GB
+            free = free_disk_space(disk_path) - self._reserved_disk
+            if free - disk_bytes < margin:
+                if not busy:
+                    raise Exception(
+                        f"Espace disque insuffisant sur {disk_path}: {free / GB:.1f} Go libres, "
+                        f"{(disk_bytes + margin) / GB:.1f} Go nécessaires"
+                    )
+                return f"disque insuffisant ({free / GB:.1f} Go libres)"
+        return None
+
+    @contextlib.contextmanager
+    def slot(self, kind, ram_bytes=0, disk_bytes=0, disk_path=None, on_wait=None, check_cancelled=None):
+        """
+        Réserve une place pour une étape lourde (bloque tant que les budgets sont dépassés).
+        check_cancelled est appelé pendant l'attente pour pouvoir l'abandonner.
+        """
+        with self._cond:
+            reason = self._check(kind, ram_bytes, disk_bytes, disk_path)
+            if reason:
+                self.waiting += 1
+                if on_wait:
+                    on_wait(reason)
+                try:
+                    while reason:
+                        # Ré-évaluation périodique : RAM et disque peuvent se libérer hors de l'application
+                        self._cond.wait(0.5 if check_cancelled else 2.0)
+                        if check_cancelled:
+                            check_cancelled()
+                        reason = self._check(kind, ram_bytes, disk_bytes, disk_path)
+                finally:
+                    self.waiting -= 1
+            self._active[kind] += 1
+            self._reserved_ram += ram_bytes
+            self._reserved_disk += disk_bytes
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active[kind] -= 1
+                self._reserved_ram -= ram_bytes
+                self._reserved_disk -= disk_bytes
+                self._cond.notify_all()
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                "active": dict(self._active),
+                "waiting": self.waiting,
+                "reserved_ram": self._reserved_ram,
+                "reserved_disk": self._reserved_disk,
+                "budgets": dict(self.budgets)
+            }
+
+
+def job_fingerprint(spec):
+    """Empreinte d'une spécification de job (hors secrets) pour dédupliquer les soumissions"""
+    public = {key: value for key, value in spec.items() if key != "hf_token"}
+    return hashlib.sha256(json.dumps(public, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class ConversionJob:
+    """Un job de la file : spécification, état courant et résultat"""
+
+    _counter = 0
+    _counter_lock = threading.Lock()
+
+    def __init__(self, spec, log=None, listeners=None, max_events=5000):
+        with ConversionJob._counter_lock:
+            ConversionJob._counter += 1
+            self.id = ConversionJob._counter
+        self.spec = make_job_spec(spec)
+        self.fingerprint = job_fingerprint(self.spec)
+        self.external_log = log
+        self.listeners = list(listeners or [])
+        self.events = collections.deque(maxlen=max_events)
+        self.events_cond = threading.Condition()
+        self.next_seq = 0
+        self.cancel_event = threading.Event()
+        self.state = "queued"
+        self.stage = None
+        self.stage_status = None
+        self.percent = None
+        self.detail = ""
+        self.error = None
+        self.result = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = threading.Event()
+
+    def record(self, event):
+        """Conserve un événement (log, progression, état) pour les clients qui suivent le job"""
+        with self.events_cond:
+            self.events.append((self.next_seq, dict(event, job=self.id)))
+            self.next_seq += 1
+            self.events_cond.notify_all()
+
+    def events_since(self, seq, timeout=None):
+        """Retourne [(seq, événement)] à partir de seq, en attendant au plus `timeout` s s'il n'y en a pas"""
+        with self.events_cond:
+            if self.next_seq <= seq and timeout:
+                self.events_cond.wait(timeout)
+            return [(n, event) for n, event in self.events if n >= seq]
+
+    def log(self, message, level="info"):
+        self.record({"event": "log", "level": level, "message": message, "timestamp": time.time()})
+        if self.external_log:
+            self.external_log(message, level)
+
+    def set_state(self, state):
+        self.state = state
+        self.record({"event": "state", "state": state, "error": self.error, "timestamp": time.time()})
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def compact(self):
+        """Job terminé : ne garde que logs et changements d'état (la progression n'est plus utile)"""
+        with self.events_cond:
+            self.events = collections.deque(
+                (item for item in self.events if item[1]["event"] != "progress"), maxlen=self.events.maxlen
+            )
+
+    def on_progress(self, event):
+        self.stage = event["stage"]
+        self.stage_status = event["status"]
+        self.percent = event["percent"]
+        self.detail = format_progress(event)
+        self.record(event)
+        for listener in self.listeners:
+            listener(self, event)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "model_name": self.spec["model_name"],
+            "state": self.state,
+            "stage": self.stage,
+            "stage_status": self.stage_status,
+            "percent": self.percent,
+            "detail": self.detail,
+            "error": self.error,
+            "result": self.result,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+class JobQueue:
+    """
+    File de jobs de conversion : jusqu'à `max_jobs` pipelines tournent en parallèle,
+    leurs étapes lourdes étant arbitrées par un ResourceScheduler commun.
+    Avec keep_finished, seuls les N derniers jobs terminés restent en mémoire (serveur de longue
+    durée) ; les plus anciens ne sont plus consultables que dans l'historique SQLite.
+    """
+
+    def __init__(self, scheduler=None, on_update=None, history=None, metrics=None, isolation=None,
+                 keep_finished=None):
+        self.scheduler = scheduler or ResourceScheduler()
+        # Contraintes par défaut des processus enfants, complétées/surchargées par chaque job
+        self.isolation = {k: v for k, v in (isolation or {}).items() if v is not None}
+        self.on_update = on_update
+        self.history = history or RunHistory()
+        self.metrics = metrics or Metrics()
+        self.metrics.add_collector(self._collect_metrics)
+        self.keep_finished = keep_finished
+        self._jobs = []
+        self._pending = []
+        self._running = 0
+        self._lock = threading.Lock()
+
+    def submit(self, spec, log=None, listeners=None, dedupe=False):
+        """
+        Ajoute un job. Avec dedupe=True, un job identique en file ou en cours est retourné
+        au lieu d'en créer un nouveau (retourne (job, dédupliqué)). Un job terminé n'est jamais
+        réutilisé : l'empreinte ne couvre que la spécification, pas le contenu des fichiers.
+        """
+        spec = make_job_spec(spec)
+        fingerprint = job_fingerprint(spec)
+        with self._lock:
+            if dedupe:
+                for existing in self._jobs:
+                    if existing.fingerprint == fingerprint and existing.state in ("queued", "running"):
+                        return existing, True
+            job = ConversionJob(spec, log=log, listeners=listeners)
+            job.listeners.append(lambda job, event: self._notify(job))
+            self._jobs.append(job)
+            self._pending.append(job)
+        self._notify(job)
+        self._dispatch()
+        return (job, False) if dedupe else job
+
+    def _notify(self, job):
+        if self.on_update:
+            self.on_update(job)
+
+    def _dispatch(self):
+        with self._lock:
+            to_start = []
+            while self._pending and self._running < int(self.scheduler.budgets["max_jobs"] or 1):
+                self._running += 1
+                to_start.append(self._pending.pop(0))
+        for job in to_start:
+            threading.Thread(target=self._run_job, args=(job,), daemon=True).start()
+
+    def _run_job(self, job):
+        job.started_at = time.time()
+        job.set_state("running")
+        self._notify(job)
+        recorder = StageRecorder()
+        pipeline = None
+        try:
+            spec = dict(job.spec)
+            spec["isolation"] = dict(self.isolation, **{k: v for k, v in (spec["isolation"] or {}).items()
+                                                        if v is not None})
+            pipeline = ConversionPipeline(
+                spec,
+                log=job.log,
+                progress=ProgressTracker([job.on_progress, recorder]),
+                scheduler=self.scheduler,
+                cancel_event=job.cancel_event
+            )
+            job.result = pipeline.run()
+            job.set_state("done")
+        except JobCancelled:
+            job.log("Job annulé", "warning")
+            job.set_state("cancelled")
+        except Exception as e:
+            job.error = str(e)
+            job.log(f"Erreur: {str(e)}", "error")
+            job.set_state("failed")
+        finally:
+            job.finished_at = time.time()
+            try:
+                self.history.record(job, recorder.stages, pipeline.cache_hits if pipeline else None)
+            except (sqlite3.Error, OSError) as e:
+                job.log(f"Historique non enregistré: {e}", "warning")
+            self.metrics.record_job(job, recorder.stages, pipeline.cache_hits if pipeline else None)
+            with self._lock:
+                self._running -= 1
+            job.done.set()
+            self._retire(job)
+            self._notify(job)
+            self._dispatch()
+
+    def cancel(self, job_id):
+        """
+        Annule un job : retiré de la file s'il attend ; sinon l'étape en cours est interrompue
+        (processus enfants arrêtés, sorties partielles supprimées) et la place libérée.
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+        with self._lock:
+            pending = job in self._pending
+            if pending:
+                self._pending.remove(job)
+        job.cancel()
+        if pending:
+            job.finished_at = time.time()
+            job.set_state("cancelled")
+            job.done.set()
+            self._retire(job)
+            self._notify(job)
+        return job
+
+    def _retire(self, job):
+        """Allège un job terminé et oublie les plus anciens au-delà de keep_finished"""
+        job.compact()
+        if self.keep_finished is None:
+            return
+        with self._lock:
+            finished = [existing for existing in self._jobs if existing.done.is_set()]
+            expired = set(finished[:max(0, len(finished) - self.keep_finished)])
+            if expired:
+                self._jobs = [existing for existing in self._jobs if existing not in expired]
+
+    def _collect_metrics(self, metrics):
+        with self._lock:
+            metrics.set("queue_depth", len(self._pending))
+            metrics.set("jobs_running", self._running)
+
+    def get(self, job_id):
+        with self._lock:
+            for job in self._jobs:
+                if job.id == job_id:
+                    return job
+        return None
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs)
+
+    def depth(self):
+        with self._lock:
+            return len(self._pending)
+
+    def wait_all(self, timeout=None):
+        """Attend la fin de tous les jobs (au plus `timeout` s au total), retourne True si tous sont finis"""
+        end = time.time() + timeout if timeout is not None else None
+        for job in self.jobs():
+            if not job.done.wait(None if end is None else max(0.0, end - time.time())):
+                return False
+        return True
+
+    def cancel_all(self):
+        """Annule tous les jobs non terminés (arrêt de l'application)"""
+        for job in self.jobs():
+            if not job.done.is_set():
+                self.cancel(job.id)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MODE SERVEUR (API HTTP DE JOBS)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Jobs terminés consultables via l'API (les plus anciens ne restent que dans l'historique)
+SERVER_KEEP_FINISHED = 200
+# Artefacts d'un job exposés en téléchargement (clé du résultat -> nom public)
+JOB_ARTIFACTS = ["lora_gguf", "modelfile"]
+
+
+class ConversionRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    API HTTP du serveur de conversion :
+
+    GET  /health                       état du serveur et du scheduler
+    GET  /metrics                      métriques au format texte Prometheus
+    POST /jobs                         soumet un job (corps : spécification JSON)
+    GET  /jobs                         liste des jobs
+    GET  /jobs/<id>                    état d'un job
+    GET  /jobs/<id>/events?since=N     flux NDJSON des événements (logs, progression, état)
+    GET  /jobs/<id>/logs               logs en texte brut
+    GET  /jobs/<id>/artifacts          artefacts produits
+    GET  /jobs/<id>/artifacts/<nom>    téléchargement d'un artefact
+    POST /jobs/<id>/cancel             annulation (également DELETE /jobs/<id>)
+    """
+
+    protocol_version = "HTTP/1.1"
+    server_version = "LoraToOllama"
+
+    @property
+    def queue(self):
+        return self.server.queue
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message):
+        self.send_json(status, {"error": message})
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def route(self):
+        """Découpe le chemin : (segments, paramètres de requête)"""
+        parsed = urllib.parse.urlsplit(self.path)
+        parts = [urllib.parse.unquote(p) for p in parsed.path.strip("/").split("/") if p]
+        return parts, urllib.parse.parse_qs(parsed.query)
+
+    def find_job(self, job_id):
+        job = self.queue.get(int(job_id)) if str(job_id).isdigit() else None
+        if job is None:
+            self.send_error_json(404, f"Job inconnu: {job_id}")
+        return job
+
+    def do_GET(self):
+        parts, query = self.route()
+
+        if parts == ["health"]:
+            return self.send_json(200, {"status": "ok", "queue_depth": self.queue.depth(),
+                                        "scheduler": self.queue.scheduler.snapshot()})
+        if parts == ["metrics"]:
+            body = self.queue.metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", METRICS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            return self.wfile.write(body)
+        if parts == ["jobs"]:
+            return self.send_json(200, {"jobs": [job.to_dict() for job in self.queue.jobs()]})
+        if len(parts) < 2 or parts[0] != "jobs":
+            return self.send_error_json(404, "Route inconnue")
+
+        job = self.find_job(parts[1])
+        if job is None:
+            return
+        if len(parts) == 2:
+            return self.send_json(200, job.to_dict())
+        if parts[2] == "events":
+            since = query.get("since", ["0"])[0]
+            if not since.isdigit():
+                return self.send_error_json(400, f"Paramètre since invalide (entier positif attendu): {since}")
+            return self.stream_events(job, int(since))
+        if parts[2] == "logs":
+            lines = [
+                f"[{event['level']}] {event['message']}"
+                for _, event in job.events_since(0) if event["event"] == "log"
+            ]
+            body = ("\n".join(lines) + "\n").encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            return self.wfile.write(body)
+        if parts[2] == "artifacts":
+            artifacts = self.job_artifacts(job)
+            if len(parts) == 3:
+                return self.send_json(200, {name: os.path.getsize(path) for name, path in artifacts.items()})
+            if len(parts) == 4 and parts[3] in artifacts:
+                return self.send_file(artifacts[parts[3]])
+            return self.send_error_json(404, "Artefact inconnu")
+        self.send_error_json(404, "Route inconnue")
+
+    def do_POST(self):
+        parts, _ = self.route()
+
+        if parts == ["jobs"]:
+            try:
+                spec = make_job_spec(self.read_json())
+                errors = validate_job_spec(spec)
+            except (ValueError, TypeError, KeyError, AttributeError) as e:
+                # JSON illisible ou champs du mauvais type : 400 plutôt qu'une connexion coupée
+                return self.send_error_json(400, f"Spécification invalide: {e}")
+            if errors:
+                return self.send_json(400, {"error": "Spécification invalide", "details": errors})
+            job, deduplicated = self.queue.submit(spec, dedupe=True)
+            return self.send_json(200 if deduplicated else 201, dict(job.to_dict(), deduplicated=deduplicated))
+
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "cancel":
+            return self.cancel_job(parts[1])
+        self.send_error_json(404, "Route inconnue")
+
+    def do_DELETE(self):
+        parts, _ = self.route()
+        if len(parts) == 2 and parts[0] == "jobs":
+            return self.cancel_job(parts[1])
+        self.send_error_json(404, "Route inconnue")
+
+    def cancel_job(self, job_id):
+        job = self.find_job(job_id)
+        if job is None:
+            return
+        self.queue.cancel(job.id)
+        self.send_json(202, job.to_dict())
+
+    def job_artifacts(self, job):
+        result = job.result or {}
+        return {
+            os.path.basename(result[key]): result[key]
+            for key in JOB_ARTIFACTS if result.get(key) and os.path.exists(result[key])
+        }
+
+    def send_file(self, path, chunk_size=1024 * 1024):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.send_header("Content-Disposition", f'attachment; filename="{os.path.basename(path)}"')
+        self.end_headers()
+        with open(path, 'rb') as f:
+            shutil.copyfileobj(f, self.wfile, chunk_size)
+
+    def stream_events(self, job, since):
+        """Diffuse les événements du job en NDJSON (chunked) jusqu'à sa fin"""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        seq = since
+        try:
+            while True:
+                finished = job.done.is_set()
+                for n, event in job.events_since(seq, timeout=1.0):
+                    data = (json.dumps(dict(event, seq=n), ensure_ascii=False, default=str) + "\n").encode("utf-8")
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    seq = n + 1
+                self.wfile.flush()
+                if finished:
+                    break
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class ConversionServer(http.server.ThreadingHTTPServer):
+    """Serveur HTTP de conversion : une file et un scheduler communs à tous les utilisateurs"""
+
+    daemon_threads = True
+
+    def __init__(self, address, queue=None, verbose=False):
+        super().__init__(address, ConversionRequestHandler)
+        self.queue = queue or JobQueue()
+        self.verbose = verbose
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def run_server(args):
+    """Lance le serveur de conversion (Ctrl+C pour arrêter)"""
+    isolation = isolation_from_args(args)
+    errors = validate_isolation(isolation)
+    if errors:
+        for error in errors:
+            _print_log(error, "error")
+        return 2
+
+    budgets = {key: getattr(args, key) for key in DEFAULT_BUDGETS if getattr(args, key) is not None}
+    queue = JobQueue(ResourceScheduler(budgets), isolation=isolation, keep_finished=args.keep_jobs)
+    server = ConversionServer((args.host, args.port), queue, verbose=args.verbose)
+    _print_log(f"Serveur de conversion à l'écoute sur {server.url} (métriques: {server.url}/metrics)", "success")
+    metrics_server = start_metrics_endpoint(server.queue.metrics, args)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        _print_log("Arrêt du serveur", "info")
+        server.queue.cancel_all()
+        server.queue.wait_all(timeout=30)
+    finally:
+        server.server_close()
+        stop_metrics_endpoint(server.queue.metrics, metrics_server, args)
+    return 0
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# TEST DE CHARGE (CLIENTS CONCURRENTS SUR L'API OLLAMA)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+LOAD_TEST_PERCENTILES = (50, 95, 99)
+
+
+def load_prompts(path):
+    """Lit un fichier de prompts : un prompt par ligne, ou JSON Lines avec un champ "prompt" """
+    prompts = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                line = json.loads(line)["prompt"]
+            prompts.append(line)
+    if not prompts:
+        raise Exception(f"Aucun prompt dans {path}")
+    return prompts
+
+
+def percentile(values, q):
+    """Percentile q (0-100) par interpolation linéaire, None si aucune valeur"""
+    values = sorted(values)
+    if not values:
+        return None
+    position = (len(values) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+async def _read_http_body(reader, headers):
+    """Itère sur le corps d'une réponse HTTP/1.1 (chunked ou jusqu'à la fermeture)"""
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+            if size == 0:
+                await reader.readline()
+                return
+            yield await reader.readexactly(size)
+            await reader.readline()
+    elif "content-length" in headers:
+        yield await reader.readexactly(int(headers["content-length"]))
+    else:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                return
+            yield data
+
+
+async def ollama_generate_async(host, model, prompt, options=None):
+    """
+    Requête /api/generate en streaming (asyncio, sans dépendance) :
+    retourne latence totale, délai du premier token et nombre de tokens générés.
+    """
+    parsed = urllib.parse.urlsplit(normalize_ollama_host(host))
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection(parsed.hostname, parsed.port, ssl=parsed.scheme == "https")
+    try:
+        payload = {"model": model, "prompt": prompt, "stream": True}
+        if options:
+            payload["options"] = options
+        body = json.dumps(payload).encode("utf-8")
+        writer.write(
+            f"POST /api/generate HTTP/1.1\r\nHost: {parsed.hostname}:{parsed.port}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("ascii")
+            + body
+        )
+        await writer.drain()
+
+        status = int((await reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        ttft, chunks, final, buffer = None, 0, {}, b""
+
+        def handle(line):
+            nonlocal ttft, chunks, final
+            if not line.strip():
+                return
+            event = json.loads(line)
+            if "error" in event:
+                raise Exception(event["error"])
+            if event.get("response"):
+                chunks += 1
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+            if event.get("done"):
+                final = event
+
+        async for data in _read_http_body(reader, headers):
+            buffer += data
+            if status >= 400:
+                continue
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                handle(line)
+        if status >= 400:
+            raise Exception(f"HTTP {status}: {buffer.decode('utf-8', 'replace').strip()}")
+        # Dernier objet sans saut de ligne final
+        handle(buffer)
+    finally:
+        writer.close()
+        with contextlib.suppress(Exception):
+            await writer.wait_closed()
+
+    return {
+        "latency": time.perf_counter() - start,
+        "ttft": ttft,
+        "tokens": final.get("eval_count") or chunks
+    }
+
+
+async def _load_test_async(host, model, prompts, concurrency, total_requests, options, timeout, warmup):
+    # Requêtes de chauffe (chargement du modèle en mémoire), exclues des mesures
+    for prompt in prompts[:warmup]:
+        await asyncio.wait_for(ollama_generate_async(host, model, prompt, options), timeout)
+
+    pending = asyncio.Queue()
+    for index in range(total_requests):
+        pending.put_nowait(prompts[index % len(prompts)])
+    results, errors = [], []
+
+    async def client():
+        while True:
+            try:
+                prompt = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                results.append(await asyncio.wait_for(ollama_generate_async(host, model, prompt, options), timeout))
+            except Exception as e:
+                errors.append(str(e) or type(e).__name__)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(max(1, concurrency))))
+    return results, errors, time.perf_counter() - start
+
+
+def run_load_test(host, model, prompts, concurrency=4, total_requests=None, options=None, timeout=300, warmup=1,
+                  log=_print_log):
+    """
+    Envoie `total_requests` requêtes (par défaut une par prompt) au modèle avec `concurrency`
+    clients simultanés. Retourne débit, latences et délai du premier token (percentiles).
+    """
+    total_requests = total_requests or len(prompts)
+    log(f"Test de charge: {model} — {total_requests} requêtes, {concurrency} clients simultanés", "info")
+    results, errors, wall_time = asyncio.run(
+        _load_test_async(host, model, prompts, concurrency, total_requests, options, timeout, warmup)
+    )
+
+    latencies = [r["latency"] for r in results]
+    ttfts = [r["ttft"] for r in results if r["ttft"] is not None]
+    tokens = sum(r["tokens"] for r in results)
+    report = {
+        "model": model,
+        "requests": total_requests,
+        "concurrency": concurrency,
+        "succeeded": len(results),
+        "errors": len(errors),
+        "wall_time": wall_time,
+        "requests_per_s": len(results) / wall_time if wall_time else 0.0,
+        "tokens_per_s": tokens / wall_time if wall_time else 0.0
+    }
+    for q in LOAD_TEST_PERCENTILES:
+        report[f"latency_p{q}"] = percentile(latencies, q)
+        report[f"ttft_p{q}"] = percentile(ttfts, q)
+    if errors:
+        log(f"{len(errors)} requête(s) en erreur, ex: {errors[0]}", "warning")
+    return report
+
+
+# Métriques affichées : (clé, libellé, unité, plus grand = meilleur)
+LOAD_TEST_METRICS = [
+    ("requests_per_s", "Débit (req/s)", "", True),
+    ("tokens_per_s", "Débit (tokens/s)", "", True),
+] + [
+    (f"latency_p{q}", f"Latence p{q}", "s", False) for q in LOAD_TEST_PERCENTILES
+] + [
+    (f"ttft_p{q}", f"Premier token p{q}", "s", False) for q in LOAD_TEST_PERCENTILES
+] + [
+    ("errors", "Erreurs", "", False)
+]
+
+
+def format_load_test(report, baseline=None):
+    """Tableau texte des résultats, avec écart relatif par rapport au modèle de référence"""
+    def cell(value, unit):
+        if value is None:
+            return "—"
+        return f"{value:.3f} {unit}".strip() if isinstance(value, float) else str(value)
+
+    rows = [("Métrique", report["model"]) + ((baseline["model"], "Écart") if baseline else ())]
+    for key, label, unit, higher_is_better in LOAD_TEST_METRICS:
+        row = (label, cell(report[key], unit))
+        if baseline:
+            delta = "—"
+            if report[key] is not None and baseline[key]:
+                change = 100.0 * (report[key] - baseline[key]) / baseline[key]
+                better = change >= 0 if higher_is_better else change <= 0
+                delta = f"{change:+.1f} % {'✅' if better else '⚠️'}"
+            row += (cell(baseline[key], unit), delta)
+        rows.append(row)
+
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    lines = ["  ".join(value.ljust(width) for value, width in zip(row, widths)) for row in rows]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
+
+
+def run_load_test_command(args):
+    """Test de charge d'un modèle, comparé éventuellement à un modèle de référence"""
+    prompts = load_prompts(args.prompts)
+    options = {"num_predict": args.num_predict} if args.num_predict else None
+    client = OllamaClient(args.host)
+    for model in filter(None, [args.model, args.baseline]):
+        if not client.model_exists(model):
+            _print_log(f"Modèle introuvable sur {client.host}: {model}", "error")
+            return 1
+
+    settings = dict(concurrency=args.concurrency, total_requests=args.requests, options=options,
+                    timeout=args.timeout, warmup=args.warmup)
+    try:
+        # Modèles testés l'un après l'autre : ils ne se disputent pas le serveur
+        report = run_load_test(client.host, args.model, prompts, **settings)
+        baseline = run_load_test(client.host, args.baseline, prompts, **settings) if args.baseline else None
+    except Exception as e:
+        _print_log(f"Erreur: {str(e) or type(e).__name__}", "error")
+        return 1
+
+    sys.stdout.write(format_load_test(report, baseline) + "\n")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"model": report, "baseline": baseline}, f, indent=2)
+    return 0 if report["succeeded"] else 1
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# BALAYAGE DE QUANTIFICATIONS (TAILLE, VITESSE, FIDÉLITÉ DES RÉPONSES)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Bits par poids approximatifs : ordre de précision des variantes (la plus précise sert de référence)
+QUANT_BITS = {
+    "f32": 32.0, "f16": 16.0, "bf16": 16.0,
+    "q8_0": 8.5, "q6_K": 6.56, "q5_1": 6.0, "q5_K_M": 5.69, "q5_K_S": 5.54, "q5_0": 5.5,
+    "q4_1": 5.0, "q4_K_M": 4.85, "q4_K_S": 4.58, "q4_0": 4.5,
+    "q3_K_L": 4.27, "q3_K_M": 3.91, "q3_K_S": 3.5, "q2_K": 3.35
+}
+# Variantes gardées à la précision du modèle source (pas de champ "quantize" envoyé à Ollama)
+UNQUANTIZED = ("f32", "f16", "bf16")
+SWEEP_DEFAULT_QUANTS = ("f16", "q8_0", "q5_K_M", "q4_K_M")
+SWEEP_PARALLEL_BUILDS = 2
+# Génération déterministe : les écarts entre variantes viennent de la quantification seule
+SWEEP_OPTIONS = {"temperature": 0, "seed": 42}
+
+
+def normalize_quant(name):
+    """Nom canonique d'une quantification (insensible à la casse : Q4_K_M, q4_k_m...)"""
+    for quant in QUANT_BITS:
+        if quant.lower() == name.lower():
+            return quant
+    raise Exception(f"Quantification inconnue: {name} (valeurs: {', '.join(QUANT_BITS)})")
+
+
+def variant_tag(model_name, quant):
+    """Tag Ollama d'une variante : <modèle>:<quantification>"""
+    return f"{model_name.split(':')[0]}:{quant}"
+
+
+def output_agreement(reference, output):
+    """Similarité (0-1) entre deux réponses, au niveau des mots"""
+    if reference == output:
+        return 1.0
+    return difflib.SequenceMatcher(None, reference.split(), output.split(), autojunk=False).ratio()
+
+
+def build_variants(client, model_name, modelfile_path, quants, parallel=SWEEP_PARALLEL_BUILDS, log=_print_log):
+    """
+    Crée une variante par quantification à partir du même Modelfile (base + adaptateur) : les blobs
+    sont envoyés une seule fois, puis Ollama quantifie les variantes en parallèle (`parallel` à la fois).
+    Retourne {quantification: {"tag", "build_time", "error"}}.
+    """
+    payload, _ = build_create_request(client, model_name, modelfile_path, log=log)
+
+    def build(quant):
+        variant = dict(payload, model=variant_tag(model_name, quant))
+        if quant not in UNQUANTIZED:
+            variant["quantize"] = quant
+        start = time.time()
+        try:
+            client.create(variant)
+            log(f"Variante {variant['model']} créée en {time.time() - start:.1f} s", "success")
+            return {"tag": variant["model"], "build_time": time.time() - start, "error": None}
+        except Exception as e:
+            log(f"Variante {variant['model']}: {e}", "error")
+            return {"tag": variant["model"], "build_time": time.time() - start, "error": str(e)}
+
+    log(f"Création de {len(quants)} variante(s) de '{model_name}' ({parallel} à la fois): {', '.join(quants)}",
+        "info")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, parallel)) as pool:
+        return dict(zip(quants, pool.map(build, quants)))
+
+
+def benchmark_variant(client, tag, prompts, num_predict=None):
+    """
+    Exécute les prompts sur une variante (séquentiellement, génération déterministe) puis la
+    décharge. Le temps de chargement est celui de la première requête, modèle non chargé.
+    """
+    options = dict(SWEEP_OPTIONS, **({"num_predict": num_predict} if num_predict else {}))
+    outputs, load_time, eval_count, eval_duration = [], None, 0, 0
+    try:
+        for prompt in prompts:
+            status, data = client.request("POST", "/api/generate",
+                                          {"model": tag, "prompt": prompt, "stream": False, "options": options})
+            if status != 200:
+                raise Exception(f"Erreur API Ollama /api/generate ({status}): {data.get('error', data)}")
+            if load_time is None:
+                load_time = data.get("load_duration", 0) / 1e9
+            outputs.append(data.get("response", ""))
+            eval_count += data.get("eval_count", 0)
+            eval_duration += data.get("eval_duration", 0)
+    finally:
+        # keep_alive 0 : la variante suivante est chargée à froid, sans concurrence mémoire
+        client.request("POST", "/api/generate", {"model": tag, "keep_alive": 0})
+    return {
+        "outputs": outputs,
+        "load_time": load_time,
+        "tokens_per_s": eval_count / (eval_duration / 1e9) if eval_duration else None
+    }
+
+
+def run_quant_sweep(host, model_name, modelfile_path, prompts, quants=SWEEP_DEFAULT_QUANTS,
+                    parallel=SWEEP_PARALLEL_BUILDS, num_predict=None, log=_print_log):
+    """
+    Construit les variantes quantifiées d'un modèle, les mesure sur un jeu de prompts fixe et
+    compare leurs réponses à celles de la variante la plus précise. Retourne la liste des résultats.
+    """
+    client = OllamaClient(host)
+    if client.version() is None:
+        raise Exception(f"Serveur Ollama injoignable ({client.host})")
+    quants = sorted(dict.fromkeys(normalize_quant(quant) for quant in quants), key=QUANT_BITS.get, reverse=True)
+    unquantized = [quant for quant in quants if quant in UNQUANTIZED]
+    if len(unquantized) > 1:
+        # Sans "quantize", Ollama garde la précision du modèle source : les tags seraient identiques
+        raise Exception(f"Une seule variante non quantifiée possible ({', '.join(unquantized)} donnent le même "
+                        f"modèle, à la précision de la source)")
+    builds = build_variants(client, model_name, modelfile_path, quants, parallel, log)
+    sizes = {model.get("name"): model.get("size") for model in client.list_models()}
+
+    # Mesures l'une après l'autre : les variantes ne se disputent pas le serveur
+    results, reference = [], None
+    for quant in quants:
+        result = dict(builds[quant], quant=quant, size=sizes.get(builds[quant]["tag"]), load_time=None,
+                      tokens_per_s=None, agreement=None, identical=None)
+        if not result["error"]:
+            log(f"Mesure de {result['tag']} sur {len(prompts)} prompt(s)", "info")
+            try:
+                result.update(benchmark_variant(client, result["tag"], prompts, num_predict))
+            except Exception as e:
+                result["error"] = str(e)
+                log(f"{result['tag']}: {e}", "error")
+        if not result["error"]:
+            if reference is None:
+                reference = result
+            pairs = list(zip(reference["outputs"], result["outputs"]))
+            result["agreement"] = sum(output_agreement(ref, out) for ref, out in pairs) / len(pairs)
+            result["identical"] = sum(ref == out for ref, out in pairs)
+        results.append(result)
+
+    if reference is None:
+        raise Exception("Aucune variante n'a pu être créée et mesurée")
+    for result in results:
+        result["reference"] = reference["quant"]
+    return results
+
+
+def format_quant_sweep(results):
+    """Tableau texte : taille, chargement, débit et accord avec la variante de référence"""
+    reference = results[0]["reference"]
+    rows = [("Variante", "Tag", "Taille", "Création", "Chargement", "Tokens/s", f"Accord / {reference}",
+             "Identiques")]
+    for r in results:
+        if r["error"]:
+            rows.append((r["quant"], r["tag"], "—", _short_duration(r["build_time"]), "—", "—", "—",
+                         f"erreur: {r['error'][:60]}"))
+            continue
+        rows.append((
+            r["quant"], r["tag"],
+            (f"{r['size'] / 1e9:.2f} Go" if r["size"] >= 1e9 else f"{r['size'] / 1e6:.1f} Mo") if r["size"] else "—",
+            _short_duration(r["build_time"]),
+            f"{r['load_time']:.2f} s" if r["load_time"] is not None else "—",
+            f"{r['tokens_per_s']:.1f}" if r["tokens_per_s"] else "—",
+            f"{100 * r['agreement']:.1f} %",
+            f"{r['identical']}/{len(r['outputs'])}"
+        ))
+    return _text_table(rows)
+
+
+def run_quant_sweep_command(args):
+    """Balayage de quantifications d'un Modelfile, tableau comparatif sur la sortie standard"""
+    try:
+        results = run_quant_sweep(
+            args.host, args.model, args.modelfile, load_prompts(args.prompts),
+            quants=args.quants, parallel=args.parallel, num_predict=args.num_predict
+        )
+    except Exception as e:
+        _print_log(f"Erreur: {e}", "error")
+        return 1
+
+    sys.stdout.write(format_quant_sweep(results) + "\n")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    return 1 if any(r["error"] for r in results) else 0
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # COULEURS ET STYLES
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -172,8 +5460,10 @@ class LoraToOllamaApp:
         self.root.configure(bg=COLORS["bg_dark"])
         self.root.resizable(True, True)
         
-        # Variables
-        self.is_processing = False
+        # File de jobs (plusieurs conversions, étapes lourdes arbitrées par le scheduler)
+        self.queue = JobQueue(on_update=lambda job: self.root.after(0, self.refresh_job, job))
+        self.job_rows = {}
+        self.tracked_job = None
         
         # Style ttk
         self.setup_styles()
@@ -183,6 +5473,9 @@ class LoraToOllamaApp:
         
         # Centrer la fenêtre
         self.center_window()
+        
+        # Fermeture : annuler les jobs pour ne pas laisser de processus enfants derrière soi
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
     
     def setup_styles(self):
         """Configure les styles ttk"""
@@ -199,6 +5492,19 @@ class LoraToOllamaApp:
             darkcolor=COLORS["border"]
         )
         
+        style.configure("Modern.Treeview",
+            background=COLORS["input_bg"],
+            fieldbackground=COLORS["input_bg"],
+            foreground=COLORS["text"],
+            bordercolor=COLORS["border"],
+            rowheight=22
+        )
+        style.configure("Modern.Treeview.Heading",
+            background=COLORS["bg_light"],
+            foreground=COLORS["text"],
+            relief="flat"
+        )
+        
         style.map("Modern.TCombobox",
             fieldbackground=[("readonly", COLORS["input_bg"])],
             selectbackground=[("readonly", COLORS["accent"])],
@@ -247,6 +5553,7 @@ class LoraToOllamaApp:
         self.create_modelfile_section()
         self.create_output_section()
         self.create_action_buttons()
+        self.create_queue_section()
         self.create_log_section()
     
     def create_header(self):
@@ -383,6 +5690,67 @@ class LoraToOllamaApp:
             fg=COLORS["text_dim"]
         )
         self.base_model_info_label.grid(row=6, column=0, sticky="w")
+        
+        # LoRA additionnels à fusionner
+        tk.Label(
+            content,
+            text="LoRA additionnels à fusionner (un par ligne : chemin/adapter_model.safetensors;poids) :",
+            font=("Segoe UI", 10),
+            bg=COLORS["bg_medium"],
+            fg=COLORS["text"],
+            anchor="w"
+        ).grid(row=7, column=0, sticky="w", pady=(15, 2))
+        
+        self.extra_adapters_text = scrolledtext.ScrolledText(
+            content,
+            height=3,
+            bg=COLORS["input_bg"],
+            fg=COLORS["text"],
+            insertbackground=COLORS["text"],
+            font=("Consolas", 9),
+            relief="flat"
+        )
+        self.extra_adapters_text.grid(row=8, column=0, sticky="ew", pady=(0, 10))
+        
+        merge_frame = tk.Frame(content, bg=COLORS["bg_medium"])
+        merge_frame.grid(row=9, column=0, sticky="ew")
+        merge_frame.columnconfigure((0, 1, 2), weight=1)
+        
+        for column, text in enumerate(["Poids du LoRA principal :", "Mode de fusion :", "Rang cible (SVD) :"]):
+            tk.Label(
+                merge_frame,
+                text=text,
+                font=("Segoe UI", 10),
+                bg=COLORS["bg_medium"],
+                fg=COLORS["text"]
+            ).grid(row=0, column=column, sticky="w")
+        
+        self.main_weight_entry = ModernEntry(merge_frame, placeholder="1.0")
+        self.main_weight_entry.grid(row=1, column=0, sticky="ew", padx=(0, 10), ipady=5)
+        
+        self.merge_mode_var = tk.StringVar(value=list(MERGE_MODES.keys())[0])
+        ttk.Combobox(
+            merge_frame,
+            textvariable=self.merge_mode_var,
+            values=list(MERGE_MODES.keys()),
+            state="readonly",
+            style="Modern.TCombobox",
+            font=("Segoe UI", 10)
+        ).grid(row=1, column=1, sticky="ew", padx=(0, 10), ipady=5)
+        
+        self.target_rank_entry = ModernEntry(merge_frame, placeholder="16")
+        self.target_rank_entry.grid(row=1, column=2, sticky="ew", ipady=5)
+    
+    def get_extra_adapters(self):
+        """Retourne la liste des LoRA additionnels : [{"path": ..., "weight": ...}]"""
+        adapters = []
+        for line in self.extra_adapters_text.get("1.0", tk.END).splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            path, _, weight = line.partition(";")
+            adapters.append({"path": path.strip(), "weight": weight.strip() or "1.0"})
+        return adapters
     
     def load_current_base_model(self):
         """Charge la valeur actuelle de base_model_name_or_path depuis adapter_config.json"""
@@ -455,6 +5823,19 @@ class LoraToOllamaApp:
             )
             rb.pack(side="left", padx=(0, 20))
         
+        self.reuse_base_var = tk.BooleanVar(value=True)
+        tk.Checkbutton(
+            content,
+            text="♻️ Réutiliser le modèle de base déjà importé dans Ollama (FROM <tag>)",
+            variable=self.reuse_base_var,
+            bg=COLORS["bg_medium"],
+            fg=COLORS["text"],
+            selectcolor=COLORS["input_bg"],
+            activebackground=COLORS["bg_medium"],
+            activeforeground=COLORS["text"],
+            font=("Segoe UI", 10)
+        ).grid(row=3, column=0, sticky="w", pady=(10, 0))
+        
         # Frame pour HuggingFace
         self.hf_frame = tk.Frame(content, bg=COLORS["bg_medium"])
         self.hf_frame.grid(row=2, column=0, sticky="ew")
@@ -483,6 +5864,30 @@ class LoraToOllamaApp:
         self.hf_token_entry.configure(show="*")
         self.hf_token_entry.grid(row=3, column=0, sticky="ew", ipady=5)
         
+        tk.Label(
+            self.hf_frame,
+            text="Révision (hash de commit pour épingler, branche ou tag ; vide : main) :",
+            font=("Segoe UI", 10),
+            bg=COLORS["bg_medium"],
+            fg=COLORS["text"]
+        ).grid(row=4, column=0, sticky="w", pady=(10, 2))
+        
+        self.hf_revision_entry = ModernEntry(self.hf_frame, placeholder="main")
+        self.hf_revision_entry.grid(row=5, column=0, sticky="ew", ipady=5)
+        
+        self.offline_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            self.hf_frame,
+            text="✈️ Hors ligne : utiliser uniquement le cache local (aucun accès réseau)",
+            variable=self.offline_var,
+            bg=COLORS["bg_medium"],
+            fg=COLORS["text"],
+            selectcolor=COLORS["input_bg"],
+            activebackground=COLORS["bg_medium"],
+            activeforeground=COLORS["text"],
+            font=("Segoe UI", 10)
+        ).grid(row=6, column=0, sticky="w", pady=(5, 0))
+        
         # Frame pour fichier local
         self.local_frame = tk.Frame(content, bg=COLORS["bg_medium"])
         self.local_frame.columnconfigure(0, weight=1)
@@ -645,6 +6050,30 @@ class LoraToOllamaApp:
         
         self.num_ctx_entry = ModernEntry(params_frame, placeholder="4096")
         self.num_ctx_entry.grid(row=1, column=3, sticky="ew", ipady=5)
+        
+        tk.Label(
+            params_frame,
+            text="Budget mémoire (Go) :",
+            font=("Segoe UI", 10),
+            bg=COLORS["bg_medium"],
+            fg=COLORS["text"]
+        ).grid(row=2, column=0, sticky="w", pady=(10, 0))
+        
+        self.memory_budget_entry = ModernEntry(params_frame, placeholder="32")
+        self.memory_budget_entry.grid(row=3, column=0, sticky="ew", padx=(0, 10), ipady=5)
+        
+        self.cap_num_ctx_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            params_frame,
+            text="Plafonner Num Ctx pour tenir dans le budget (sinon : avertissement)",
+            variable=self.cap_num_ctx_var,
+            bg=COLORS["bg_medium"],
+            fg=COLORS["text"],
+            selectcolor=COLORS["input_bg"],
+            activebackground=COLORS["bg_medium"],
+            activeforeground=COLORS["text"],
+            font=("Segoe UI", 10)
+        ).grid(row=3, column=1, columnspan=3, sticky="w")
     
     def on_template_change(self, event=None):
         """Callback quand le template change"""
@@ -682,15 +6111,35 @@ class LoraToOllamaApp:
             2,
             is_directory=True
         )
+        
+        tk.Label(
+            content,
+            text="Déployer aussi sur ces hôtes Ollama (optionnel, séparés par des virgules) :",
+            font=("Segoe UI", 10),
+            bg=COLORS["bg_medium"],
+            fg=COLORS["text"]
+        ).grid(row=4, column=0, sticky="w", pady=(5, 2))
+        
+        self.deploy_hosts_entry = ModernEntry(content, placeholder="gpu-node-1:11434, gpu-node-2:11434")
+        self.deploy_hosts_entry.grid(row=5, column=0, sticky="ew", ipady=5, pady=(0, 10))
     
     def create_action_buttons(self):
         """Crée les boutons d'action"""
         btn_frame = tk.Frame(self.main_frame, bg=COLORS["bg_dark"])
         btn_frame.pack(fill="x", padx=30, pady=20)
         
-        # Progress bar
-        self.progress = ttk.Progressbar(btn_frame, mode="indeterminate")
-        self.progress.pack(fill="x", pady=(0, 15))
+        # Progress bar (pourcentage par étape, débit et ETA)
+        self.progress = ttk.Progressbar(btn_frame, mode="determinate", maximum=100)
+        self.progress.pack(fill="x", pady=(0, 5))
+        
+        self.progress_label = tk.Label(
+            btn_frame,
+            text="",
+            font=("Segoe UI", 9),
+            bg=COLORS["bg_dark"],
+            fg=COLORS["text_dim"]
+        )
+        self.progress_label.pack(fill="x", pady=(0, 10))
         
         # Boutons
         buttons_container = tk.Frame(btn_frame, bg=COLORS["bg_dark"])
@@ -704,12 +6153,88 @@ class LoraToOllamaApp:
         )
         self.convert_btn.pack(side="left", padx=5)
         
-        ModernButton(
-            buttons_container,
-            text="🧹 Réinitialiser",
-            command=self.reset_form,
-            style="secondary"
-        ).pack(side="left", padx=5)
+        ModernButton(
+            buttons_container,
+            text="🛑 Annuler",
+            command=self.cancel_tracked_job,
+            style="secondary"
+        ).pack(side="left", padx=5)
+        
+        ModernButton(
+            buttons_container,
+            text="📊 Historique",
+            command=self.show_history,
+            style="secondary"
+        ).pack(side="left", padx=5)
+        
+        ModernButton(
+            buttons_container,
+            text="🧹 Réinitialiser",
+            command=self.reset_form,
+            style="secondary"
+        ).pack(side="left", padx=5)
+    
+    def create_queue_section(self):
+        """Section file d'attente : budgets de ressources et état des jobs"""
+        content = self.create_section_frame("File d'attente", "🗂️")
+        content.columnconfigure(0, weight=1)
+        
+        budgets_frame = tk.Frame(content, bg=COLORS["bg_medium"])
+        budgets_frame.grid(row=0, column=0, sticky="ew", pady=(0, 10))
+        budgets_frame.columnconfigure((0, 1, 2, 3, 4), weight=1)
+        
+        self.budget_entries = {}
+        for column, (key, text) in enumerate([
+            ("max_jobs", "Jobs simultanés :"),
+            ("max_downloads", "Téléchargements :"),
+            ("max_conversions", "Conversions :"),
+            ("ram_budget_gb", "Budget RAM (Go) :"),
+            ("min_free_disk_gb", "Disque libre min (Go) :")
+        ]):
+            tk.Label(
+                budgets_frame,
+                text=text,
+                font=("Segoe UI", 9),
+                bg=COLORS["bg_medium"],
+                fg=COLORS["text"]
+            ).grid(row=0, column=column, sticky="w")
+            
+            default = DEFAULT_BUDGETS[key]
+            entry = ModernEntry(budgets_frame, placeholder="auto" if default is None else str(default))
+            entry.grid(row=1, column=column, sticky="ew", padx=(0, 5), ipady=3)
+            self.budget_entries[key] = entry
+        
+        columns = ("model", "state", "detail")
+        self.queue_tree = ttk.Treeview(
+            content,
+            columns=columns,
+            show="headings",
+            height=5,
+            style="Modern.Treeview"
+        )
+        for column, text, width in [("model", "Modèle", 160), ("state", "État", 90), ("detail", "Étape en cours", 380)]:
+            self.queue_tree.heading(column, text=text)
+            self.queue_tree.column(column, width=width, anchor="w")
+        self.queue_tree.grid(row=1, column=0, sticky="ew")
+        self.queue_tree.bind("<<TreeviewSelect>>", self.on_job_selected)
+        
+        self.queue_status_label = tk.Label(
+            content,
+            text="Aucun job",
+            font=("Segoe UI", 9, "italic"),
+            bg=COLORS["bg_medium"],
+            fg=COLORS["text_dim"]
+        )
+        self.queue_status_label.grid(row=2, column=0, sticky="w", pady=(5, 0))
+    
+    def collect_budgets(self):
+        """Lit les budgets de ressources saisis (champ vide : valeur par défaut)"""
+        budgets = {}
+        for key, entry in self.budget_entries.items():
+            value = entry.get_value()
+            if value and value != "auto":
+                budgets[key] = float(value) if key.endswith("_gb") else int(value)
+        return budgets
     
     def create_log_section(self):
         """Section logs"""
@@ -745,12 +6270,20 @@ class LoraToOllamaApp:
     def reset_form(self):
         """Réinitialise le formulaire"""
         for entry in [self.adapter_model_entry, self.adapter_config_entry, 
-                      self.hf_repo_entry, self.hf_token_entry, self.llama_cpp_entry, 
-                      self.model_name_entry, self.output_dir_entry,
-                      self.temp_entry, self.top_p_entry, self.top_k_entry, self.num_ctx_entry]:
+                      self.hf_repo_entry, self.hf_token_entry, self.hf_revision_entry, self.llama_cpp_entry, 
+                      self.model_name_entry, self.output_dir_entry, self.deploy_hosts_entry,
+                      self.temp_entry, self.top_p_entry, self.top_k_entry, self.num_ctx_entry,
+                      self.memory_budget_entry]:
             entry.delete(0, tk.END)
             entry._show_placeholder()
         
+        for entry in [self.main_weight_entry, self.target_rank_entry]:
+            entry.delete(0, tk.END)
+            entry._show_placeholder()
+        
+        self.extra_adapters_text.delete("1.0", tk.END)
+        self.merge_mode_var.set(list(MERGE_MODES.keys())[0])
+        self.cap_num_ctx_var.set(False)
         self.system_text.delete("1.0", tk.END)
         self.template_var.set("ChatML (Qwen, etc.)")
         self.on_template_change()
@@ -761,349 +6294,542 @@ class LoraToOllamaApp:
         
         self.log("Formulaire réinitialisé", "info")
     
+    def collect_job_spec(self):
+        """Construit la spécification du job à partir du formulaire"""
+        return make_job_spec({
+            "adapter_model": self.adapter_model_entry.get_value(),
+            "adapter_config": self.adapter_config_entry.get_value(),
+            "base_model_name": self.base_model_path_entry.get_value(),
+            "extra_adapters": self.get_extra_adapters(),
+            "main_weight": self.main_weight_entry.get_value() or "1.0",
+            "merge_mode": MERGE_MODES[self.merge_mode_var.get()],
+            "target_rank": self.target_rank_entry.get_value() or None,
+            "model_source": self.model_source_var.get(),
+            "hf_repo": self.hf_repo_entry.get_value(),
+            "hf_token": self.hf_token_entry.get_value(),
+            "hf_revision": self.hf_revision_entry.get_value(),
+            "offline": self.offline_var.get(),
+            "local_model": self.local_model_entry.get_value(),
+            "reuse_base": self.reuse_base_var.get(),
+            "llama_cpp_path": self.llama_cpp_entry.get_value(),
+            "template_name": self.template_var.get(),
+            "template": self.template_text.get("1.0", tk.END).strip(),
+            "system_prompt": self.system_text.get("1.0", tk.END).strip(),
+            "temperature": self.temp_entry.get_value(),
+            "top_p": self.top_p_entry.get_value(),
+            "top_k": self.top_k_entry.get_value(),
+            "num_ctx": self.num_ctx_entry.get_value(),
+            "memory_budget_gb": self.memory_budget_entry.get_value() or None,
+            "num_ctx_policy": "cap" if self.cap_num_ctx_var.get() else "warn",
+            "model_name": self.model_name_entry.get_value(),
+            "output_dir": self.output_dir_entry.get_value(),
+            "deploy_hosts": self.deploy_hosts_entry.get_value()
+        })
+    
     def validate_inputs(self):
         """Valide les entrées utilisateur"""
-        errors = []
-        
-        if not self.adapter_model_entry.get_value():
-            errors.append("Le chemin vers adapter_model.safetensors est requis")
-        elif not os.path.exists(self.adapter_model_entry.get_value()):
-            errors.append("Le fichier adapter_model.safetensors n'existe pas")
-        
-        if not self.adapter_config_entry.get_value():
-            errors.append("Le chemin vers adapter_config.json est requis")
-        elif not os.path.exists(self.adapter_config_entry.get_value()):
-            errors.append("Le fichier adapter_config.json n'existe pas")
-        
-        if self.model_source_var.get() == "huggingface":
-            if not self.hf_repo_entry.get_value():
-                errors.append("Le nom du repo HuggingFace est requis")
-        else:
-            if not self.local_model_entry.get_value():
-                errors.append("Le chemin vers le modèle local est requis")
-            elif not os.path.exists(self.local_model_entry.get_value()):
-                errors.append("Le fichier du modèle local n'existe pas")
-        
-        if not self.model_name_entry.get_value():
-            errors.append("Le nom du modèle Ollama est requis")
-        
-        return errors
+        return validate_job_spec(self.collect_job_spec())
     
     def start_conversion(self):
-        """Démarre le processus de conversion"""
-        if self.is_processing:
-            return
-        
+        """Ajoute un job de conversion à la file d'attente"""
         errors = self.validate_inputs()
+        try:
+            budgets = self.collect_budgets()
+        except ValueError:
+            errors.append("Les budgets de la file d'attente doivent être des nombres")
         if errors:
             messagebox.showerror("Erreurs de validation", "\n".join(errors))
             return
         
-        self.is_processing = True
-        self.convert_btn.configure(state="disabled")
-        self.progress.start()
+        self.queue.scheduler.configure(budgets)
+        spec = self.collect_job_spec()
+        prefix = f"[{spec['model_name']}]"
         
-        # Lancer dans un thread séparé
-        thread = threading.Thread(target=self.run_conversion)
-        thread.daemon = True
-        thread.start()
-    
-    def run_conversion(self):
-        """Exécute le processus de conversion complet"""
-        try:
-            # 1. Modifier adapter_config.json
-            self.log("Modification de adapter_config.json...", "info")
-            self.update_adapter_config()
-            
-            # 2. Préparer llama.cpp
-            self.log("Vérification de llama.cpp...", "info")
-            llama_cpp_path = self.prepare_llama_cpp()
-            
-            # 3. Préparer le modèle de base
-            self.log("Préparation du modèle de base...", "info")
-            base_model_path = self.prepare_base_model()
-            
-            # 4. Convertir LoRA en GGUF
-            self.log("Conversion du LoRA en GGUF...", "info")
-            lora_gguf_path = self.convert_lora_to_gguf(llama_cpp_path)
-            
-            # 5. Générer le Modelfile
-            self.log("Génération du Modelfile...", "info")
-            modelfile_path = self.generate_modelfile(base_model_path, lora_gguf_path)
-            
-            # 6. Créer le modèle Ollama
-            self.log("Création du modèle Ollama...", "info")
-            self.create_ollama_model(modelfile_path)
-            
-            self.log("🎉 Conversion terminée avec succès !", "success")
-            self.log(f"Vous pouvez maintenant utiliser: ollama run {self.model_name_entry.get_value()}", "success")
-            
-        except Exception as e:
-            self.log(f"Erreur: {str(e)}", "error")
-            import traceback
-            self.log(traceback.format_exc(), "error")
-        finally:
-            self.root.after(0, self.finish_conversion)
-    
-    def finish_conversion(self):
-        """Termine le processus de conversion"""
-        self.is_processing = False
-        self.convert_btn.configure(state="normal")
-        self.progress.stop()
+        # Les jobs journalisent depuis leurs threads : le widget n'est modifié que dans le thread Tk
+        job = self.queue.submit(
+            spec,
+            log=lambda message, level="info": self.root.after(0, self.log, f"{prefix} {message}", level),
+            listeners=[self.on_job_progress]
+        )
+        self.tracked_job = job
+        self.log(f"Job #{job.id} ajouté à la file: {spec['model_name']}", "info")
     
-    def update_adapter_config(self):
-        """Met à jour le adapter_config.json avec le bon base_model_name_or_path"""
-        config_path = self.adapter_config_entry.get_value()
-        new_base_model = self.base_model_path_entry.get_value()
-        
-        if not new_base_model:
-            self.log("base_model_name_or_path non modifié (champ vide)", "warning")
-            return
+    def show_history(self):
+        """Fenêtre d'analyse de l'historique : percentiles par étape, tendance, exécutions lentes"""
+        window = tk.Toplevel(self.root)
+        window.title("📊 Historique des exécutions")
+        window.geometry("900x520")
+        window.configure(bg=COLORS["bg_dark"])
         
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        controls = tk.Frame(window, bg=COLORS["bg_dark"])
+        controls.pack(fill="x", padx=10, pady=(10, 5))
         
-        old_base_model = config.get("base_model_name_or_path", "")
+        tk.Label(
+            controls,
+            text="Période (jours) :",
+            font=("Segoe UI", 10),
+            bg=COLORS["bg_dark"],
+            fg=COLORS["text"]
+        ).pack(side="left")
         
-        # Ne modifier que si la valeur a changé
-        if old_base_model == new_base_model:
-            self.log(f"base_model_name_or_path inchangé: {old_base_model}", "info")
-            return
+        days_var = tk.StringVar(value="30")
+        ttk.Combobox(
+            controls,
+            textvariable=days_var,
+            values=["7", "30", "90", "365"],
+            width=6,
+            style="Modern.TCombobox"
+        ).pack(side="left", padx=(5, 10))
         
-        config["base_model_name_or_path"] = new_base_model
+        report_text = scrolledtext.ScrolledText(
+            window,
+            bg=COLORS["input_bg"],
+            fg=COLORS["text"],
+            font=("Consolas", 9),
+            relief="flat",
+            wrap="none"
+        )
+        report_text.pack(fill="both", expand=True, padx=10, pady=(0, 10))
         
-        with open(config_path, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
+        def refresh():
+            try:
+                report = format_history_report(self.queue.history, days=int(days_var.get() or 30))
+            except (ValueError, sqlite3.Error) as e:
+                report = f"Historique indisponible: {e}"
+            report_text.configure(state="normal")
+            report_text.delete("1.0", tk.END)
+            report_text.insert(tk.END, report)
+            report_text.configure(state="disabled")
         
-        self.log(f"base_model_name_or_path modifié: {old_base_model} → {new_base_model}", "success")
+        ModernButton(controls, text="🔄 Actualiser", command=refresh, style="secondary").pack(side="left")
+        refresh()
     
-    def prepare_llama_cpp(self):
-        """Prépare llama.cpp (chemin existant ou téléchargement)"""
-        llama_cpp_path = self.llama_cpp_entry.get_value()
-        
-        if llama_cpp_path and os.path.exists(llama_cpp_path):
-            self.log(f"Utilisation de llama.cpp existant: {llama_cpp_path}", "success")
-            return llama_cpp_path
-        
-        # Télécharger llama.cpp
-        default_path = os.path.join(os.getcwd(), "llama.cpp")
-        
-        if os.path.exists(default_path):
-            self.log(f"llama.cpp trouvé localement: {default_path}", "success")
-            return default_path
-        
-        self.log("Téléchargement de llama.cpp (cela peut prendre un moment)...", "warning")
-        
-        try:
-            result = subprocess.run(
-                ["git", "clone", "--depth", "1", "https://github.com/ggerganov/llama.cpp.git", default_path],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            self.log("llama.cpp téléchargé avec succès", "success")
-            return default_path
-        except subprocess.CalledProcessError as e:
-            raise Exception(f"Erreur lors du téléchargement de llama.cpp: {e.stderr}")
-        except FileNotFoundError:
-            raise Exception("Git n'est pas installé. Veuillez installer Git ou spécifier le chemin vers llama.cpp.")
+    def cancel_tracked_job(self):
+        """Annule le job suivi (sélectionné dans la file ou dernier soumis)"""
+        job = self.tracked_job
+        if job is None or job.state not in ("queued", "running"):
+            self.log("Aucun job en cours à annuler", "warning")
+            return
+        self.queue.cancel(job.id)
+        self.log(f"Annulation du job #{job.id} demandée: {job.spec['model_name']}", "warning")
     
-    def prepare_base_model(self):
-        """Prépare le modèle de base (téléchargement HuggingFace ou chemin local)"""
-        if self.model_source_var.get() == "local":
-            path = self.local_model_entry.get_value()
-            self.log(f"Utilisation du modèle local: {path}", "success")
-            return path
+    def on_close(self):
+        """Annule les jobs en cours puis ferme la fenêtre (au plus 10 s d'attente)"""
+        self.queue.cancel_all()
+        deadline = time.time() + 10
         
-        # Télécharger depuis HuggingFace
-        repo_id = self.hf_repo_entry.get_value()
-        token = self.hf_token_entry.get_value() or None
+        def wait():
+            if all(job.done.is_set() for job in self.queue.jobs()) or time.time() > deadline:
+                self.root.destroy()
+            else:
+                self.root.after(200, wait)
         
-        try:
-            from huggingface_hub import snapshot_download, hf_hub_download
-            
-            output_dir = self.output_dir_entry.get_value() or os.getcwd()
-            model_dir = os.path.join(output_dir, repo_id.replace("/", "_"))
-            
-            self.log(f"Téléchargement du modèle depuis HuggingFace: {repo_id}...", "info")
-            
-            # Télécharger le modèle complet
-            snapshot_download(
-                repo_id=repo_id,
-                local_dir=model_dir,
-                token=token,
-                local_dir_use_symlinks=False
-            )
-            
-            self.log(f"Modèle téléchargé dans: {model_dir}", "success")
-            return model_dir
-            
-        except ImportError:
-            raise Exception("huggingface_hub n'est pas installé. Installez-le avec: pip install huggingface_hub")
-        except Exception as e:
-            raise Exception(f"Erreur lors du téléchargement du modèle: {str(e)}")
+        wait()
     
-    def convert_lora_to_gguf(self, llama_cpp_path):
-        """Convertit le LoRA en GGUF"""
-        convert_script = os.path.join(llama_cpp_path, "convert_lora_to_gguf.py")
-        
-        if not os.path.exists(convert_script):
-            raise Exception(f"Script de conversion non trouvé: {convert_script}")
-        
-        # Dossier contenant le LoRA
-        lora_dir = os.path.dirname(self.adapter_model_entry.get_value())
-        
-        # Chemin de sortie
-        output_dir = self.output_dir_entry.get_value() or lora_dir
-        model_name = self.model_name_entry.get_value()
-        output_file = os.path.join(output_dir, f"{model_name}-LoRA.gguf")
-        
-        self.log(f"Conversion en cours...", "info")
-        
-        try:
-            result = subprocess.run(
-                [sys.executable, convert_script, "--verbose", "--outfile", output_file, lora_dir],
-                capture_output=True,
-                text=True,
-                cwd=llama_cpp_path
-            )
-            
-            if result.returncode != 0:
-                self.log(f"Stderr: {result.stderr}", "warning")
-                raise Exception(f"Erreur de conversion: {result.stderr}")
-            
-            self.log(f"LoRA converti: {output_file}", "success")
-            return output_file
-            
-        except Exception as e:
-            raise Exception(f"Erreur lors de la conversion: {str(e)}")
+    def on_job_progress(self, job, event):
+        """Reçoit la progression d'un job depuis son thread"""
+        self.root.after(0, self.refresh_job, job, event)
     
-    def generate_modelfile(self, base_model_path, lora_gguf_path):
-        """Génère le Modelfile pour Ollama"""
-        output_dir = self.output_dir_entry.get_value() or os.path.dirname(lora_gguf_path)
-        model_name = self.model_name_entry.get_value()
-        modelfile_path = os.path.join(output_dir, f"{model_name}.Modelfile")
-        
-        # Construire le contenu
-        lines = []
-        
-        # FROM
-        lines.append(f"FROM {base_model_path}")
-        lines.append("")
-        
-        # ADAPTER
-        lines.append(f"ADAPTER {lora_gguf_path}")
-        lines.append("")
-        
-        # SYSTEM
-        system_prompt = self.system_text.get("1.0", tk.END).strip()
-        if system_prompt:
-            lines.append(f'SYSTEM """')
-            lines.append(system_prompt)
-            lines.append('"""')
-            lines.append("")
-        
-        # TEMPLATE
-        template = self.template_text.get("1.0", tk.END).strip()
-        if template:
-            lines.append('TEMPLATE """')
-            lines.append(template)
-            lines.append('"""')
-            lines.append("")
-        
-        # PARAMETERS
-        temp = self.temp_entry.get_value()
-        top_p = self.top_p_entry.get_value()
-        top_k = self.top_k_entry.get_value()
-        num_ctx = self.num_ctx_entry.get_value()
-        
-        if temp:
-            lines.append(f"PARAMETER temperature {temp}")
-        if top_p:
-            lines.append(f"PARAMETER top_p {top_p}")
-        if top_k:
-            lines.append(f"PARAMETER top_k {top_k}")
-        if num_ctx:
-            lines.append(f"PARAMETER num_ctx {num_ctx}")
+    def on_job_selected(self, event=None):
+        """Suit la progression du job sélectionné dans la file"""
+        selection = self.queue_tree.selection()
+        for job in self.queue.jobs():
+            if selection and self.job_rows.get(job.id) == selection[0]:
+                self.tracked_job = job
+                self.progress_label.configure(text=job.detail)
+                self.progress["value"] = job.percent or 0
+    
+    def refresh_job(self, job, event=None):
+        """Met à jour la ligne du job dans la file et la barre de progression"""
+        states = {
+            "queued": "⏳ En file", "running": "⚙️ En cours", "done": "✅ Terminé",
+            "failed": "❌ Échec", "cancelled": "🚫 Annulé"
+        }
+        values = (job.spec["model_name"], states.get(job.state, job.state), job.error or job.detail)
         
-        # Stop tokens
-        template_name = self.template_var.get()
-        for stop_token in STOP_TOKENS.get(template_name, []):
-            lines.append(f'PARAMETER stop "{stop_token}"')
+        if job.id not in self.job_rows:
+            self.job_rows[job.id] = self.queue_tree.insert("", tk.END, values=values)
+        else:
+            self.queue_tree.item(self.job_rows[job.id], values=values)
         
-        # Écrire le fichier
-        with open(modelfile_path, 'w', encoding='utf-8') as f:
-            f.write("\n".join(lines))
+        if event is not None and job is self.tracked_job:
+            self.update_progress(event)
+        if job is self.tracked_job and job.state in ("done", "failed", "cancelled"):
+            self.finish_conversion()
         
-        self.log(f"Modelfile créé: {modelfile_path}", "success")
-        return modelfile_path
+        jobs = self.queue.jobs()
+        running = sum(1 for j in jobs if j.state == "running")
+        resources = self.queue.scheduler.snapshot()
+        self.queue_status_label.configure(
+            text=f"{running} en cours, {self.queue.depth()} en file, "
+                 f"{resources['waiting']} étape(s) en attente de ressources, "
+                 f"{sum(1 for j in jobs if j.state == 'done')} terminé(s)"
+        )
     
-    def create_ollama_model(self, modelfile_path):
-        """Crée le modèle Ollama avec la commande ollama create"""
-        model_name = self.model_name_entry.get_value()
-        
-        self.log(f"Exécution: ollama create {model_name} -f {modelfile_path}", "info")
-        
+    def update_progress(self, event):
+        """Met à jour la barre de progression (pourcentage, débit, ETA)"""
+        if event["percent"] is not None and event["status"] == "running":
+            if str(self.progress.cget("mode")) != "determinate":
+                self.progress.stop()
+                self.progress.configure(mode="determinate", maximum=100)
+            self.progress["value"] = event["percent"]
+        elif event["status"] in ("running", "waiting") and str(self.progress.cget("mode")) != "indeterminate":
+            self.progress.configure(mode="indeterminate")
+            self.progress.start()
+        self.progress_label.configure(text=format_progress(event))
+    
+    def finish_conversion(self):
+        """Remet la barre de progression au repos à la fin du job suivi"""
+        self.progress.stop()
+        self.progress.configure(mode="determinate")
+        self.progress["value"] = 0
+
+
+def run_headless(args):
+    """Exécute un ou plusieurs jobs décrits en JSON sans interface graphique"""
+    specs = [load_job_spec(path) for path in args.jobs]
+    if args.profile:
+        for spec in specs:
+            spec["profile_dir"] = args.profile
+    errors = [f"{path}: {error}" for path, spec in zip(args.jobs, specs) for error in validate_job_spec(spec)]
+    if errors:
+        for error in errors:
+            print(f"[error] {error}", file=sys.stderr)
+        return 2
+
+    isolation = isolation_from_args(args)
+    errors = validate_isolation(isolation)
+    if errors:
+        for error in errors:
+            print(f"[error] {error}", file=sys.stderr)
+        return 2
+
+    budgets = {key: getattr(args, key) for key in DEFAULT_BUDGETS if getattr(args, key) is not None}
+    queue = JobQueue(ResourceScheduler(budgets), isolation=isolation)
+    writer = JsonEventWriter() if args.events else None
+    metrics_server = start_metrics_endpoint(queue.metrics, args)
+
+    for spec in specs:
+        job_ref = {}
+        if writer:
+            def log(message, level="info", job_ref=job_ref):
+                writer({"event": "log", "job": job_ref.get("id"), "level": level,
+                        "message": message, "timestamp": time.time()})
+
+            def on_progress(job, event):
+                writer(dict(event, job=job.id))
+        else:
+            prefix = f"[{spec['model_name']}] " if len(specs) > 1 else ""
+
+            def log(message, level="info", prefix=prefix):
+                _print_log(f"{prefix}{message}", level)
+
+            last_print = {}
+
+            def on_progress(job, event, prefix=prefix, last_print=last_print):
+                if event["status"] != "running" or time.time() - last_print.get(event["stage"], 0) > 2.0:
+                    last_print[event["stage"]] = time.time()
+                    sys.stdout.write(f"[progress] {prefix}{format_progress(event)}\n")
+
+        job = queue.submit(spec, log=log, listeners=[on_progress])
+        job_ref["id"] = job.id
+
+    try:
+        queue.wait_all()
+    except KeyboardInterrupt:
+        # Les processus enfants tournent dans leur propre groupe : il faut les arrêter explicitement
+        _print_log("Interruption : annulation des jobs en cours...", "warning")
+        queue.cancel_all()
+        queue.wait_all()
+    finally:
+        stop_metrics_endpoint(queue.metrics, metrics_server, args)
+
+    jobs = queue.jobs()
+    if writer:
+        for job in jobs:
+            writer({"event": "result", "job": job.id, "state": job.state, "result": job.result,
+                    "error": job.error, "timestamp": time.time()})
+    return 0 if all(job.state == "done" for job in jobs) else 1
+
+
+def add_budget_arguments(parser):
+    """Options communes des budgets de ressources du scheduler"""
+    parser.add_argument("--max-jobs", dest="max_jobs", type=int, help="Jobs exécutés en parallèle")
+    parser.add_argument("--max-downloads", dest="max_downloads", type=int, help="Téléchargements simultanés")
+    parser.add_argument("--max-conversions", dest="max_conversions", type=int, help="Conversions simultanées")
+    parser.add_argument("--ram-budget-gb", dest="ram_budget_gb", type=float, help="RAM réservable (Go)")
+    parser.add_argument("--min-free-disk-gb", dest="min_free_disk_gb", type=float, help="Disque libre à conserver (Go)")
+
+
+def add_isolation_arguments(parser):
+    """Options d'isolation par défaut des processus enfants (surchargeables par la clé "isolation" d'un job)"""
+    group = parser.add_argument_group(
+        "isolation des processus enfants",
+        "Appliquée au clone de llama.cpp, au téléchargement HuggingFace et à la conversion GGUF. L'import et "
+        "la quantification du modèle sont faits par le serveur Ollama et ne sont pas bridés."
+    )
+    group.add_argument("--nice", type=int, help="Priorité CPU des processus enfants (0-19)")
+    group.add_argument("--ionice", help="Priorité E/S des processus enfants (idle, best-effort[:0-7])")
+    group.add_argument("--cpus", help="CPU autorisés aux processus enfants (ex: 0-3,6)")
+    group.add_argument("--memory-limit-gb", dest="memory_limit_gb", type=float,
+                       help="Mémoire maximale par processus enfant (scope cgroup systemd ; ignorée avec un "
+                            "avertissement si indisponible, sauf --memory-rlimit)")
+    group.add_argument("--memory-rlimit", dest="memory_rlimit", action="store_true", default=None,
+                       help="Sans cgroup systemd, applique --memory-limit-gb en RLIMIT_AS (mémoire virtuelle : "
+                            "peut faire échouer des allocations que la mémoire réelle permettrait)")
+    group.add_argument("--threads", type=int, help="Threads OpenMP/MKL/BLAS des processus enfants")
+
+
+def isolation_from_args(args):
+    return {key: getattr(args, key) for key in DEFAULT_ISOLATION if getattr(args, key) is not None}
+
+
+def add_metrics_arguments(parser):
+    """Options d'exposition des métriques (endpoint HTTP local, fichier texte)"""
+    parser.add_argument("--metrics-port", type=int, help="Sert les métriques Prometheus sur http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--metrics-file", help="Écrit les métriques dans ce fichier à la fin (textfile collector)")
+
+
+def start_metrics_endpoint(metrics, args):
+    if not args.metrics_port:
+        return None
+    try:
+        server = start_metrics_server(metrics, args.metrics_port)
+    except OSError as e:
+        _print_log(f"Endpoint de métriques indisponible (port {args.metrics_port}): {e}", "warning")
+        return None
+    _print_log(f"Métriques exposées sur http://127.0.0.1:{args.metrics_port}/metrics", "info")
+    return server
+
+
+def stop_metrics_endpoint(metrics, server, args):
+    if args.metrics_file:
         try:
-            result = subprocess.run(
-                ["ollama", "create", model_name, "-f", modelfile_path],
-                capture_output=True,
-                text=True
-            )
-            
-            if result.stdout:
-                self.log(result.stdout, "info")
-            
-            if result.returncode != 0:
-                self.log(f"Stderr: {result.stderr}", "warning")
-                raise Exception(f"Erreur ollama create: {result.stderr}")
+            metrics.write(args.metrics_file)
+        except OSError as e:
+            _print_log(f"Métriques non écrites dans {args.metrics_file}: {e}", "warning")
+    if server:
+        server.shutdown()
+        server.server_close()
 
-            if self.verify_model_exists(model_name, 6, 20):
-                self.log(f"✅ Modèle '{model_name}' créé et vérifié avec succès !", "success")
-            else:
-                self.log(f"⚠️ Le modèle semble créé mais n'apparaît pas dans 'ollama list'", "warning")
-            
-        except FileNotFoundError:
-            raise Exception("Ollama n'est pas installé ou n'est pas dans le PATH. Veuillez installer Ollama.")
-        except Exception as e:
-            raise Exception(f"Erreur lors de la création du modèle: {str(e)}")
 
+def run_deploy(args):
+    """Déploie un Modelfile existant sur plusieurs hôtes Ollama"""
+    try:
+        deploy_model(
+            parse_host_list(args.hosts), args.model, args.modelfile,
+            base_model_path=args.base,
+            max_connections=args.max_connections,
+            retries=args.retries
+        )
+    except Exception as e:
+        _print_log(f"Erreur: {e}", "error")
+        return 1
+    return 0
+
+
+def _stderr_log(message, level="info"):
+    sys.stderr.write(f"[{level}] {message}\n")
+    sys.stderr.flush()
+
+
+def run_export(args):
+    """Exporte un Modelfile et ses blobs dans un bundle portable ('-' : sortie standard)"""
+    to_stdout = args.output == "-"
+    try:
+        export_bundle(
+            args.modelfile, sys.stdout.buffer if to_stdout else args.output,
+            model_name=args.model, base_model_path=args.base, include_base=not args.skip_base,
+            level=args.level, threads=args.threads,
+            # Le flux de l'archive occupe stdout : journal sur stderr
+            log=_stderr_log if to_stdout else _print_log
+        )
+    except Exception as e:
+        (_stderr_log if to_stdout else _print_log)(f"Erreur: {e}", "error")
+        return 1
+    return 0
+
+
+def run_import(args):
+    """Importe un bundle sur un serveur Ollama ('-' : entrée standard)"""
+    try:
+        import_bundle(sys.stdin.buffer if args.bundle == "-" else args.bundle, args.host, args.model)
+    except Exception as e:
+        _print_log(f"Erreur: {e}", "error")
+        return 1
+    return 0
+
+
+def run_verify(args):
+    """Vérifie des fichiers GGUF, code de retour 1 si l'un d'eux est invalide"""
+    failed = 0
+    for path in args.files:
+        try:
+            summary = verify_gguf(path, checksum=args.checksum, log=lambda message, level="info": None)
+        except (GGUFError, OSError) as e:
+            failed += 1
+            _print_log(f"{path}: {e}", "error")
+            continue
+        checksum = f", sha256 {summary['sha256']}" if args.checksum else ""
+        _print_log(
+            f"{path}: OK (GGUF v{summary['version']}, {summary['tensors']} tenseurs, "
+            f"{summary['data_bytes'] / 1e6:.1f} Mo{checksum}, {summary['duration'] * 1000:.1f} ms)",
+            "success"
+        )
+    return 1 if failed else 0
+
+
+def run_estimate(args):
+    """Estime mémoire (poids, cache KV par num_ctx) et disque pour un modèle de base et ses LoRA"""
+    path, download = args.base, False
+    if not os.path.exists(path):
+        # Repo HuggingFace : config.json lu dans le cache local, sans accès réseau
+        commit = hf_local_commit(path, args.revision)
+        path = os.path.join(hf_repo_cache_dir(args.base), "snapshots", commit or "")
+        if not commit or not os.path.isdir(path):
+            _print_log(f"{args.base}: ni chemin local ni repo présent dans le cache HuggingFace ({hf_hub_cache()})",
+                       "error")
+            return 1
+        download = True
+
+    try:
+        arch = read_model_architecture(path)
+    except Exception as e:
+        _print_log(f"{path}: {e}", "error")
+        return 1
+
+    adapter_bytes = sum(os.path.getsize(adapter) for adapter in args.adapter or [])
+    budget = args.budget_gb * GB if args.budget_gb else None
+    sys.stdout.write(format_memory_estimate(
+        arch, adapter_bytes, budget, args.num_ctx, args.kv_cache_type, args.parallel or ollama_num_parallel(),
+        download=download
+    ) + "\n")
+    if budget and args.num_ctx:
+        return 0 if estimate_memory(arch, args.num_ctx, adapter_bytes, args.kv_cache_type,
+                                    args.parallel or ollama_num_parallel())["total"] <= budget else 1
+    return 0
+
+
+def build_arg_parser():
+    """Arguments de la ligne de commande (sans argument : interface graphique)"""
+    parser = argparse.ArgumentParser(description="LoRA to Ollama Converter")
+    subparsers = parser.add_subparsers(dest="command")
+
+    run_parser = subparsers.add_parser("run", help="Exécute un ou plusieurs jobs JSON sans interface graphique")
+    run_parser.add_argument("jobs", nargs="+", help="Fichiers JSON de spécification des jobs")
+    run_parser.add_argument("--events", action="store_true", help="Émet logs et progression en JSON Lines")
+    run_parser.add_argument("--profile", nargs="?", const=str(APP_HOME / "profiles"), metavar="DOSSIER",
+                            help="Profile chaque job (étapes et script de conversion), rapports dans DOSSIER "
+                                 "(défaut: ~/.lora_to_ollama/profiles)")
+    add_budget_arguments(run_parser)
+    add_isolation_arguments(run_parser)
+    add_metrics_arguments(run_parser)
+    run_parser.set_defaults(func=run_headless)
+
+    serve_parser = subparsers.add_parser("serve", help="Lance le serveur de conversion (API HTTP de jobs)")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Adresse d'écoute (défaut: 127.0.0.1)")
+    serve_parser.add_argument("--port", type=int, default=8765, help="Port d'écoute (défaut: 8765)")
+    serve_parser.add_argument("--verbose", action="store_true", help="Journalise chaque requête HTTP")
+    serve_parser.add_argument("--keep-jobs", type=int, default=SERVER_KEEP_FINISHED,
+                              help=f"Jobs terminés gardés en mémoire (défaut: {SERVER_KEEP_FINISHED}, "
+                                   f"les autres restent dans l'historique)")
+    add_budget_arguments(serve_parser)
+    add_isolation_arguments(serve_parser)
+    add_metrics_arguments(serve_parser)
+    serve_parser.set_defaults(func=run_server)
+
+    deploy_parser = subparsers.add_parser("deploy", help="Déploie un Modelfile sur plusieurs hôtes Ollama en parallèle")
+    deploy_parser.add_argument("modelfile", help="Modelfile généré par une conversion")
+    deploy_parser.add_argument("--model", required=True, help="Nom du modèle à créer sur chaque hôte")
+    deploy_parser.add_argument("--hosts", nargs="+", required=True, help="Hôtes Ollama (host:port ou URL)")
+    deploy_parser.add_argument("--base", help="Modèle de base local, envoyé aux hôtes qui n'ont pas le tag FROM")
+    deploy_parser.add_argument("--max-connections", type=int, default=DEPLOY_MAX_CONNECTIONS,
+                               help=f"Envois simultanés par hôte (défaut: {DEPLOY_MAX_CONNECTIONS})")
+    deploy_parser.add_argument("--retries", type=int, default=DEPLOY_RETRIES,
+                               help=f"Tentatives par requête (défaut: {DEPLOY_RETRIES})")
+    deploy_parser.set_defaults(func=run_deploy)
+
+    export_parser = subparsers.add_parser("export", help="Exporte un modèle dans un bundle portable (nœuds hors ligne)")
+    export_parser.add_argument("modelfile", help="Modelfile généré par une conversion")
+    export_parser.add_argument("-o", "--output", required=True, help="Fichier du bundle ('-' : sortie standard)")
+    export_parser.add_argument("--model", help="Nom du modèle (défaut: nom du Modelfile)")
+    export_parser.add_argument("--base", help="Modèle de base local, embarqué pour les cibles sans le tag FROM")
+    export_parser.add_argument("--skip-base", action="store_true",
+                               help="N'embarque pas les poids de base, seulement leurs empreintes")
+    export_parser.add_argument("--level", type=int, default=BUNDLE_DEFAULT_LEVEL, choices=range(10),
+                               help=f"Niveau gzip, 0 : sans compression (défaut: {BUNDLE_DEFAULT_LEVEL})")
+    export_parser.add_argument("--threads", type=int, help="Threads de compression (défaut: nombre de CPU)")
+    export_parser.set_defaults(func=run_export)
+
+    import_parser = subparsers.add_parser("import", help="Importe un bundle sur un serveur Ollama")
+    import_parser.add_argument("bundle", help="Fichier du bundle ('-' : entrée standard)")
+    import_parser.add_argument("--model", help="Nom du modèle créé (défaut: celui du bundle)")
+    import_parser.add_argument("--host", help="Serveur Ollama (défaut: OLLAMA_HOST)")
+    import_parser.set_defaults(func=run_import)
+
+    load_parser = subparsers.add_parser("loadtest", help="Test de charge d'un modèle Ollama (clients concurrents)")
+    load_parser.add_argument("--model", required=True, help="Modèle à tester (tag Ollama)")
+    load_parser.add_argument("--baseline", help="Modèle de référence à comparer (tag Ollama)")
+    load_parser.add_argument("--prompts", required=True, help="Fichier de prompts (une ligne par prompt ou JSON Lines)")
+    load_parser.add_argument("--concurrency", type=int, default=4, help="Clients simultanés (défaut: 4)")
+    load_parser.add_argument("--requests", type=int, help="Nombre de requêtes (défaut: une par prompt)")
+    load_parser.add_argument("--num-predict", type=int, help="Tokens générés au maximum par requête")
+    load_parser.add_argument("--warmup", type=int, default=1, help="Requêtes de chauffe non mesurées (défaut: 1)")
+    load_parser.add_argument("--timeout", type=float, default=300, help="Délai maximal par requête en s (défaut: 300)")
+    load_parser.add_argument("--host", help="Serveur Ollama (défaut: OLLAMA_HOST)")
+    load_parser.add_argument("--json", help="Écrit aussi les résultats dans ce fichier JSON")
+    load_parser.set_defaults(func=run_load_test_command)
+
+    sweep_parser = subparsers.add_parser("sweep", help="Compare plusieurs quantifications d'un modèle (taille, vitesse, "
+                                                       "fidélité)")
+    sweep_parser.add_argument("modelfile", help="Modelfile généré par une conversion (base f16/f32 + adaptateur)")
+    sweep_parser.add_argument("--model", required=True, help="Nom du modèle ; chaque variante est créée sous <nom>:<quant>")
+    sweep_parser.add_argument("--prompts", required=True, help="Fichier de prompts (une ligne par prompt ou JSON Lines)")
+    sweep_parser.add_argument("--quants", nargs="+", default=list(SWEEP_DEFAULT_QUANTS),
+                              help=f"Quantifications (défaut: {' '.join(SWEEP_DEFAULT_QUANTS)})")
+    sweep_parser.add_argument("--parallel", type=int, default=SWEEP_PARALLEL_BUILDS,
+                              help=f"Variantes créées simultanément (défaut: {SWEEP_PARALLEL_BUILDS})")
+    sweep_parser.add_argument("--num-predict", type=int, help="Tokens générés au maximum par prompt")
+    sweep_parser.add_argument("--host", help="Serveur Ollama (défaut: OLLAMA_HOST)")
+    sweep_parser.add_argument("--json", help="Écrit aussi les résultats (réponses comprises) dans ce fichier JSON")
+    sweep_parser.set_defaults(func=run_quant_sweep_command)
+
+    history_parser = subparsers.add_parser("history", help="Statistiques de l'historique des exécutions")
+    history_parser.add_argument("--days", type=int, default=30, help="Période analysée en jours (défaut: 30)")
+    history_parser.add_argument("--model", help="Filtre sur le nom du modèle (motif SQL LIKE, ex: 'qwen%%')")
+    history_parser.add_argument("--slowest", type=int, default=10, help="Nombre d'exécutions lentes listées")
+    history_parser.add_argument("--db", help="Base d'historique (défaut: ~/.lora_to_ollama/history.db)")
+    history_parser.set_defaults(func=run_history_command)
+
+    verify_parser = subparsers.add_parser("verify", help="Vérifie l'intégrité d'un ou plusieurs fichiers GGUF")
+    verify_parser.add_argument("files", nargs="+", help="Fichiers GGUF à vérifier")
+    verify_parser.add_argument("--checksum", action="store_true", help="Calcule aussi le sha256 des tenseurs")
+    verify_parser.set_defaults(func=run_verify)
+
+    estimate_parser = subparsers.add_parser("estimate", help="Estime mémoire (cache KV selon num_ctx) et disque")
+    estimate_parser.add_argument("base", help="Modèle de base : dossier HuggingFace, fichier GGUF ou repo en cache")
+    estimate_parser.add_argument("--revision", help="Révision du repo HuggingFace (défaut: main)")
+    estimate_parser.add_argument("--adapter", nargs="+", help="Fichiers LoRA (safetensors ou GGUF) ajoutés au modèle")
+    estimate_parser.add_argument("--num-ctx", type=int, help="num_ctx prévu (code de retour 1 s'il dépasse le budget)")
+    estimate_parser.add_argument("--budget-gb", type=float, help="Mémoire disponible sur les nœuds de service (Go)")
+    estimate_parser.add_argument("--kv-cache-type", choices=list(KV_CACHE_TYPE_BYTES),
+                                 help="Type du cache KV (défaut: OLLAMA_KV_CACHE_TYPE ou f16)")
+    estimate_parser.add_argument("--parallel", type=int, help="Requêtes parallèles (défaut: OLLAMA_NUM_PARALLEL ou 1)")
+    estimate_parser.set_defaults(func=run_estimate)
+
+    return parser
 
-    def verify_model_exists(self, model_name, max_attempts=5, delay=2):
-        """Vérifie que le modèle existe dans ollama list"""
-        import time
-        
-        for attempt in range(max_attempts):
-            try:
-                result = subprocess.run(
-                    ["ollama", "list"],
-                    capture_output=True,
-                    text=True,
-                    timeout=30
-                )
-                
-                if result.returncode == 0:
-                    # Chercher le nom du modèle dans la sortie
-                    lines = result.stdout.lower().split('\n')
-                    for line in lines:
-                        if model_name.lower() in line:
-                            return True
-                
-                # Attendre avant la prochaine tentative
-                if attempt < max_attempts - 1:
-                    time.sleep(delay)
-                    
-            except Exception as e:
-                self.log(f"Erreur lors de la vérification: {str(e)}", "warning")
-        
-        return False
 
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if args.command:
+        return args.func(args)
 
-def main():
     root = tk.Tk()
     app = LoraToOllamaApp(root)
     root.mainloop()
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
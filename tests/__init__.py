@@ -0,0 +1,10 @@
+"""
+Tests du convertisseur : serveurs Ollama simulés sur 127.0.0.1 (port libre), aucun réseau ni GPU.
+
+Lancement : python -m pytest tests   (ou python -m unittest discover tests)
+"""
+import os
+import tempfile
+
+# Dossier de travail isolé (registre, caches, historique) : à fixer avant l'import du module
+os.environ["LORA_TO_OLLAMA_HOME"] = tempfile.mkdtemp(prefix="lora-to-ollama-tests-")
@@ -0,0 +1,126 @@
+"""Fichiers de test minimaux : LoRA PEFT, modèle de base, faux llama.cpp et spécification de job"""
+import json
+import os
+import struct
+
+LORA_TENSORS = {
+    "base_model.model.model.layers.0.self_attn.q_proj.lora_A.weight": (2, 4),
+    "base_model.model.model.layers.0.self_attn.q_proj.lora_B.weight": (4, 2),
+}
+
+# Faux convert_lora_to_gguf.py : écrit un GGUF d'adaptateur valide (un tenseur F32 nul par tenseur
+# du LoRA) et attend le nombre de secondes indiqué dans <lora>/delay s'il existe
+FAKE_CONVERT_SCRIPT = r'''
+import json, os, struct, sys, time
+args = sys.argv[1:]
+out, lora = args[args.index("--outfile") + 1], args[-1]
+with open(os.path.join(lora, "adapter_model.safetensors"), "rb") as f:
+    header = json.loads(f.read(struct.unpack("<Q", f.read(8))[0]))
+names = [name for name in header if name != "__metadata__"]
+
+def string(value):
+    data = value.encode()
+    return struct.pack("<Q", len(data)) + data
+
+kv = [("general.type", 8, string("adapter")), ("adapter.type", 8, string("lora")),
+      ("adapter.lora.alpha", 6, struct.pack("<f", 8.0))]
+infos, data = b"", b""
+for name in names:
+    rows, cols = header[name]["shape"]
+    print(f"INFO:lora-to-gguf:{name}, torch.float32 --> F32, shape = {{{cols}, {rows}}}", file=sys.stderr)
+    infos += string(name) + struct.pack("<IQQIQ", 2, cols, rows, 0, len(data))
+    data += b"\0" * (4 * rows * cols)
+    data += b"\0" * (-len(data) % 32)
+head = b"GGUF" + struct.pack("<IQQ", 3, len(names), len(kv))
+head += b"".join(string(key) + struct.pack("<I", kind) + value for key, kind, value in kv) + infos
+head += b"\0" * (-len(head) % 32)
+delay_file = os.path.join(lora, "delay")
+if os.path.exists(delay_file):
+    with open(delay_file) as f:
+        time.sleep(float(f.read()))
+with open(out, "wb") as f:
+    f.write(head + data)
+'''
+
+
+def _gguf_string(value):
+    data = value.encode("utf-8")
+    return struct.pack("<Q", len(data)) + data
+
+
+def write_gguf(path, tensors, metadata=None, offsets=None, trailing=b"", alignment=32):
+    """
+    GGUF v3 de tenseurs F32 nuls, comme llama.cpp l'écrit ; tensors : [(nom, (colonnes, lignes))].
+    offsets force les offsets du répertoire (données écrites sur la plus grande étendue annoncée).
+    Retourne (début des données, fin des données).
+    """
+    metadata = {"general.type": "adapter", "adapter.type": "lora", "adapter.lora.alpha": 8.0,
+                **(metadata or {})}
+    kv = b"".join(
+        _gguf_string(key) + (struct.pack("<I", 8) + _gguf_string(value) if isinstance(value, str)
+                             else struct.pack("<If", 6, value))
+        for key, value in metadata.items()
+    )
+    infos, end = b"", 0
+    for index, (name, (cols, rows)) in enumerate(tensors):
+        offset = offsets[index] if offsets else end + (-end % alignment)
+        infos += _gguf_string(name) + struct.pack("<IQQIQ", 2, cols, rows, 0, offset)
+        end = max(end, offset + 4 * cols * rows)
+    head = b"GGUF" + struct.pack("<IQQ", 3, len(tensors), len(metadata)) + kv + infos
+    head += b"\0" * (-len(head) % alignment)
+    with open(path, "wb") as f:
+        f.write(head + b"\0" * end + trailing)
+    return len(head), len(head) + end
+
+
+def write_lora(directory, tensors=LORA_TENSORS):
+    """LoRA PEFT minimal (adapter_model.safetensors + adapter_config.json), tenseurs F32 nuls"""
+    os.makedirs(directory, exist_ok=True)
+    header, offset = {}, 0
+    for name, shape in tensors.items():
+        size = 4 * shape[0] * shape[1]
+        header[name] = {"dtype": "F32", "shape": list(shape), "data_offsets": [offset, offset + size]}
+        offset += size
+    encoded = json.dumps(header).encode("utf-8")
+    encoded += b" " * (-len(encoded) % 8)
+    with open(os.path.join(directory, "adapter_model.safetensors"), "wb") as f:
+        f.write(struct.pack("<Q", len(encoded)) + encoded + b"\0" * offset)
+    with open(os.path.join(directory, "adapter_config.json"), "w", encoding="utf-8") as f:
+        json.dump({"r": 2, "lora_alpha": 4, "base_model_name_or_path": "tiny-base", "peft_type": "LORA"}, f)
+    return directory
+
+
+def write_fake_llama_cpp(directory):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "convert_lora_to_gguf.py"), "w", encoding="utf-8") as f:
+        f.write(FAKE_CONVERT_SCRIPT)
+    return directory
+
+
+def write_base_model(path, size=4096):
+    """Modèle de base factice (le contenu n'est lu que pour son empreinte)"""
+    with open(path, "wb") as f:
+        f.write(b"GGUF" + bytes(range(256)) * (size // 256))
+    return path
+
+
+def job_spec(root, ollama_url, model_name="tiny-ft", **overrides):
+    """Spécification d'un job complet sur les fichiers ci-dessus, dans le dossier `root`"""
+    lora_dir = os.path.join(root, "lora")
+    if not os.path.exists(lora_dir):
+        write_lora(lora_dir)
+        write_fake_llama_cpp(os.path.join(root, "llama.cpp"))
+        write_base_model(os.path.join(root, "base.gguf"))
+        os.makedirs(os.path.join(root, "out"))
+    spec = {
+        "adapter_model": os.path.join(lora_dir, "adapter_model.safetensors"),
+        "adapter_config": os.path.join(lora_dir, "adapter_config.json"),
+        "model_source": "local",
+        "local_model": os.path.join(root, "base.gguf"),
+        "llama_cpp_path": os.path.join(root, "llama.cpp"),
+        "model_name": model_name,
+        "output_dir": os.path.join(root, "out"),
+        "ollama_host": ollama_url,
+    }
+    spec.update(overrides)
+    return spec
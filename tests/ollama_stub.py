@@ -0,0 +1,197 @@
+"""Serveur Ollama simulé (http.server) : blobs, création, /api/show, /api/tags et génération"""
+import hashlib
+import http.server
+import json
+import threading
+import time
+
+
+class StubOllama:
+    """
+    Implémente le sous-ensemble de l'API Ollama utilisé par le convertisseur et enregistre les requêtes.
+
+    failures     : {chemin ou "MÉTHODE chemin": [statuts]} renvoyés (dans l'ordre) avant de répondre normalement
+    blob_delay   : durée d'un envoi de blob (pour observer les envois simultanés)
+    create_error : fonction(payload) -> message d'erreur de /api/create, ou None
+    respond      : fonction(modèle, prompt) -> texte généré
+    stream_mode  : "chunked" ou "length" (corps NDJSON complet avec Content-Length, sans saut de ligne final)
+    """
+
+    def __init__(self, blob_delay=0.0, failures=None, create_error=None, respond=None, stream_mode="chunked",
+                 first_token_delay=0.0, token_delay=0.0):
+        self.blob_delay = blob_delay
+        self.failures = {path: list(statuses) for path, statuses in (failures or {}).items()}
+        self.create_error = create_error
+        self.respond = respond or (lambda model, prompt: f"answer to {prompt}")
+        self.stream_mode = stream_mode
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.blobs = {}
+        self.models = {}
+        self.requests = []
+        self.active_uploads = 0
+        self.max_active_uploads = 0
+        self.lock = threading.Lock()
+        self.server = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _handler(self))
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def calls(self, method, prefix):
+        with self.lock:
+            return [request for request in self.requests if request[0] == method and request[1].startswith(prefix)]
+
+    def add_model(self, name, **fields):
+        self.models[name] = dict(fields, model=name)
+
+
+def _handler(stub):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def read_body(self):
+            return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        def record(self, payload=None):
+            with stub.lock:
+                stub.requests.append((self.command, self.path, payload, time.time()))
+                path = self.path.split("?")[0]
+                statuses = stub.failures.get(f"{self.command} {path}") or stub.failures.get(path)
+                return statuses.pop(0) if statuses else None
+
+        def send_ndjson(self, events, delays):
+            lines = [(json.dumps(event) + "\n").encode("utf-8") for event in events]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            if stub.stream_mode == "length":
+                time.sleep(sum(delays))
+                body = b"".join(lines).rstrip(b"\n")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for line, delay in zip(lines, delays):
+                time.sleep(delay)
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+
+        def do_HEAD(self):
+            status = self.record()
+            if status is None and self.path.startswith("/api/blobs/"):
+                status = 200 if self.path.split("/")[-1] in stub.blobs else 404
+            self.send_response(status or 404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_GET(self):
+            status = self.record()
+            if status:
+                return self.send_json(status, {"error": "injected failure"})
+            if self.path == "/api/version":
+                return self.send_json(200, {"version": "0.0.0-stub"})
+            if self.path == "/api/tags":
+                return self.send_json(200, {"models": [
+                    {"name": name, "size": model.get("size", 0)} for name, model in stub.models.items()
+                ]})
+            self.send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path.startswith("/api/blobs/"):
+                status = self.record()
+                with stub.lock:
+                    stub.active_uploads += 1
+                    stub.max_active_uploads = max(stub.max_active_uploads, stub.active_uploads)
+                try:
+                    data = self.read_body()
+                    time.sleep(stub.blob_delay)
+                finally:
+                    with stub.lock:
+                        stub.active_uploads -= 1
+                if status:
+                    return self.send_json(status, {"error": "injected failure"})
+                digest = self.path.split("/")[-1]
+                if f"sha256:{hashlib.sha256(data).hexdigest()}" != digest:
+                    return self.send_json(400, {"error": "digest mismatch"})
+                stub.blobs[digest] = len(data)
+                return self.send_json(201, {})
+
+            payload = json.loads(self.read_body() or b"{}")
+            status = self.record(payload)
+            if status:
+                return self.send_json(status, {"error": "injected failure"})
+            if self.path == "/api/show":
+                name = payload.get("model")
+                if name in stub.models:
+                    return self.send_json(200, {"details": {}, "parameters": ""})
+                return self.send_json(404, {"error": f"model '{name}' not found"})
+            if self.path == "/api/create":
+                return self.create(payload)
+            if self.path == "/api/generate":
+                return self.generate(payload)
+            self.send_json(404, {"error": "not found"})
+
+        def create(self, payload):
+            error = stub.create_error(payload) if stub.create_error else None
+            if error:
+                return self.send_json(500, {"error": error})
+            digests = list((payload.get("files") or {}).values()) + list((payload.get("adapters") or {}).values())
+            missing = [digest for digest in digests if digest not in stub.blobs]
+            if missing:
+                return self.send_json(400, {"error": f"missing blob {missing[0]}"})
+            if payload.get("from") and payload["from"] not in stub.models:
+                return self.send_json(404, {"error": f"model '{payload['from']}' not found"})
+            stub.add_model(payload["model"], size=sum(stub.blobs[digest] for digest in digests), request=payload)
+            events = [{"status": "parsing modelfile"}, {"status": "writing manifest"}, {"status": "success"}]
+            self.send_ndjson(events, [0.0] * len(events))
+
+        def generate(self, payload):
+            name, prompt = payload.get("model"), payload.get("prompt")
+            if name not in stub.models:
+                return self.send_json(404, {"error": f"model '{name}' not found"})
+            if prompt is None:
+                # keep_alive 0 sans prompt : déchargement du modèle
+                return self.send_json(200, {"model": name, "done": True, "done_reason": "unload"})
+            if prompt.startswith("fail"):
+                return self.send_json(500, {"error": "generation failed"})
+            words = stub.respond(name, prompt).split()
+            # eval_count compte aussi le token de fin, qui n'est pas renvoyé
+            final = {"done": True, "eval_count": len(words) + 1, "eval_duration": (len(words) + 1) * 10_000_000,
+                     "load_duration": 5_000_000}
+            if payload.get("stream") is False:
+                return self.send_json(200, dict(final, response=" ".join(words)))
+            events = [{"response": word + " ", "done": False} for word in words] + [dict(final, response="")]
+            delays = [stub.first_token_delay] + [stub.token_delay] * len(words)
+            self.send_ndjson(events, delays)
+
+    return Handler
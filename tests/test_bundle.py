@@ -0,0 +1,148 @@
+"""Bundles hors ligne : aller-retour gzip et tar, base non embarquée, archive tronquée ou altérée"""
+import hashlib
+import io
+import os
+import tarfile
+import tempfile
+import unittest
+
+import Lora_to_Ollama as app
+from tests.ollama_stub import StubOllama
+
+ADAPTER = b"GGUF" + bytes(range(256)) * 8
+WEIGHTS = b"\7" * 64 * 1024
+
+
+def sha256(data):
+    return f"sha256:{hashlib.sha256(data).hexdigest()}"
+
+
+def quiet(*args):
+    pass
+
+
+class BundleTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.root, "base"))
+        with open(os.path.join(self.root, "base", "model.safetensors"), "wb") as f:
+            f.write(WEIGHTS)
+        with open(os.path.join(self.root, "qwen2.5-ft-LoRA.gguf"), "wb") as f:
+            f.write(ADAPTER)
+        # Nom de modèle avec des points : seul le suffixe .Modelfile est retiré
+        self.modelfile = os.path.join(self.root, "qwen2.5-ft.Modelfile")
+        with open(self.modelfile, "w", encoding="utf-8") as f:
+            f.write("FROM ./base\nADAPTER ./qwen2.5-ft-LoRA.gguf\nPARAMETER temperature 0.2\n")
+        self.stub = StubOllama().start()
+        self.addCleanup(self.stub.stop)
+
+    def export(self, **options):
+        output = io.BytesIO()
+        manifest = app.export_bundle(self.modelfile, output, log=quiet, **options)
+        return manifest, output.getvalue()
+
+    def import_bytes(self, data, **options):
+        return app.import_bundle(io.BytesIO(data), self.stub.url, log=quiet, **options)
+
+    def assertImported(self, model, manifest):
+        request = self.stub.models[model]["request"]
+        self.assertEqual(request["files"], manifest["payload"]["files"])
+        self.assertEqual(request["adapters"], manifest["payload"]["adapters"])
+        self.assertEqual(request["parameters"], {"temperature": 0.2})
+
+    def test_gzip_round_trip_from_file(self):
+        path = os.path.join(self.root, "bundle.tar.gz")
+        manifest = app.export_bundle(self.modelfile, path, threads=2, log=quiet)
+
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(2), b"\x1f\x8b")
+        self.assertEqual(manifest["model"], "qwen2.5-ft")
+        self.assertEqual({info["name"]: info["embedded"] for info in manifest["blobs"].values()},
+                         {"model.safetensors": True, "qwen2.5-ft-LoRA.gguf": True})
+
+        report = app.import_bundle(path, self.stub.url, log=quiet)
+
+        self.assertEqual((report["model"], report["pushed_blobs"], report["skipped_blobs"]), ("qwen2.5-ft", 2, 0))
+        self.assertEqual(report["uploaded_bytes"], len(WEIGHTS) + len(ADAPTER))
+        self.assertEqual(self.stub.blobs, {sha256(WEIGHTS): len(WEIGHTS), sha256(ADAPTER): len(ADAPTER)})
+        self.assertImported("qwen2.5-ft", manifest)
+
+    def test_plain_tar_round_trip_and_reimport(self):
+        manifest, data = self.export(level=0, model_name="qwen-ft:v2")
+        with tarfile.open(fileobj=io.BytesIO(data), mode="r|") as tar:
+            self.assertEqual([member.name for member in tar][:2], ["manifest.json", "Modelfile"])
+
+        self.assertEqual(self.import_bytes(data)["pushed_blobs"], 2)
+        # Seconde cible avec les blobs déjà présents : rien n'est renvoyé, le nom peut être changé
+        report = self.import_bytes(data, model_name="qwen-ft:v3")
+
+        self.assertEqual((report["pushed_blobs"], report["skipped_blobs"], report["uploaded_bytes"]), (0, 2, 0))
+        self.assertEqual(len(self.stub.calls("POST", "/api/blobs/")), 2)
+        self.assertImported("qwen-ft:v2", manifest)
+        self.assertImported("qwen-ft:v3", manifest)
+
+    def test_skip_base_requires_blob_on_target(self):
+        manifest, data = self.export(include_base=False)
+        self.assertEqual(sorted((info["name"], info["embedded"]) for info in manifest["blobs"].values()),
+                         [("model.safetensors", False), ("qwen2.5-ft-LoRA.gguf", True)])
+
+        with self.assertRaisesRegex(Exception, "Blob\\(s\\) absent\\(s\\) de .* et non inclus dans le bundle: "
+                                               "model.safetensors"):
+            self.import_bytes(data)
+        # Vérifié avant tout envoi
+        self.assertEqual((self.stub.calls("POST", "/api/blobs/"), self.stub.models), ([], {}))
+
+        self.stub.blobs[sha256(WEIGHTS)] = len(WEIGHTS)
+        report = self.import_bytes(data)
+        self.assertEqual((report["pushed_blobs"], report["uploaded_bytes"]), (1, len(ADAPTER)))
+        self.assertImported("qwen2.5-ft", manifest)
+
+    def test_truncated_bundle(self):
+        manifest, data = self.export(level=0)
+        with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+            last = tar.getmembers()[-1]
+        last_name = manifest["blobs"][last.name[len("blobs/"):].replace("-", ":", 1)]["name"]
+
+        # Coupé entre deux membres : le dernier blob manque
+        with self.assertRaisesRegex(Exception, f"Bundle incomplet, blob\\(s\\) manquant\\(s\\): {last_name}"):
+            self.import_bytes(data[:last.offset])
+        # Coupé au milieu d'un blob, compressé ou non
+        with self.assertRaisesRegex(Exception, "Bundle tronqué ou illisible: unexpected end of data"):
+            self.import_bytes(data[:last.offset_data + last.size // 2])
+        _, compressed = self.export()
+        with self.assertRaisesRegex(Exception, "Bundle tronqué ou illisible: Compressed file ended"):
+            self.import_bytes(compressed[:len(compressed) // 2])
+
+        # Aucun modèle créé, le blob coupé n'est pas publié
+        self.assertEqual(self.stub.models, {})
+        self.assertEqual(len(self.stub.blobs), 1)
+        self.assertNotIn(last.name[len("blobs/"):].replace("-", ":", 1), self.stub.blobs)
+
+    def test_altered_blob_is_refused_before_publication(self):
+        _, data = self.export(level=0)
+        start = data.index(ADAPTER)
+        altered = data[:start + 100] + bytes([data[start + 100] ^ 0xFF]) + data[start + 101:]
+
+        with self.assertRaisesRegex(Exception, f"Bundle corrompu: empreinte invalide pour qwen2.5-ft-LoRA.gguf "
+                                               f"\\(sha256:[0-9a-f]{{64}} au lieu de {sha256(ADAPTER)}\\)"):
+            self.import_bytes(altered)
+
+        # Le serveur a reçu le blob entier et l'a refusé : rien n'est publié sous cette empreinte
+        self.assertTrue(self.stub.calls("POST", f"/api/blobs/{sha256(ADAPTER)}"))
+        self.assertNotIn(sha256(ADAPTER), self.stub.blobs)
+        self.assertEqual(self.stub.models, {})
+
+    def test_invalid_bundles(self):
+        with self.assertRaisesRegex(Exception, "Bundle vide"):
+            self.import_bytes(b"\0" * 1024)
+
+        output = io.BytesIO()
+        with tarfile.open(fileobj=output, mode="w") as tar:
+            tar.addfile(tarfile.TarInfo("Modelfile"), io.BytesIO())
+        with self.assertRaisesRegex(Exception, "manifest.json attendu en tête, trouvé 'Modelfile'"):
+            self.import_bytes(output.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+"""Déploiement multi-hôtes : blobs déjà présents, connexions bornées, nouvelles tentatives, rapports"""
+import hashlib
+import os
+import tempfile
+import unittest
+
+import Lora_to_Ollama as app
+from tests.ollama_stub import StubOllama
+
+
+def digest_of(path):
+    with open(path, "rb") as f:
+        return f"sha256:{hashlib.sha256(f.read()).hexdigest()}"
+
+
+class DeployModelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        base_dir = os.path.join(self.root, "base")
+        os.makedirs(base_dir)
+        # Quatre fichiers de poids distincts : assez pour saturer deux connexions
+        self.base_files = []
+        for index in range(4):
+            path = os.path.join(base_dir, f"model-0000{index + 1}-of-00004.safetensors")
+            with open(path, "wb") as f:
+                f.write(bytes([index]) * 4096)
+            self.base_files.append(path)
+        self.adapter = os.path.join(self.root, "tiny-LoRA.gguf")
+        with open(self.adapter, "wb") as f:
+            f.write(b"GGUF" + b"\1" * 1024)
+        self.modelfile = os.path.join(self.root, "tiny.Modelfile")
+        with open(self.modelfile, "w", encoding="utf-8") as f:
+            f.write("FROM ./base\nADAPTER ./tiny-LoRA.gguf\nPARAMETER temperature 0.2\n")
+
+    def stub(self, **options):
+        stub = StubOllama(**options).start()
+        self.addCleanup(stub.stop)
+        return stub
+
+    def deploy(self, stubs, **options):
+        logs = []
+        reports = app.deploy_model([stub.url for stub in stubs], "tiny", self.modelfile,
+                                   log=lambda message, level="info": logs.append(message), **options)
+        return {report["host"]: report for report in reports}, logs
+
+    def test_skips_blobs_the_host_already_has(self):
+        fresh, seeded = self.stub(), self.stub()
+        seeded.blobs[digest_of(self.base_files[0])] = 4096
+        seeded.blobs[digest_of(self.adapter)] = 1028
+
+        reports, _ = self.deploy([fresh, seeded])
+
+        pushed = {call[1].split("/")[-1] for call in seeded.calls("POST", "/api/blobs/")}
+        self.assertNotIn(digest_of(self.base_files[0]), pushed)
+        self.assertNotIn(digest_of(self.adapter), pushed)
+        self.assertEqual(len(pushed), 3)
+        self.assertEqual(len(fresh.calls("POST", "/api/blobs/")), 5)
+        self.assertEqual((reports[seeded.url]["pushed_blobs"], reports[seeded.url]["skipped_blobs"]), (3, 2))
+        self.assertEqual((reports[fresh.url]["pushed_blobs"], reports[fresh.url]["skipped_blobs"]), (5, 0))
+        self.assertEqual(reports[seeded.url]["uploaded_bytes"], 3 * 4096)
+        for stub in (fresh, seeded):
+            model = stub.models["tiny"]["request"]
+            self.assertEqual(set(model["files"]), {os.path.basename(path) for path in self.base_files})
+            self.assertEqual(model["adapters"], {"tiny-LoRA.gguf": digest_of(self.adapter)})
+            self.assertEqual(model["parameters"], {"temperature": 0.2})
+
+    def test_respects_max_connections_per_host(self):
+        stubs = [self.stub(blob_delay=0.2) for _ in range(2)]
+
+        self.deploy(stubs, max_connections=2)
+
+        for stub in stubs:
+            self.assertEqual(len(stub.calls("POST", "/api/blobs/")), 5)
+            self.assertEqual(stub.max_active_uploads, 2)
+
+        single = self.stub(blob_delay=0.1)
+        self.deploy([single], max_connections=1)
+        self.assertEqual(single.max_active_uploads, 1)
+
+    def test_retries_transient_server_errors(self):
+        flaky = self.stub(failures={"/api/create": [503]})
+        flaky.failures[f"POST /api/blobs/{digest_of(self.adapter)}"] = [500]
+
+        reports, logs = self.deploy([flaky])
+
+        self.assertEqual(reports[flaky.url]["status"], "ok")
+        self.assertIn("tiny", flaky.models)
+        self.assertEqual(len(flaky.calls("POST", "/api/create")), 2)
+        self.assertEqual(len(flaky.calls("POST", f"/api/blobs/{digest_of(self.adapter)}")), 2)
+        self.assertTrue(any("nouvelle tentative 2/3" in message for message in logs))
+
+    def test_reports_per_host_times_and_failures(self):
+        healthy, broken = self.stub(blob_delay=0.05), self.stub(failures={"/api/create": [500] * 3})
+
+        with self.assertRaises(Exception) as raised:
+            self.deploy([healthy, broken])
+        self.assertIn(broken.url, str(raised.exception))
+        self.assertIn("tiny", healthy.models)
+        self.assertNotIn("tiny", broken.models)
+        self.assertEqual(len(broken.calls("POST", "/api/create")), 3)
+
+        payload, uploads = app.prepare_create_request("tiny", self.modelfile)
+        report = app.deploy_to_host(broken.url, payload, uploads, retries=1, log=lambda *args: None)
+        self.assertEqual(report["status"], "ok")
+        self.assertEqual(report["skipped_blobs"], 5)
+
+        reports, logs = self.deploy([healthy, self.stub(blob_delay=0.05)])
+        for report in reports.values():
+            self.assertEqual(report["status"], "ok")
+            self.assertIsNone(report["error"])
+            self.assertGreater(report["total_time"], 0.0)
+            self.assertGreaterEqual(report["total_time"], report["upload_time"] + report["create_time"])
+            self.assertTrue(any(message.startswith(f"{report['host']}: ok") and "création" in message
+                                for message in logs))
+        self.assertEqual(reports[healthy.url]["skipped_blobs"], 5)
+        self.assertEqual(reports[healthy.url]["uploaded_bytes"], 0)
+
+    def test_cancellation_interrupts_instead_of_failing_the_host(self):
+        stub = self.stub(blob_delay=0.2)
+        logged = []
+
+        def check_cancelled():
+            # Annulé dès le premier message du déploiement
+            if logged:
+                raise app.JobCancelled("Job annulé")
+
+        with self.assertRaises(app.JobCancelled):
+            app.deploy_model([stub.url], "tiny", self.modelfile, max_connections=1, check_cancelled=check_cancelled,
+                             log=lambda *args: logged.append(args))
+        self.assertEqual(stub.calls("POST", "/api/create"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
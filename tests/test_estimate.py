@@ -0,0 +1,104 @@
+"""Estimation mémoire : cache KV par token, total poids + LoRA + KV + marge, plafond de num_ctx"""
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import Lora_to_Ollama as app
+
+MIB = 1024 ** 2
+
+# Llama 3 8B : 32 couches, 8 têtes KV (GQA) de dimension 128
+LLAMA_8B = {"layers": 32, "kv_heads": 8, "head_dim": 128, "context_length": 8192, "weight_bytes": 16 * 1024 * MIB}
+
+
+class KVCacheTest(unittest.TestCase):
+
+    def test_bytes_per_token(self):
+        # 2 (K et V) x 32 couches x 8 têtes x 128 x 2 octets
+        self.assertEqual(app.kv_cache_bytes_per_token(LLAMA_8B, "f16"), 131072)
+        self.assertEqual(app.kv_cache_bytes_per_token(LLAMA_8B, "q8_0"), 69632)
+        self.assertEqual(app.kv_cache_bytes_per_token(LLAMA_8B, "q4_0"), 36864)
+        self.assertEqual(app.kv_cache_bytes_per_token(LLAMA_8B, "f16", parallel=4), 4 * 131072)
+
+    def test_cache_type_and_parallel_from_environment(self):
+        with mock.patch.dict(os.environ, {"OLLAMA_KV_CACHE_TYPE": "Q8_0", "OLLAMA_NUM_PARALLEL": "3"}):
+            self.assertEqual((app.kv_cache_type(), app.ollama_num_parallel()), ("q8_0", 3))
+            self.assertEqual(app.kv_cache_bytes_per_token(LLAMA_8B), 69632)
+        with mock.patch.dict(os.environ, {"OLLAMA_KV_CACHE_TYPE": "q2", "OLLAMA_NUM_PARALLEL": "0"}):
+            self.assertEqual((app.kv_cache_type(), app.ollama_num_parallel()), ("f16", 1))
+
+
+class EstimateMemoryTest(unittest.TestCase):
+
+    def test_total_is_weights_adapter_kv_and_overhead(self):
+        estimate = app.estimate_memory(LLAMA_8B, 8192, adapter_bytes=160 * MIB, cache_type="f16", parallel=2)
+
+        # 8192 positions x 128 Kio x 2 requêtes parallèles = 2 Gio
+        self.assertEqual(estimate["kv_cache"], 2048 * MIB)
+        self.assertEqual(estimate["overhead"], app.RUNTIME_OVERHEAD_BYTES)
+        self.assertEqual(estimate["total"], (16 * 1024 + 160 + 2048 + 768) * MIB)
+        self.assertEqual(app.estimate_memory(dict(LLAMA_8B, weight_bytes=None), 0, cache_type="f16")["total"],
+                         app.RUNTIME_OVERHEAD_BYTES)
+
+    def test_max_num_ctx_rounds_down_and_caps(self):
+        fixed = LLAMA_8B["weight_bytes"] + app.RUNTIME_OVERHEAD_BYTES
+        # 1000 positions tiennent, arrondies au multiple de 256 inférieur
+        self.assertEqual(app.max_num_ctx(LLAMA_8B, fixed + 1000 * 131072, cache_type="f16"), 768)
+        self.assertEqual(app.max_num_ctx(LLAMA_8B, fixed + 1000 * 131072, cache_type="q4_0"), 3328)
+        # Budget très large : plafonné au contexte du modèle
+        self.assertEqual(app.max_num_ctx(LLAMA_8B, 1024 ** 4, cache_type="f16"), 8192)
+        self.assertEqual(app.max_num_ctx(dict(LLAMA_8B, context_length=None), fixed + 20000 * 131072,
+                                         cache_type="f16"), 19968)
+        self.assertEqual(app.max_num_ctx(LLAMA_8B, fixed, cache_type="f16"), 0)
+
+
+class ModelArchitectureTest(unittest.TestCase):
+
+    def setUp(self):
+        self.model_dir = tempfile.mkdtemp()
+
+    def write_config(self, config):
+        with open(os.path.join(self.model_dir, "config.json"), "w", encoding="utf-8") as f:
+            json.dump(config, f)
+
+    def test_config_and_safetensors_weights(self):
+        # Modèle multimodal : hyperparamètres du LLM dans text_config, head_dim déduit
+        self.write_config({"architectures": ["LlavaForConditionalGeneration"], "torch_dtype": "float32",
+                           "text_config": {"num_hidden_layers": 4, "hidden_size": 64, "num_attention_heads": 8,
+                                           "num_key_value_heads": 2, "max_position_embeddings": 2048}})
+        weights = np.ones((16, 8), dtype=np.float32)
+        app.write_safetensors(os.path.join(self.model_dir, "model.safetensors"),
+                              [("embed", "F32", (16, 8)), ("norm", "BF16", (8,))],
+                              [("embed", weights), ("norm", np.zeros(8, dtype=np.uint16))])
+
+        arch = app.read_model_architecture(self.model_dir)
+
+        self.assertEqual(arch["architecture"], "LlavaForConditionalGeneration")
+        self.assertEqual((arch["layers"], arch["kv_heads"], arch["head_dim"], arch["context_length"]), (4, 2, 8, 2048))
+        # F32 ramené en 16 bits à l'import : 128 x 2 + 8 x 2 octets
+        self.assertEqual(arch["weight_bytes"], 272)
+        self.assertEqual(arch["file_bytes"], os.path.getsize(os.path.join(self.model_dir, "model.safetensors")))
+        self.assertEqual(app.kv_cache_bytes_per_token(arch, "f16"), 2 * 4 * 2 * 8 * 2)
+
+    def test_weights_from_index_before_download(self):
+        self.write_config({"model_type": "llama", "num_hidden_layers": 2, "hidden_size": 32,
+                           "num_attention_heads": 4, "torch_dtype": "float32"})
+        with open(os.path.join(self.model_dir, "model.safetensors.index.json"), "w", encoding="utf-8") as f:
+            json.dump({"metadata": {"total_size": 4000}}, f)
+
+        arch = app.read_model_architecture(self.model_dir)
+        self.assertEqual((arch["architecture"], arch["kv_heads"], arch["head_dim"]), ("llama", 4, 8))
+        self.assertEqual((arch["weight_bytes"], arch["file_bytes"]), (2000, 0))
+
+    def test_missing_hyperparameters(self):
+        self.write_config({"model_type": "mystery", "hidden_size": 32})
+        with self.assertRaisesRegex(Exception, r"Hyperparamètres introuvables \(layers, kv_heads, head_dim\)"):
+            app.read_model_architecture(self.model_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+"""Vérification des GGUF produits : fichier valide, données tronquées, offsets, octets en trop, type"""
+import hashlib
+import os
+import tempfile
+import unittest
+
+import Lora_to_Ollama as app
+from tests.fixtures import write_gguf
+
+TENSORS = [("blk.0.attn_q.weight.lora_a", (4, 2)), ("blk.0.attn_q.weight.lora_b", (2, 4))]
+
+
+def quiet(*args):
+    pass
+
+
+class VerifyGGUFTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "tiny-LoRA.gguf")
+
+    def verify(self, **options):
+        return app.verify_gguf(self.path, log=quiet, **options)
+
+    def test_valid_adapter(self):
+        data_start, data_end = write_gguf(self.path, TENSORS)
+
+        summary = self.verify(checksum=True, expect_adapter=True)
+
+        self.assertEqual((summary["version"], summary["tensors"], summary["metadata"]), (3, 2, 3))
+        # Deux tenseurs F32 de 8 éléments, le second aligné sur 32 octets
+        self.assertEqual(summary["data_bytes"], 64)
+        self.assertEqual(summary["file_size"], os.path.getsize(self.path))
+        with open(self.path, "rb") as f:
+            self.assertEqual(summary["sha256"], hashlib.sha256(f.read()[data_start:data_end]).hexdigest())
+
+        info = app.read_gguf_metadata(self.path)
+        self.assertEqual(info["metadata"]["general.type"], "adapter")
+        self.assertEqual([tensor["shape"] for tensor in info["tensors"]], [[4, 2], [2, 4]])
+        self.assertEqual([tensor["offset"] for tensor in info["tensors"]], [0, 32])
+
+    def test_truncated_data_section(self):
+        write_gguf(self.path, TENSORS)
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) - 16)
+
+        with self.assertRaisesRegex(app.GGUFError, "blk.0.attn_q.weight.lora_b: données hors fichier .* tronqué"):
+            self.verify()
+
+    def test_overlapping_tensors(self):
+        write_gguf(self.path, TENSORS, offsets=[0, 0])
+        with self.assertRaisesRegex(app.GGUFError, "Tenseurs qui se chevauchent"):
+            self.verify()
+
+    def test_misaligned_offset(self):
+        write_gguf(self.path, TENSORS, offsets=[0, 36])
+        with self.assertRaisesRegex(app.GGUFError, "offset 36 non aligné sur 32"):
+            self.verify()
+
+    def test_trailing_bytes(self):
+        # Le bourrage jusqu'à l'alignement est admis, pas au-delà
+        write_gguf(self.path, [("blk.0.attn_q.weight.lora_a", (3, 1))], trailing=b"\0" * 20)
+        self.verify()
+        write_gguf(self.path, TENSORS, trailing=b"\0" * 64)
+        with self.assertRaisesRegex(app.GGUFError, "64 octets inattendus après les données"):
+            self.verify()
+
+    def test_wrong_type_when_adapter_expected(self):
+        write_gguf(self.path, TENSORS, metadata={"general.type": "model"})
+
+        self.assertEqual(self.verify()["tensors"], 2)
+        with self.assertRaisesRegex(app.GGUFError, "pas un adaptateur LoRA \\(general.type=model, adapter.type=lora\\)"):
+            self.verify(expect_adapter=True)
+
+    def test_invalid_header(self):
+        write_gguf(self.path, TENSORS)
+        with open(self.path, "r+b") as f:
+            f.write(b"GGML")
+        with self.assertRaisesRegex(app.GGUFError, "Signature invalide"):
+            self.verify()
+
+        with open(self.path, "r+b") as f:
+            f.write(b"GGUF\0\0\0\3")
+        with self.assertRaisesRegex(app.GGUFError, "big-endian"):
+            self.verify()
+
+        with open(self.path, "wb") as f:
+            f.write(b"GGUF")
+        with self.assertRaisesRegex(app.GGUFError, "trop petit"):
+            self.verify()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+"""Historique SQLite : enregistrement des étapes, percentiles, tendance hebdomadaire, exécutions lentes"""
+import os
+import re
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+
+import Lora_to_Ollama as app
+
+DAY = 86400
+
+
+def section(report, title):
+    """Lignes du tableau qui suit un titre du rapport, découpées en colonnes"""
+    lines = report.split("\n")
+    start = lines.index(title) + 1
+    rows = []
+    for line in lines[start:]:
+        if not line:
+            break
+        rows.append(re.split(r"\s{2,}", line))
+    return {row[0]: row[1:] for row in rows if not row[0].startswith("-")}
+
+
+class RunHistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.history = app.RunHistory(os.path.join(tempfile.mkdtemp(), "history.db"))
+        self.now = time.time()
+
+    def record(self, model_name, started_at, events, state="done", cache_hits=None, hf_token=""):
+        """Rejoue des événements de progression (étape, statut, décalage, écoulé, octets) dans un StageRecorder"""
+        recorder = app.StageRecorder()
+        for stage, status, offset, elapsed, completed in events:
+            recorder({"stage": stage, "status": status, "timestamp": started_at + offset, "elapsed": elapsed,
+                      "completed": completed, "total": completed, "unit": "B" if completed else ""})
+        finished_at = started_at + max(offset for _, _, offset, _, _ in events)
+        job = SimpleNamespace(spec={"model_name": model_name, "hf_token": hf_token}, state=state,
+                              error="boom" if state == "failed" else None, result=None,
+                              submitted_at=started_at - 1, started_at=started_at, finished_at=finished_at)
+        return self.history.record(job, recorder.stages, cache_hits)
+
+    def populate(self):
+        early = self.now - 10 * DAY
+        self.record("alpha", early, [("convert", "done", 10, 10, 0), ("create", "done", 14, 4, 400e6)],
+                    cache_hits={"create": False}, hf_token="hf_secret")
+        self.record("alpha", self.now - 7200, [("convert", "waiting", 0, 0, 0), ("convert", "done", 25, 20, 0),
+                                               ("create", "done", 27, 2, 100e6)], cache_hits={"create": True})
+        self.record("beta", self.now - 3600, [("convert", "done", 40, 40, 0), ("create", "failed", 41, 1, 0)],
+                    state="failed")
+
+    def test_stages_and_redaction(self):
+        self.populate()
+
+        runs = self.history.runs()
+        self.assertEqual([(run["model_name"], run["state"], run["duration"]) for run in runs],
+                         [("alpha", "done", 14), ("alpha", "done", 27), ("beta", "failed", 41)])
+        self.assertNotIn("hf_secret", runs[0]["spec"])
+        self.assertEqual(len(self.history.runs(self.now - DAY)), 2)
+        self.assertEqual(len(self.history.runs(model="bet%")), 1)
+
+        convert = [s for s in self.history.stages(model="alpha") if s["stage"] == "convert"]
+        self.assertEqual([(s["duration"], s["wait_time"]) for s in convert], [(10, 0), (20, 5)])
+        create = [s["cache_hit"] for s in self.history.stages() if s["stage"] == "create"]
+        self.assertEqual(create, [0, 1, None])
+
+    def test_report_percentiles_trend_and_slowest(self):
+        self.populate()
+
+        report = app.format_history_report(self.history, days=30)
+
+        self.assertTrue(report.startswith("Historique : 3 exécution(s) sur 30 jours — 2 réussie(s), 1 échec(s), "
+                                          "0 annulée(s)"))
+        durations = section(report, "Durées par étape (étapes réussies) :")
+        # Conversion : 10, 20, 40 s -> p50 20 s, p95 38 s ; attente 0, 5, 0 -> p95 4.5 s
+        self.assertEqual(durations["Conversion GGUF"], ["3", "20.0 s", "38.0 s", "40.0 s", "4.5 s", "—", "—"])
+        # Création : seules les étapes réussies, 500 Mo en 6 s, un cache sur deux
+        self.assertEqual(durations["Création Ollama"], ["2", "3.0 s", "3.9 s", "4.0 s", "0.0 s", "83.3 Mo/s", "50 %"])
+        self.assertLess(report.index("Conversion GGUF"), report.index("Création Ollama"))
+
+        trend = section(report, "Tendance hebdomadaire (durée médiane) :")
+        weeks = trend.pop("Étape")
+        self.assertEqual(weeks, sorted(time.strftime("%G-W%V", time.localtime(t))
+                                       for t in (self.now - 10 * DAY, self.now)))
+        self.assertEqual(trend["Conversion GGUF"], ["10.0 s", "30.0 s"])
+        self.assertEqual(trend["Création Ollama"], ["4.0 s", "2.0 s"])
+
+        slowest = section(report, "Exécutions les plus lentes :")
+        self.assertEqual(list(slowest)[1:], ["#3", "#2", "#1"])
+        self.assertEqual(slowest["#3"][1:], ["beta", "failed", "41.0 s", "Conversion GGUF (40.0 s)"])
+
+    def test_report_without_trend_or_runs(self):
+        self.assertTrue(app.format_history_report(self.history).startswith("Aucune exécution enregistrée"))
+
+        self.record("alpha", self.now - 60, [("convert", "done", 30, 30, 0)])
+        report = app.format_history_report(self.history, days=1, slowest=1)
+        self.assertNotIn("Tendance hebdomadaire", report)
+        self.assertEqual(section(report, "Durées par étape (étapes réussies) :")["Conversion GGUF"],
+                         ["1", "30.0 s", "30.0 s", "30.0 s", "0.0 s", "—", "—"])
+        self.assertIn("Aucune exécution", app.format_history_report(self.history, model="beta"))
+
+
+if __name__ == "__main__":
+    unittest.main()
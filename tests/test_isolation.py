@@ -0,0 +1,121 @@
+"""Isolation des processus enfants : validation des réglages, description, lanceur, limite mémoire explicite"""
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import Lora_to_Ollama as app
+
+GB = app.GB
+
+
+def without_cgroup():
+    return mock.patch.object(app, "systemd_scope_available", return_value=False)
+
+
+def launcher_settings(cmd):
+    """Réglages JSON passés au lanceur intermédiaire"""
+    return json.loads(cmd[cmd.index(app.ISOLATION_LAUNCHER) + 1])
+
+
+class ValidateIsolationTest(unittest.TestCase):
+
+    def test_valid_settings(self):
+        self.assertEqual(app.validate_isolation({}), [])
+        self.assertEqual(app.validate_isolation({"nice": 19, "ionice": "best-effort:7", "cpus": "0-3,6",
+                                                 "memory_limit_gb": 0.5, "memory_rlimit": True, "threads": 2}), [])
+        self.assertEqual(app.validate_isolation({"ionice": "idle", "cpus": [1, 0]}), [])
+
+    def test_errors(self):
+        cases = {
+            "Réglage d'isolation inconnu: gpu, swap": {"gpu": 0, "swap": 1},
+            "nice doit être un entier entre 0 et 19: 20": {"nice": 20},
+            "nice doit être un entier entre 0 et 19: True": {"nice": True},
+            "ionice invalide (idle, best-effort[:0-7]): best-effort:8": {"ionice": "best-effort:8"},
+            "ionice invalide (idle, best-effort[:0-7]): low": {"ionice": "low"},
+            "Liste de CPU invalide: a-b": {"cpus": "a-b"},
+            "Liste de CPU invalide: ,": {"cpus": ","},
+            "memory_limit_gb doit être un nombre positif: 0": {"memory_limit_gb": 0},
+            "threads doit être un nombre positif: 4": {"threads": "4"},
+            "memory_rlimit doit être un booléen: yes": {"memory_rlimit": "yes"}
+        }
+        for message, settings in cases.items():
+            with self.subTest(settings=settings):
+                self.assertEqual(app.validate_isolation(settings), [message])
+
+
+class ProcessIsolationTest(unittest.TestCase):
+
+    def test_describe(self):
+        with without_cgroup():
+            self.assertEqual(app.ProcessIsolation().describe(), "aucune contrainte")
+            isolation = app.ProcessIsolation({"nice": 10, "ionice": "idle", "cpus": "2-3", "memory_limit_gb": 4,
+                                              "threads": None, "memory_rlimit": True})
+            self.assertEqual(isolation.describe(), "nice 10, E/S idle, CPU 2,3, mémoire ≤ 4.0 Go (RLIMIT_AS), "
+                                                   "2 thread(s) OMP/MKL/BLAS")
+            self.assertEqual(app.ProcessIsolation({"memory_limit_gb": 1.5}).describe(),
+                             "mémoire ≤ 1.5 Go non appliquée")
+        with mock.patch.object(app, "systemd_scope_available", return_value=True):
+            self.assertEqual(app.ProcessIsolation({"memory_limit_gb": 8, "threads": 3}).describe(),
+                             "mémoire ≤ 8.0 Go (cgroup systemd), 3 thread(s) OMP/MKL/BLAS")
+
+    def test_enabled(self):
+        self.assertFalse(app.ProcessIsolation({"nice": None, "cpus": "", "memory_rlimit": True}).enabled)
+        self.assertTrue(app.ProcessIsolation({"threads": 1}).enabled)
+        cmd, env = app.ProcessIsolation({"memory_rlimit": True}).wrap(["true"], {"A": "1"})
+        self.assertEqual((cmd, env), (["true"], {"A": "1"}))
+
+    @unittest.skipIf(sys.platform == "win32", "lanceur POSIX")
+    def test_memory_limit_needs_cgroup_or_explicit_rlimit(self):
+        with without_cgroup():
+            cmd, env = app.ProcessIsolation({"memory_limit_gb": 2, "threads": 3}).wrap(["convert"], {})
+            self.assertNotIn("rlimit_as", launcher_settings(cmd))
+            self.assertEqual(env["OMP_NUM_THREADS"], "3")
+
+            cmd, _ = app.ProcessIsolation({"memory_limit_gb": 2, "memory_rlimit": True}).wrap(["convert"], {})
+            self.assertEqual(launcher_settings(cmd)["rlimit_as"], 2 * GB)
+            self.assertEqual(cmd[-1], "convert")
+
+        with mock.patch.object(app, "systemd_scope_available", return_value=True):
+            cmd, _ = app.ProcessIsolation({"memory_limit_gb": 2, "memory_rlimit": True}).wrap(["convert"], {})
+        self.assertEqual(cmd[:4], ["systemd-run", "--user", "--scope", "--quiet"])
+        self.assertIn(f"MemoryMax={2 * GB}", cmd)
+        self.assertNotIn("rlimit_as", launcher_settings(cmd))
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "nice et RLIMIT_AS relus dans /proc")
+    def test_constraints_applied_to_child(self):
+        logs = []
+        isolation = app.ProcessIsolation({"nice": 19, "cpus": [0], "memory_limit_gb": 64, "memory_rlimit": True})
+        script = "import os, resource; print(os.nice(0), os.environ['OMP_NUM_THREADS'], " \
+                 "resource.getrlimit(resource.RLIMIT_AS)[0])"
+        with without_cgroup():
+            code, output = app.run_process([sys.executable, "-c", script], isolation=isolation, name="enfant",
+                                           log=lambda message, level="info": logs.append(message))
+
+        self.assertEqual(code, 0)
+        self.assertEqual(output.strip().splitlines()[-1], f"19 1 {64 * GB}")
+        self.assertEqual(logs, [f"Isolation appliquée à enfant: nice 19, CPU 0, RLIMIT_AS 64.0 Go, "
+                                f"1 thread(s) OMP/MKL/BLAS"])
+
+    def test_pipeline_warns_when_memory_limit_is_ignored(self):
+        logs = []
+        spec = {"model_name": "tiny-ft", "output_dir": tempfile.mkdtemp(), "isolation": {"memory_limit_gb": 4}}
+        pipeline = app.ConversionPipeline(spec, log=lambda message, level="info": logs.append((level, message)))
+
+        with without_cgroup(), mock.patch.object(pipeline, "run_stages", return_value={}):
+            pipeline.run()
+            pipeline.isolation.settings["memory_rlimit"] = True
+            pipeline.run()
+
+        warnings = [message for level, message in logs if level == "warning"]
+        self.assertEqual(len(warnings), 1)
+        self.assertIn("Limite mémoire ignorée : cgroup systemd indisponible", warnings[0])
+        self.assertEqual([message for level, message in logs if level == "info"],
+                         ["Isolation des processus enfants: mémoire ≤ 4.0 Go non appliquée",
+                          "Isolation des processus enfants: mémoire ≤ 4.0 Go (RLIMIT_AS)"])
+
+
+if __name__ == "__main__":
+    unittest.main()
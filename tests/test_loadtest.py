@@ -0,0 +1,121 @@
+"""Test de charge : flux NDJSON (chunked et Content-Length), erreurs HTTP, percentiles et comparaison"""
+import asyncio
+import unittest
+
+import Lora_to_Ollama as app
+from tests.ollama_stub import StubOllama
+
+
+def quiet(*args):
+    pass
+
+
+class PercentileTest(unittest.TestCase):
+
+    def test_linear_interpolation(self):
+        values = [4.0, 1.0, 3.0, 2.0]
+        self.assertEqual(app.percentile(values, 0), 1.0)
+        self.assertEqual(app.percentile(values, 50), 2.5)
+        self.assertAlmostEqual(app.percentile(values, 95), 3.85)
+        self.assertEqual(app.percentile(values, 100), 4.0)
+        self.assertEqual(app.percentile([7.0], 99), 7.0)
+        self.assertIsNone(app.percentile([], 50))
+
+
+class LoadTestTest(unittest.TestCase):
+
+    def stub(self, **options):
+        stub = StubOllama(**options).start()
+        self.addCleanup(stub.stop)
+        stub.add_model("tiny")
+        return stub
+
+    def run_load_test(self, stub, prompts, **options):
+        options.setdefault("warmup", 0)
+        return app.run_load_test(stub.url, "tiny", prompts, log=quiet, **options)
+
+    def test_chunked_stream_measures_first_token(self):
+        stub = self.stub(first_token_delay=0.2, token_delay=0.05)
+
+        report = self.run_load_test(stub, ["one", "two"], concurrency=2, total_requests=4, warmup=1)
+
+        self.assertEqual((report["succeeded"], report["errors"], report["requests"]), (4, 0, 4))
+        self.assertEqual(len(stub.calls("POST", "/api/generate")), 5)
+        for q in app.LOAD_TEST_PERCENTILES:
+            # Premier token après first_token_delay, les deux suivants arrivent ensuite
+            self.assertGreaterEqual(report[f"ttft_p{q}"], 0.2)
+            self.assertLess(report[f"ttft_p{q}"], report[f"latency_p{q}"])
+            self.assertGreaterEqual(report[f"latency_p{q}"] - report[f"ttft_p{q}"], 0.1)
+        self.assertLessEqual(report["latency_p50"], report["latency_p95"])
+        self.assertLessEqual(report["latency_p95"], report["latency_p99"])
+        # "answer to one" : 3 tokens renvoyés + le token de fin (eval_count) par requête
+        self.assertAlmostEqual(report["tokens_per_s"], 4 * report["requests_per_s"])
+
+    def test_content_length_body_without_trailing_newline(self):
+        stub = self.stub(stream_mode="length", first_token_delay=0.1)
+
+        result = asyncio.run(app.ollama_generate_async(stub.url, "tiny", "one"))
+        # eval_count lu dans le dernier objet, même sans saut de ligne final
+        self.assertEqual(result["tokens"], 4)
+        self.assertGreaterEqual(result["ttft"], 0.1)
+
+        report = self.run_load_test(stub, ["one"], concurrency=3, total_requests=3)
+        self.assertEqual((report["succeeded"], report["errors"]), (3, 0))
+        # Corps reçu d'un bloc : premier token et fin de réponse arrivent ensemble
+        self.assertAlmostEqual(report["ttft_p50"], report["latency_p50"], delta=0.05)
+
+    def test_http_errors_are_counted(self):
+        stub = self.stub()
+
+        with self.assertRaisesRegex(Exception, "HTTP 500: .*generation failed"):
+            asyncio.run(app.ollama_generate_async(stub.url, "tiny", "fail"))
+
+        logs = []
+        report = app.run_load_test(stub.url, "tiny", ["one", "fail"], concurrency=2, total_requests=6, warmup=0,
+                                   log=lambda message, level="info": logs.append((level, message)))
+        self.assertEqual((report["succeeded"], report["errors"]), (3, 3))
+        self.assertIn(("warning", "3 requête(s) en erreur, ex: HTTP 500: {\"error\": \"generation failed\"}"), logs)
+
+        report = self.run_load_test(stub, ["fail"], total_requests=2)
+        self.assertEqual((report["succeeded"], report["errors"], report["requests_per_s"]), (0, 2, 0.0))
+        self.assertIsNone(report["latency_p50"])
+        self.assertIsNone(report["ttft_p95"])
+
+
+class FormatLoadTestTest(unittest.TestCase):
+
+    def report(self, model, scale, **overrides):
+        report = {"model": model, "requests_per_s": 2.0 / scale, "tokens_per_s": 40.0 / scale, "errors": 0}
+        for q in app.LOAD_TEST_PERCENTILES:
+            report[f"latency_p{q}"] = 1.0 * scale
+            report[f"ttft_p{q}"] = 0.25 * scale
+        report.update(overrides)
+        return report
+
+    def test_baseline_delta_columns(self):
+        table = app.format_load_test(self.report("tiny-q4", 2.0, ttft_p99=None, errors=1),
+                                     self.report("tiny-f16", 1.0))
+        rows = {line.split("  ")[0]: line.split() for line in table.splitlines()}
+
+        self.assertEqual(table.splitlines()[0].split(), ["Métrique", "tiny-q4", "tiny-f16", "Écart"])
+        self.assertTrue(set(table.splitlines()[1]) <= {"-", " "})
+        # Débit divisé par deux : moins bien ; latence doublée : moins bien
+        self.assertEqual(rows["Débit (req/s)"][-5:], ["1.000", "2.000", "-50.0", "%", "⚠️"])
+        self.assertEqual(rows["Latence p50"][-7:], ["2.000", "s", "1.000", "s", "+100.0", "%", "⚠️"])
+        self.assertEqual(rows["Premier token p99"][-4:], ["—", "0.250", "s", "—"])
+        # Référence sans erreur : pas d'écart relatif calculable
+        self.assertEqual(rows["Erreurs"][-3:], ["1", "0", "—"])
+
+        table = app.format_load_test(self.report("tiny-q4", 0.5), self.report("tiny-f16", 1.0))
+        self.assertIn("+100.0 % ✅", table)
+        self.assertIn("-50.0 % ✅", table)
+
+    def test_without_baseline(self):
+        lines = app.format_load_test(self.report("tiny", 1.0)).splitlines()
+        self.assertEqual(lines[0].split(), ["Métrique", "tiny"])
+        self.assertEqual(len(lines), 2 + len(app.LOAD_TEST_METRICS))
+        self.assertEqual(lines[-1].split(), ["Erreurs", "0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
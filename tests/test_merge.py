@@ -0,0 +1,147 @@
+"""Fusion de LoRA : delta reconstruit (concat et SVD), rank_pattern, mise à l'échelle de B, dtypes"""
+import json
+import os
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+
+import Lora_to_Ollama as app
+
+PREFIX = "base_model.model.model.layers.0.self_attn"
+# Dimensions (sortie, entrée) des modules
+MODULES = {"q_proj": (6, 8), "v_proj": (4, 8)}
+
+
+def write_adapter(directory, ranks, config, seed):
+    """Adaptateur PEFT F32 aléatoire ; ranks : {module: rang}. Retourne {module: (A, B)}"""
+    rng = np.random.default_rng(seed)
+    tensors, layout = {}, []
+    for module, rank in ranks.items():
+        out_dim, in_dim = MODULES[module]
+        a = rng.standard_normal((rank, in_dim)).astype(np.float32)
+        b = rng.standard_normal((out_dim, rank)).astype(np.float32)
+        tensors[module] = (a, b)
+        layout += [(f"{PREFIX}.{module}.lora_A.weight", "F32", a.shape),
+                   (f"{PREFIX}.{module}.lora_B.weight", "F32", b.shape)]
+    chunks = [(name, tensor) for module in ranks for name, tensor in zip(
+        (f"{PREFIX}.{module}.lora_A.weight", f"{PREFIX}.{module}.lora_B.weight"), tensors[module])]
+    os.makedirs(directory)
+    app.write_safetensors(os.path.join(directory, "adapter_model.safetensors"), layout, chunks)
+    with open(os.path.join(directory, "adapter_config.json"), "w", encoding="utf-8") as f:
+        json.dump(dict(config, peft_type="LORA", base_model_name_or_path="tiny-base"), f)
+    return tensors
+
+
+def add_raw_tensor(path, name, dtype, raw):
+    """Ajoute un tenseur brut (dtype quelconque) à la fin d'un fichier safetensors"""
+    with open(path, "rb") as f:
+        header = json.loads(f.read(struct.unpack("<Q", f.read(8))[0]))
+        data = f.read()
+    header[name] = {"dtype": dtype, "shape": [len(raw) // 8], "data_offsets": [len(data), len(data) + len(raw)]}
+    encoded = json.dumps(header).encode("utf-8")
+    encoded += b" " * (-len(encoded) % 8)
+    with open(path, "wb") as f:
+        f.write(struct.pack("<Q", len(encoded)) + encoded + data + raw)
+
+
+def merged_deltas(directory):
+    """Delta (sortie x entrée) appliqué à l'inférence par le LoRA fusionné, tel que PEFT le lit"""
+    with open(os.path.join(directory, "adapter_config.json"), encoding="utf-8") as f:
+        config = json.load(f)
+    merged = app.SafetensorsFile(os.path.join(directory, "adapter_model.safetensors"))
+    deltas = {}
+    for module in MODULES:
+        a = merged.get(f"{PREFIX}.{module}.lora_A.weight")
+        b = merged.get(f"{PREFIX}.{module}.lora_B.weight")
+        rank = config["rank_pattern"].get(f"model.layers.0.self_attn.{module}", config["r"])
+        assert (a.shape[0], b.shape[1]) == (rank, rank), (module, a.shape, b.shape, rank)
+        deltas[module] = config["lora_alpha"] / rank * (b @ a)
+    return deltas, config
+
+
+class MergeLoraAdaptersTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        # Rangs différents par module et par adaptateur : rangs de sortie 5 (q) et 7 (v)
+        self.first = write_adapter(os.path.join(self.root, "a"), {"q_proj": 2, "v_proj": 4},
+                                   {"r": 2, "lora_alpha": 4, "alpha_pattern": {"v_proj": 2}}, seed=1)
+        self.second = write_adapter(os.path.join(self.root, "b"), {"q_proj": 3, "v_proj": 3},
+                                    {"r": 3, "lora_alpha": 9, "use_rslora": True}, seed=2)
+        self.adapters = [
+            (os.path.join(self.root, name, "adapter_model.safetensors"),
+             os.path.join(self.root, name, "adapter_config.json"), weight)
+            for name, weight in (("a", 0.7), ("b", -0.4))
+        ]
+
+    def expected_deltas(self):
+        """sum(w_i * B_i A_i * alpha_i / r_i), avec alpha_pattern et rsLoRA (alpha / sqrt(r))"""
+        expected = {}
+        for module in MODULES:
+            (a1, b1), (a2, b2) = self.first[module], self.second[module]
+            alpha1 = 2 if module == "v_proj" else 4
+            expected[module] = 0.7 * (alpha1 / a1.shape[0]) * (b1 @ a1) - 0.4 * (9 / a2.shape[0] ** 0.5) * (b2 @ a2)
+        return expected
+
+    def merge(self, mode, target_rank=None, adapters=None):
+        output_dir = os.path.join(self.root, f"merged-{mode}-{target_rank}")
+        progress, logs = [], []
+        app.merge_lora_adapters(adapters or self.adapters, output_dir, mode=mode, target_rank=target_rank,
+                                log=lambda message, level="info": logs.append(message),
+                                on_progress=lambda done, total: progress.append((done, total)))
+        return output_dir, progress, logs
+
+    def test_concat_is_exact_with_rank_pattern(self):
+        output_dir, progress, _ = self.merge("concat")
+        deltas, config = merged_deltas(output_dir)
+
+        self.assertEqual((config["r"], config["lora_alpha"], config["use_rslora"]), (7, 7, False))
+        self.assertEqual(config["rank_pattern"], {"model.layers.0.self_attn.q_proj": 5})
+        self.assertEqual(config["alpha_pattern"], {})
+        self.assertEqual(progress, [(1, 2), (2, 2)])
+        for module, expected in self.expected_deltas().items():
+            np.testing.assert_allclose(deltas[module], expected, rtol=1e-5, atol=1e-5)
+
+    def test_svd_at_full_rank_reconstructs_delta(self):
+        output_dir, _, logs = self.merge("svd", target_rank=7)
+        deltas, config = merged_deltas(output_dir)
+
+        # q_proj : rang total 5 ; v_proj : rang borné par la dimension de sortie (4)
+        self.assertEqual((config["r"], config["rank_pattern"]), (5, {"model.layers.0.self_attn.v_proj": 4}))
+        self.assertIn("SVD: énergie conservée min 100.00%", logs[0])
+        for module, expected in self.expected_deltas().items():
+            np.testing.assert_allclose(deltas[module], expected, rtol=1e-4, atol=1e-4)
+
+    def test_svd_truncation_is_best_low_rank_approximation(self):
+        output_dir, _, _ = self.merge("svd", target_rank=2)
+        deltas, config = merged_deltas(output_dir)
+
+        self.assertEqual((config["r"], config["rank_pattern"]), (2, {}))
+        for module, expected in self.expected_deltas().items():
+            u, s, vt = np.linalg.svd(expected)
+            best = (u[:, :2] * s[:2]) @ vt[:2]
+            np.testing.assert_allclose(deltas[module], best, rtol=1e-4, atol=1e-4)
+
+    def test_unsupported_passthrough_dtype_fails_before_writing(self):
+        # Tenseur non-LoRA I64 (ex: compteur d'étapes) dans les deux adaptateurs
+        for safetensors_path, _, _ in self.adapters:
+            add_raw_tensor(safetensors_path, "base_model.model.lm_head.steps", "I64", b"\0" * 8)
+
+        with self.assertRaisesRegex(Exception, r"dtype non supporté pour la fusion: I64 \(base_model.model.lm_head"):
+            self.merge("concat")
+        self.assertFalse(os.path.exists(os.path.join(self.root, "merged-concat-None")))
+
+    def test_rejects_mismatched_targets(self):
+        write_adapter(os.path.join(self.root, "d"), {"q_proj": 2}, {"r": 2, "lora_alpha": 2}, seed=4)
+        adapters = [self.adapters[0], (os.path.join(self.root, "d", "adapter_model.safetensors"),
+                                       os.path.join(self.root, "d", "adapter_config.json"), 1.0)]
+        with self.assertRaisesRegex(Exception, "n'ont pas les mêmes cibles"):
+            self.merge("concat", adapters=adapters)
+        with self.assertRaisesRegex(Exception, "rang cible"):
+            self.merge("svd")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+"""Métriques Prometheus : histogrammes cumulés, échappement des labels, comptage d'un job, endpoint /metrics"""
+import os
+import tempfile
+import unittest
+import urllib.error
+import urllib.request
+from types import SimpleNamespace
+
+import Lora_to_Ollama as app
+
+P = app.METRICS_PREFIX
+
+
+def samples(text):
+    """{'nom{labels}': valeur} pour chaque échantillon du format texte"""
+    result = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            result[name] = value
+    return result
+
+
+class MetricsTest(unittest.TestCase):
+
+    def test_histogram_buckets_are_cumulative(self):
+        metrics = app.Metrics()
+        for value in (0.5, 4, 5, 45, 30000):
+            metrics.observe("stage_duration_seconds", value, stage="convert")
+
+        values = samples(metrics.render())
+        bucket = f'{P}_stage_duration_seconds_bucket{{stage="convert",le="%s"}}'
+        self.assertEqual([values[bucket % le] for le in ("1", "5", "15", "30", "60", "21600", "+Inf")],
+                         ["1", "3", "3", "3", "4", "4", "5"])
+        self.assertEqual(values[f'{P}_stage_duration_seconds_sum{{stage="convert"}}'], "30054.500")
+        self.assertEqual(values[f'{P}_stage_duration_seconds_count{{stage="convert"}}'], "5")
+        # Un bucket par borne, plus +Inf
+        self.assertEqual(sum(name.startswith(f"{P}_stage_duration_seconds_bucket") for name in values),
+                         len(app.METRICS_DURATION_BUCKETS) + 1)
+
+    def test_counters_gauges_and_label_escaping(self):
+        metrics = app.Metrics()
+        metrics.inc("runs_total", state="done")
+        metrics.inc("runs_total", 2, state="done")
+        metrics.inc("stage_failures_total", status="failed", stage='a"b\\c\nd')
+        metrics.set("queue_depth", 1.5)
+        metrics.add_collector(lambda m: m.set("jobs_running", 3))
+
+        text = metrics.render()
+        values = samples(text)
+
+        self.assertEqual(values[f'{P}_runs_total{{state="done"}}'], "3")
+        # Labels triés par nom, guillemets, antislashs et retours à la ligne échappés
+        self.assertEqual(values[f'{P}_stage_failures_total{{stage="a\\"b\\\\c\\nd",status="failed"}}'], "1")
+        self.assertEqual((values[f"{P}_queue_depth"], values[f"{P}_jobs_running"]), ("1.5", "3"))
+        self.assertIn(f"# TYPE {P}_run_duration_seconds histogram", text)
+        self.assertIn(f"# HELP {P}_runs_total Jobs terminés, par état final", text)
+        self.assertTrue(text.endswith("\n"))
+
+    def test_record_job(self):
+        output = tempfile.mkdtemp()
+        gguf = os.path.join(output, "tiny-LoRA.gguf")
+        with open(gguf, "wb") as f:
+            f.write(b"\0" * 1000)
+        job = SimpleNamespace(state="failed", started_at=100.0, finished_at=190.0,
+                              result={"lora_gguf": gguf, "modelfile": os.path.join(output, "absent")})
+        stages = {
+            "download": {"stage": "download", "status": "done", "duration": 12.0, "wait_time": 3.0,
+                         "completed": 5e6, "unit": "B"},
+            "convert": {"stage": "convert", "status": "done", "duration": 40.0, "wait_time": 0.0,
+                        "completed": 0, "unit": ""},
+            "create": {"stage": "create", "status": "failed", "duration": 1.0, "wait_time": 0.0,
+                       "completed": 0, "unit": "B"}
+        }
+
+        metrics = app.Metrics()
+        metrics.record_job(job, stages, cache_hits={"download": True, "convert": False})
+        values = samples(metrics.render())
+
+        self.assertEqual(values[f'{P}_runs_total{{state="failed"}}'], "1")
+        self.assertEqual(values[f'{P}_run_duration_seconds_bucket{{le="60"}}'], "0")
+        self.assertEqual(values[f'{P}_run_duration_seconds_bucket{{le="120"}}'], "1")
+        self.assertEqual(values[f'{P}_stage_duration_seconds_count{{stage="convert"}}'], "1")
+        self.assertNotIn(f'{P}_stage_duration_seconds_count{{stage="create"}}', values)
+        self.assertEqual(values[f'{P}_stage_failures_total{{stage="create",status="failed"}}'], "1")
+        self.assertEqual(values[f'{P}_stage_wait_seconds_sum{{stage="download"}}'], "3.000")
+        self.assertNotIn(f'{P}_stage_wait_seconds_count{{stage="convert"}}', values)
+        self.assertEqual(values[f'{P}_stage_bytes_total{{stage="download"}}'], "5000000")
+        self.assertEqual(values[f'{P}_cache_lookups_total{{result="hit",stage="download"}}'], "1")
+        self.assertEqual(values[f'{P}_cache_lookups_total{{result="miss",stage="convert"}}'], "1")
+        self.assertEqual(values[f'{P}_written_bytes_total{{artifact="lora_gguf"}}'], "1000")
+        self.assertNotIn(f'{P}_written_bytes_total{{artifact="modelfile"}}', values)
+
+    def test_file_and_http_exposition(self):
+        metrics = app.Metrics()
+        metrics.inc("runs_total", state="done")
+
+        path = os.path.join(tempfile.mkdtemp(), "textfile", "lora_to_ollama.prom")
+        metrics.write(path)
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(samples(f.read())[f'{P}_runs_total{{state="done"}}'], "1")
+        self.assertEqual(os.listdir(os.path.dirname(path)), ["lora_to_ollama.prom"])
+
+        server = app.start_metrics_server(metrics, 0)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(f"{url}/metrics") as response:
+            self.assertEqual(response.headers["Content-Type"], app.METRICS_CONTENT_TYPE)
+            self.assertIn(f'{P}_runs_total{{state="done"}} 1', response.read().decode("utf-8"))
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            urllib.request.urlopen(f"{url}/other")
+        self.assertEqual(raised.exception.code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
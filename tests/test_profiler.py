@@ -0,0 +1,92 @@
+"""Profilage d'une exécution : étapes du processus, scripts Python enfants, rapport fusionné"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+import Lora_to_Ollama as app
+
+CHILD_SCRIPT = """
+import time
+
+def child_work():
+    deadline = time.perf_counter() + 0.3
+    while time.perf_counter() < deadline:
+        pass
+
+child_work()
+"""
+
+
+def stage_work(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class RunProfilerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = os.path.join(tempfile.mkdtemp(), "profile")
+        self.logs = []
+        self.profiler = app.RunProfiler(self.directory, interval=0.005,
+                                        log=lambda message, level="info": self.logs.append(message))
+
+    def read(self, name):
+        with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+            return f.read()
+
+    def test_stage_profile_and_child_script(self):
+        with self.profiler.profile("merge"):
+            stage_work(0.2)
+        with self.profiler.profile("merge"):
+            stage_work(0.1)
+
+        script = os.path.join(os.path.dirname(self.directory), "convert_lora_to_gguf.py")
+        with open(script, "w", encoding="utf-8") as f:
+            f.write(CHILD_SCRIPT)
+        cmd = self.profiler.child_command("convert", [sys.executable, script, "--outtype", "f16"])
+        self.assertEqual(cmd[:2] + cmd[-3:], [sys.executable, "-c", script, "--outtype", "f16"])
+        env = self.profiler.child_env({"PATH": os.environ.get("PATH", "")})
+        self.assertEqual(env["PROFILE_SAMPLE_INTERVAL"], "0.005")
+        subprocess.run(cmd, env=env, check=True, timeout=60)
+
+        summary_path = self.profiler.write_report()
+
+        # Temps cumulé des deux passages dans l'étape
+        self.assertGreaterEqual(self.profiler.stage_times["merge"], 0.3)
+        collapsed = dict(line.rsplit(" ", 1) for line in self.read("profile.collapsed").splitlines())
+        # Piles de l'étape sous le bloc profilé, sans les cadres de l'appelant ni de pytest
+        merge_stacks = [stack for stack in collapsed if stack.startswith("merge;")]
+        self.assertTrue(merge_stacks)
+        self.assertEqual({stack.split(";")[1] for stack in merge_stacks},
+                         {f"stage_work_(test_profiler.py:{stage_work.__code__.co_firstlineno})"})
+        # Piles de l'enfant rattachées à l'étape qui l'a lancé, commençant au module du script
+        child_stacks = [stack for stack in collapsed
+                        if stack.startswith("convert;[enfant]_convert_lora_to_gguf.py;<module>_")]
+        self.assertTrue(any("child_work_(convert_lora_to_gguf.py:4)" in stack for stack in child_stacks))
+        self.assertTrue(all(count.isdigit() for count in collapsed.values()))
+
+        summary = self.read("profile.txt")
+        self.assertEqual(summary_path, os.path.join(self.directory, "profile.txt"))
+        self.assertIn("Fusion des LoRA", summary)
+        self.assertIn("Fonctions les plus coûteuses (cumulé, processus et enfants) :", summary)
+        self.assertIn("stage_work", summary)
+        self.assertIn("child_work", summary)
+        self.assertTrue(os.path.exists(os.path.join(self.directory, "profile.pstats")))
+
+    def test_report_without_profiled_stage(self):
+        # Enfant lancé mais jamais exécuté : aucun fichier à fusionner
+        self.profiler.child_command("convert", [sys.executable, "convert_lora_to_gguf.py"])
+
+        self.profiler.write_report()
+
+        self.assertEqual(self.read("profile.collapsed"), "")
+        self.assertEqual(self.read("profile.txt"), "Durée par étape :\n")
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "profile.pstats")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+"""Résolution hors ligne des modèles HuggingFace : révisions épinglées, manifeste, cache de vérification"""
+import hashlib
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import Lora_to_Ollama as app
+
+REPO = "org/tiny"
+COMMIT = "0123456789abcdef0123456789abcdef01234567"
+FILES = {"config.json": b'{"model_type": "llama"}', "model.safetensors": b"\0" * 4096}
+
+
+class CountingDigests(app.DigestCache):
+    """DigestCache sans persistance qui compte les fichiers réellement hachés"""
+
+    def __init__(self):
+        self.hashed = []
+
+    def digest(self, path, on_progress=None, chunk_size=0):
+        self.hashed.append(os.path.basename(path))
+        with open(path, "rb") as f:
+            return f"sha256:{hashlib.sha256(f.read()).hexdigest()}"
+
+
+class OfflineResolutionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.hub = tempfile.mkdtemp()
+        patcher = mock.patch.dict(os.environ, {"HF_HUB_CACHE": self.hub})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        os.environ.pop("HF_HUB_OFFLINE", None)
+        self.cache = app.ResolutionCache(os.path.join(self.hub, "resolutions.json"))
+        self.logs = []
+
+    def log(self, message, level="info"):
+        self.logs.append((level, message))
+
+    def write_snapshot(self, files=FILES):
+        """Cache HF réel : blobs nommés par leur sha256, liens depuis snapshots/<commit>, refs/main"""
+        repo_dir = app.hf_repo_cache_dir(REPO)
+        snapshot = os.path.join(repo_dir, "snapshots", COMMIT)
+        os.makedirs(os.path.join(repo_dir, "blobs"), exist_ok=True)
+        os.makedirs(os.path.join(repo_dir, "refs"), exist_ok=True)
+        os.makedirs(snapshot, exist_ok=True)
+        manifest = {}
+        for name, data in files.items():
+            sha256 = hashlib.sha256(data).hexdigest()
+            with open(os.path.join(repo_dir, "blobs", sha256), "wb") as f:
+                f.write(data)
+            os.symlink(os.path.join("..", "..", "blobs", sha256), os.path.join(snapshot, name))
+            manifest[name] = {"size": len(data), "sha256": sha256}
+        with open(os.path.join(repo_dir, "refs", "main"), "w") as f:
+            f.write(COMMIT)
+        return snapshot, manifest
+
+    def test_local_commit_from_refs(self):
+        self.assertIsNone(app.hf_local_commit(REPO))
+        self.write_snapshot()
+        self.assertEqual(app.hf_local_commit(REPO), COMMIT)
+        self.assertEqual(app.hf_local_commit(REPO, "main"), COMMIT)
+        self.assertEqual(app.hf_local_commit("org/other", COMMIT), COMMIT)
+        self.assertIsNone(app.hf_local_commit(REPO, "dev"))
+
+    def test_recorded_manifest_resolves_without_rehashing(self):
+        snapshot, manifest = self.write_snapshot()
+        self.cache.record(REPO, COMMIT, manifest, {}, True)
+
+        digests = CountingDigests()
+        with mock.patch.object(app, "DigestCache", lambda: digests):
+            self.assertEqual(app.resolve_local_snapshot(REPO, COMMIT, cache=self.cache, log=self.log), snapshot)
+            self.assertEqual(sorted(digests.hashed), ["config.json", "model.safetensors"])
+            # Seconde résolution : fichiers inchangés (taille, date), aucun re-hachage
+            self.assertEqual(app.resolve_local_snapshot(REPO, COMMIT, cache=self.cache, log=self.log), snapshot)
+        self.assertEqual(len(digests.hashed), 2)
+        self.assertTrue(self.cache.lookup(REPO, COMMIT)["complete"])
+
+    def test_missing_or_corrupt_file_is_rejected(self):
+        snapshot, manifest = self.write_snapshot()
+        manifest["tokenizer.json"] = {"size": 10, "sha256": "0" * 64}
+        problems, verified = app.verify_hf_snapshot(snapshot, manifest, digests=CountingDigests())
+        self.assertEqual(problems, ["tokenizer.json: absent"])
+        self.assertEqual(set(verified), {"config.json", "model.safetensors"})
+
+        del manifest["tokenizer.json"]
+        manifest["config.json"]["sha256"] = "f" * 64
+        self.cache.record(REPO, COMMIT, manifest, {}, True)
+        self.assertIsNone(app.resolve_local_snapshot(REPO, COMMIT, cache=self.cache, log=self.log))
+        self.assertIn(("warning", "Snapshot local incomplet ou corrompu (1 problème(s)), ex: config.json: "
+                                  "empreinte invalide"), self.logs)
+
+    def test_snapshot_without_manifest_only_accepted_offline(self):
+        snapshot, manifest = self.write_snapshot()
+
+        self.assertIsNone(app.resolve_local_snapshot(REPO, COMMIT, cache=self.cache, log=self.log))
+        self.assertEqual(app.resolve_local_snapshot(REPO, COMMIT, offline=True, cache=self.cache, log=self.log),
+                         snapshot)
+        entry = self.cache.lookup(REPO, COMMIT)
+        self.assertEqual((entry["files"], entry["complete"]), (manifest, False))
+
+    def test_offline_cache_miss_fails_without_network(self):
+        root = tempfile.mkdtemp()
+        pipeline = app.ConversionPipeline(
+            {"model_source": "huggingface", "hf_repo": REPO, "hf_revision": COMMIT, "offline": True,
+             "model_name": "tiny-ft", "ollama_host": "http://127.0.0.1:9", "output_dir": root},
+            log=self.log
+        )
+        # Aucun import de huggingface_hub (donc aucun accès réseau) ne doit être tenté
+        with mock.patch.dict("sys.modules", {"huggingface_hub": None}), \
+                self.assertRaisesRegex(Exception, f"{REPO}@{COMMIT} absent ou incomplet dans le cache local "
+                                                  f"\\({self.hub}\\) et mode hors ligne activé"):
+            pipeline.download_base_model()
+
+        # Même échec via HF_HUB_OFFLINE, sans commit épinglé ni refs/main
+        pipeline.spec.update(offline=False, hf_revision="")
+        with mock.patch.dict(os.environ, {"HF_HUB_OFFLINE": "1"}), \
+                self.assertRaisesRegex(Exception, f"{REPO}@main absent ou incomplet"):
+            pipeline.download_base_model()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+"""Mode serveur : soumission, flux d'événements, artefacts, annulation, déduplication et entrées invalides"""
+import http.client
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+import urllib.parse
+
+import Lora_to_Ollama as app
+from tests.fixtures import job_spec
+from tests.ollama_stub import StubOllama
+
+
+class ConversionServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.ollama = StubOllama().start()
+        self.addCleanup(self.ollama.stop)
+        self.server = app.ConversionServer(("127.0.0.1", 0), app.JobQueue(app.ResourceScheduler()))
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.addCleanup(self.server.queue.cancel_all)
+
+    def request(self, method, path, body=None):
+        """Retourne (statut, corps brut) ; body : objet JSON ou octets envoyés tels quels"""
+        host, port = self.server.server_address[:2]
+        conn = http.client.HTTPConnection(host, port, timeout=60)
+        try:
+            if body is not None and not isinstance(body, bytes):
+                body = json.dumps(body).encode("utf-8")
+            conn.request(method, path, body=body)
+            response = conn.getresponse()
+            return response.status, response.read()
+        finally:
+            conn.close()
+
+    def request_json(self, method, path, body=None):
+        status, data = self.request(method, path, body)
+        return status, json.loads(data)
+
+    def wait_state(self, job_id, states, timeout=60):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            _, job = self.request_json("GET", f"/jobs/{job_id}")
+            if job["state"] in states:
+                return job
+            if job["state"] in ("done", "failed", "cancelled"):
+                self.fail(f"job {job_id} terminé en {job['state']}: {job.get('error')}")
+            time.sleep(0.05)
+        self.fail(f"job {job_id} toujours {job['state']} après {timeout} s")
+
+    def slow_spec(self, model_name, seconds):
+        spec = job_spec(self.root, self.ollama.url, model_name)
+        with open(os.path.join(self.root, "lora", "delay"), "w") as f:
+            f.write(str(seconds))
+        return spec
+
+    def test_submit_streams_events_and_serves_artifacts(self):
+        status, job = self.request_json("POST", "/jobs", job_spec(self.root, self.ollama.url))
+        self.assertEqual(status, 201)
+        self.assertFalse(job["deduplicated"])
+
+        # Le flux se termine avec le job : tous les événements, numérotés dans l'ordre
+        status, body = self.request("GET", f"/jobs/{job['id']}/events")
+        self.assertEqual(status, 200)
+        events = [json.loads(line) for line in body.decode("utf-8").splitlines()]
+        self.assertEqual([event["seq"] for event in events], list(range(len(events))))
+        states = [event["state"] for event in events if event["event"] == "state"]
+        self.assertEqual(states[-1], "done", [e for e in events if e["event"] == "log"][-5:])
+        self.assertIn("running", states)
+        stages = {event["stage"] for event in events if event["event"] == "progress"}
+        self.assertTrue({"convert", "verify", "modelfile", "create"} <= stages)
+        self.assertIn("tiny-ft", self.ollama.models)
+
+        # Reprise du flux après un numéro donné
+        status, body = self.request("GET", f"/jobs/{job['id']}/events?since={len(events) - 1}")
+        self.assertEqual([json.loads(line)["seq"] for line in body.decode().splitlines()], [len(events) - 1])
+
+        status, artifacts = self.request_json("GET", f"/jobs/{job['id']}/artifacts")
+        self.assertEqual(status, 200)
+        self.assertEqual(set(artifacts), {"tiny-ft-LoRA.gguf", "tiny-ft.Modelfile"})
+        status, modelfile = self.request("GET", f"/jobs/{job['id']}/artifacts/tiny-ft.Modelfile")
+        self.assertEqual(status, 200)
+        with open(os.path.join(self.root, "out", "tiny-ft.Modelfile"), "rb") as f:
+            self.assertEqual(modelfile, f.read())
+        self.assertEqual(self.request("GET", f"/jobs/{job['id']}/artifacts/../../etc/passwd")[0], 404)
+
+        status, logs = self.request("GET", f"/jobs/{job['id']}/logs")
+        self.assertIn("créé et vérifié", logs.decode("utf-8"))
+
+    def test_cancel_running_job(self):
+        status, job = self.request_json("POST", "/jobs", self.slow_spec("slow-ft", 30))
+        self.assertEqual(status, 201)
+        self.wait_state(job["id"], ("running",))
+        time.sleep(0.5)
+
+        status, _ = self.request_json("POST", f"/jobs/{job['id']}/cancel")
+        self.assertEqual(status, 202)
+        start = time.time()
+        self.assertEqual(self.wait_state(job["id"], ("done", "failed", "cancelled"))["state"], "cancelled")
+        self.assertLess(time.time() - start, 15)
+        self.assertNotIn("slow-ft", self.ollama.models)
+        self.assertEqual(self.request_json("DELETE", "/jobs/999")[0], 404)
+
+    def test_identical_submission_reuses_only_unfinished_job(self):
+        spec = self.slow_spec("dedupe-ft", 1.5)
+        status, first = self.request_json("POST", "/jobs", spec)
+        self.assertEqual(status, 201)
+        status, second = self.request_json("POST", "/jobs", spec)
+        self.assertEqual(status, 200)
+        self.assertTrue(second["deduplicated"])
+        self.assertEqual(second["id"], first["id"])
+
+        self.wait_state(first["id"], ("done",))
+        # Terminé : l'adaptateur a pu être ré-entraîné sur place, on reconvertit
+        status, third = self.request_json("POST", "/jobs", spec)
+        self.assertEqual(status, 201)
+        self.assertNotEqual(third["id"], first["id"])
+
+    def test_malformed_requests_get_400(self):
+        cases = [b'"ab"', b"[1, 2]", b"{not json", json.dumps({"stage_timeouts": "x"}).encode(),
+                 json.dumps({"isolation": [1]}).encode(), json.dumps({"extra_adapters": [5]}).encode()]
+        for body in cases:
+            with self.subTest(body=body):
+                status, data = self.request_json("POST", "/jobs", body)
+                self.assertEqual(status, 400)
+                self.assertIn("error", data)
+
+        status, data = self.request_json("POST", "/jobs", json.dumps({"stage_timeouts": "x"}).encode())
+        self.assertIn("stage_timeouts doit être un objet JSON {étape: secondes}", data["details"])
+
+        status, job = self.request_json("POST", "/jobs", job_spec(self.root, self.ollama.url))
+        self.assertEqual(status, 201)
+        for since in ("abc", "-1", urllib.parse.quote("1 OR 1")):
+            with self.subTest(since=since):
+                self.assertEqual(self.request_json("GET", f"/jobs/{job['id']}/events?since={since}")[0], 400)
+        self.assertEqual(self.request_json("GET", "/jobs/abc")[0], 404)
+        self.assertEqual(self.request_json("GET", "/nope")[0], 404)
+        self.wait_state(job["id"], ("done",))
+
+
+class JobRetentionTest(unittest.TestCase):
+
+    def test_keeps_last_finished_jobs_without_progress_events(self):
+        root = tempfile.mkdtemp()
+        with StubOllama() as ollama:
+            queue = app.JobQueue(app.ResourceScheduler(), keep_finished=2)
+            done = queue.submit(job_spec(root, ollama.url, "kept-ft"))
+            self.assertTrue(queue.wait_all(timeout=60))
+            self.assertEqual(done.state, "done", done.error)
+            events = [event for _, event in done.events_since(0)]
+            self.assertNotIn("progress", {event["event"] for event in events})
+            self.assertIn("créé et vérifié", " ".join(e["message"] for e in events if e["event"] == "log"))
+            self.assertEqual(events[-1]["state"], "done")
+
+            # Modèle de base introuvable : échec immédiat
+            failed = [queue.submit(job_spec(root, ollama.url, f"bad-{n}", local_model="/nonexistent.gguf"))
+                      for n in range(3)]
+            self.assertTrue(queue.wait_all(timeout=60))
+
+        self.assertEqual([job.id for job in queue.jobs()], [job.id for job in failed[1:]])
+        self.assertIsNone(queue.get(done.id))
+        self.assertEqual({job.state for job in failed}, {"failed"})
+
+        unbounded = app.JobQueue(app.ResourceScheduler())
+        for n in range(3):
+            unbounded.submit(job_spec(root, "http://127.0.0.1:9", f"bad-{n}", local_model="/nonexistent.gguf"))
+        self.assertTrue(unbounded.wait_all(timeout=60))
+        self.assertEqual(len(unbounded.jobs()), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
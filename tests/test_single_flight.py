@@ -0,0 +1,177 @@
+"""Production unique des ressources partagées : verrou fichier inter-processus, verrou abandonné, clone de llama.cpp"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import Lora_to_Ollama as app
+
+KEY = ("base_model", "org/tiny", "main")
+
+
+class Recorder:
+    """Journal partagé par plusieurs threads"""
+
+    def __init__(self):
+        self.messages = []
+
+    def __call__(self, message, level="info"):
+        self.messages.append((level, message))
+
+
+class FileSingleFlightTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.log = Recorder()
+        self.calls = []
+
+    def flight(self, **options):
+        # Une instance par « processus » : seul le dossier de verrous est partagé
+        return app.FileSingleFlight(self.directory, poll_interval=0.02, **options)
+
+    def producer(self, result, delay=0.3):
+        def produce():
+            self.calls.append(threading.get_ident())
+            time.sleep(delay)
+            return result
+        return produce
+
+    def run_concurrently(self, first, second):
+        """Lance first, puis second une fois le verrou pris ; retourne les deux résultats"""
+        results = {}
+        leader = threading.Thread(target=lambda: results.setdefault("leader", first()))
+        leader.start()
+        lock_path = self.flight().paths(KEY)[0]
+        while not lock_path.exists():
+            time.sleep(0.01)
+        results["waiter"] = second()
+        leader.join()
+        return results
+
+    def test_waiter_reuses_published_result(self):
+        waits = []
+        results = self.run_concurrently(
+            lambda: self.flight().do(KEY, self.producer("/store/tiny"), log=self.log),
+            lambda: self.flight().do(KEY, self.producer("/store/other"), on_wait=waits.append, log=self.log)
+        )
+
+        self.assertEqual(results, {"leader": "/store/tiny", "waiter": "/store/tiny"})
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(waits[0]["pid"], os.getpid())
+        self.assertIn(("success", f"Ressource produite par un autre processus (pid {os.getpid()}), réutilisée"),
+                      self.log.messages)
+        # Verrou libéré, résultat publié pour les suivants
+        lock_path, result_path = self.flight().paths(KEY)
+        self.assertFalse(lock_path.exists())
+        self.assertEqual(app.FileSingleFlight.read_json(result_path)["result"], "/store/tiny")
+
+    def test_waiter_retries_when_result_is_invalid(self):
+        results = self.run_concurrently(
+            lambda: self.flight().do(KEY, self.producer("partial"), log=self.log),
+            lambda: self.flight().do(KEY, self.producer("complete", delay=0), is_valid=lambda r: r == "complete",
+                                     log=self.log)
+        )
+
+        self.assertEqual(results, {"leader": "partial", "waiter": "complete"})
+        self.assertEqual(len(self.calls), 2)
+        self.assertFalse(any("réutilisée" in message for _, message in self.log.messages))
+
+    def test_result_published_before_waiting_is_not_reused(self):
+        # Un appel isolé produit toujours : seul un résultat publié pendant l'attente est repris
+        self.assertEqual(self.flight().do(KEY, self.producer("first", delay=0), log=self.log), "first")
+        self.assertEqual(self.flight().do(KEY, self.producer("second", delay=0), log=self.log), "second")
+        self.assertEqual(len(self.calls), 2)
+
+    def test_lock_of_dead_process_is_broken(self):
+        child = subprocess.Popen([sys.executable, "-c", "pass"])
+        child.wait()
+        lock_path, _ = self.flight().paths(KEY)
+        os.makedirs(lock_path.parent, exist_ok=True)
+        with open(lock_path, "w", encoding="utf-8") as f:
+            json.dump({"pid": child.pid, "host": platform.node(), "token": "dead", "since": time.time()}, f)
+
+        started = time.time()
+        self.assertEqual(self.flight().do(KEY, self.producer("fresh", delay=0), log=self.log), "fresh")
+
+        self.assertLess(time.time() - started, 5)
+        self.assertEqual(self.log.messages[0], ("warning", f"Verrou abandonné récupéré (pid {child.pid} sur "
+                                                           f"{platform.node()})"))
+        self.assertEqual(os.listdir(lock_path.parent), [self.flight().paths(KEY)[1].name])
+
+    def test_silent_lock_of_other_host_expires(self):
+        lock_path, _ = self.flight().paths(KEY)
+        os.makedirs(lock_path.parent, exist_ok=True)
+        with open(lock_path, "w", encoding="utf-8") as f:
+            json.dump({"pid": 1, "host": "other-host", "token": "remote"}, f)
+        flight = self.flight(stale_after=0.2)
+
+        self.assertFalse(flight.is_stale(lock_path, flight.read_json(lock_path)))
+        self.assertEqual(flight.do(KEY, self.producer("fresh", delay=0), log=self.log), "fresh")
+        self.assertIn("Verrou abandonné récupéré (pid 1 sur other-host)", self.log.messages[0][1])
+
+
+class PrepareLlamaCppTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = tempfile.mkdtemp()
+        self.clones = []
+        for patcher in (mock.patch.object(app.os, "getcwd", return_value=self.cwd),
+                        mock.patch.object(app, "run_process", self.fake_clone)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def fake_clone(self, cmd, **kwargs):
+        """git clone lent : le script de conversion n'apparaît qu'à la fin"""
+        path = cmd[-1]
+        self.clones.append(path)
+        os.makedirs(path)
+        time.sleep(0.3)
+        with open(os.path.join(path, "convert_lora_to_gguf.py"), "w", encoding="utf-8") as f:
+            f.write("")
+        return 0, ""
+
+    def pipeline(self):
+        return app.ConversionPipeline({"model_name": "tiny-ft", "output_dir": self.cwd}, log=Recorder())
+
+    def test_concurrent_jobs_clone_once(self):
+        pipelines = [self.pipeline() for _ in range(3)]
+        results = [None] * len(pipelines)
+        threads = [threading.Thread(target=lambda i=i: results.__setitem__(i, pipelines[i].prepare_llama_cpp()))
+                   for i in range(len(pipelines))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        path = os.path.join(self.cwd, "llama.cpp")
+        self.assertEqual(results, [path] * 3)
+        self.assertEqual(self.clones, [path])
+        self.assertTrue(os.path.exists(os.path.join(path, app.LLAMA_CPP_CLONE_MARKER)))
+        self.assertEqual(sorted(p.cache_hits["llama_cpp"] for p in pipelines), [False, True, True])
+
+        # Job suivant : clone complet réutilisé sans relancer git
+        later = self.pipeline()
+        self.assertEqual(later.prepare_llama_cpp(), path)
+        self.assertEqual((len(self.clones), later.cache_hits["llama_cpp"]), (1, True))
+
+    def test_interrupted_clone_is_restarted(self):
+        path = os.path.join(self.cwd, "llama.cpp")
+        os.makedirs(os.path.join(path, ".git"))
+
+        pipeline = self.pipeline()
+        self.assertEqual(pipeline.prepare_llama_cpp(), path)
+
+        self.assertEqual(self.clones, [path])
+        self.assertFalse(os.path.exists(os.path.join(path, ".git")))
+        self.assertIn(("warning", f"Clone de llama.cpp incomplet, suppression: {path}"), pipeline.log.messages)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""Store partagé : reflink, hardlink, symlink puis copie, selon ce que le système de fichiers accepte"""
+import errno
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import Lora_to_Ollama as app
+
+
+def refuse(code):
+    def fail(*args, **kwargs):
+        raise OSError(code, os.strerror(code))
+    return fail
+
+
+class MaterializeFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.src = os.path.join(self.root, "model.gguf")
+        with open(self.src, "wb") as f:
+            f.write(b"GGUF" + bytes(range(256)) * 16)
+        self.dst = os.path.join(self.root, "store", "model.gguf")
+        os.makedirs(os.path.dirname(self.dst))
+
+    def assertSameContent(self, path):
+        with open(self.src, "rb") as expected, open(path, "rb") as actual:
+            self.assertEqual(actual.read(), expected.read())
+
+    def test_reflink_when_supported(self):
+        with mock.patch.object(app, "_reflink", side_effect=lambda src, dst: open(dst, "wb").close()) as reflink:
+            self.assertEqual(app.materialize_file(self.src, self.dst), "reflink")
+        reflink.assert_called_once()
+        self.assertTrue(os.path.exists(self.dst))
+
+    def test_hardlink_when_reflink_unsupported(self):
+        with mock.patch.object(app, "_reflink", refuse(errno.EOPNOTSUPP)):
+            self.assertEqual(app.materialize_file(self.src, self.dst), "hardlink")
+        self.assertTrue(os.path.samefile(self.src, self.dst))
+
+    def test_symlink_across_devices(self):
+        with mock.patch.object(app, "_reflink", refuse(errno.EXDEV)), \
+                mock.patch.object(app.os, "link", refuse(errno.EXDEV)):
+            self.assertEqual(app.materialize_file(self.src, self.dst), "symlink")
+        self.assertEqual(os.readlink(self.dst), os.path.realpath(self.src))
+        self.assertSameContent(self.dst)
+
+    def test_copy_as_last_resort(self):
+        with mock.patch.object(app, "_reflink", refuse(errno.EXDEV)), \
+                mock.patch.object(app.os, "link", refuse(errno.EXDEV)), \
+                mock.patch.object(app.os, "symlink", refuse(errno.EPERM)):
+            self.assertEqual(app.materialize_file(self.src, self.dst), "copy")
+        self.assertFalse(os.path.islink(self.dst))
+        self.assertFalse(os.path.samefile(self.src, self.dst))
+        self.assertSameContent(self.dst)
+
+    def test_strategy_list_and_failure(self):
+        # Seules les stratégies demandées sont essayées ; un fichier existant est remplacé
+        with open(self.dst, "wb") as f:
+            f.write(b"old")
+        with mock.patch.object(app.os, "link", refuse(errno.EXDEV)):
+            self.assertEqual(app.materialize_file(self.src, self.dst, ["hardlink", "copy"]), "copy")
+        self.assertSameContent(self.dst)
+
+        with mock.patch.object(app.os, "link", refuse(errno.EXDEV)), \
+                self.assertRaisesRegex(Exception, "Impossible de matérialiser"):
+            app.materialize_file(self.src, self.dst, ["hardlink"])
+        self.assertEqual(os.listdir(os.path.dirname(self.dst)), ["model.gguf"])
+
+    def test_stale_temporary_file_is_replaced(self):
+        with open(f"{self.dst}.tmp-{os.getpid()}", "wb") as f:
+            f.write(b"interrupted")
+        self.assertEqual(app.materialize_file(self.src, self.dst, ["copy"]), "copy")
+        self.assertSameContent(self.dst)
+        self.assertEqual(os.listdir(os.path.dirname(self.dst)), ["model.gguf"])
+
+    def test_reflink_unavailable_on_windows(self):
+        with mock.patch.object(app.sys, "platform", "win32"), mock.patch.object(app.os, "name", "nt"), \
+                self.assertRaises(OSError) as raised:
+            app._reflink(self.src, self.dst)
+        self.assertEqual(raised.exception.errno, errno.EOPNOTSUPP)
+        self.assertFalse(os.path.exists(self.dst))
+
+
+class MaterializeTreeTest(unittest.TestCase):
+
+    def test_reuses_present_files_and_counts_copies(self):
+        root = tempfile.mkdtemp()
+        src, dst = os.path.join(root, "snapshot"), os.path.join(root, "store")
+        for name, size in (("config.json", 10), ("weights/model.safetensors", 4096), (".cache/lock", 1)):
+            os.makedirs(os.path.dirname(os.path.join(src, name)), exist_ok=True)
+            with open(os.path.join(src, name), "wb") as f:
+                f.write(b"x" * size)
+        os.makedirs(dst)
+        with open(os.path.join(dst, "config.json"), "wb") as f:
+            f.write(b"y" * 10)
+
+        with mock.patch.object(app, "_reflink", refuse(errno.EOPNOTSUPP)), \
+                mock.patch.object(app.os, "link", refuse(errno.EXDEV)), \
+                mock.patch.object(app.os, "symlink", refuse(errno.EPERM)):
+            stats = app.materialize_tree(src, dst, log=lambda *args: None)
+
+        self.assertEqual((stats["files"], stats["bytes"], stats["reused"]), (2, 4106, 1))
+        self.assertEqual((stats["strategies"], stats["copied_bytes"]), ({"copy": 1}, 4096))
+        self.assertFalse(os.path.exists(os.path.join(dst, ".cache")))
+        self.assertEqual(os.path.getsize(os.path.join(dst, "weights", "model.safetensors")), 4096)
+
+
+if __name__ == "__main__":
+    unittest.main()
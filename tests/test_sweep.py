@@ -0,0 +1,107 @@
+"""Balayage de quantifications : requêtes de création, variante de référence, accord des réponses, échecs"""
+import os
+import tempfile
+import unittest
+
+import Lora_to_Ollama as app
+from tests.ollama_stub import StubOllama
+
+REFERENCE_ANSWER = "the cat sat on the mat"
+
+
+def respond(model, prompt):
+    # q4 s'écarte de la référence sur le premier prompt seulement
+    if model.endswith(("q4_K_M", "q4_0")) and prompt == "p1":
+        return "the cat sat on a mat"
+    return REFERENCE_ANSWER
+
+
+class QuantSweepTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.root, "base"))
+        with open(os.path.join(self.root, "base", "model.safetensors"), "wb") as f:
+            f.write(b"\0" * 8192)
+        with open(os.path.join(self.root, "tiny-LoRA.gguf"), "wb") as f:
+            f.write(b"GGUF" + b"\1" * 512)
+        self.modelfile = os.path.join(self.root, "tiny.Modelfile")
+        with open(self.modelfile, "w", encoding="utf-8") as f:
+            f.write("FROM ./base\nADAPTER ./tiny-LoRA.gguf\n")
+
+    def sweep(self, quants, create_error=None):
+        stub = StubOllama(respond=respond, create_error=create_error).start()
+        self.addCleanup(stub.stop)
+        results = app.run_quant_sweep(stub.url, "tiny", self.modelfile, ["p1", "p2"], quants=quants,
+                                      log=lambda *args: None)
+        return stub, {result["quant"]: result for result in results}
+
+    def test_one_create_per_variant_and_agreement_with_reference(self):
+        stub, results = self.sweep(["Q4_K_M", "f16", "q8_0", "q4_k_m"])
+
+        creates = {call[2]["model"]: call[2] for call in stub.calls("POST", "/api/create")}
+        self.assertEqual(len(stub.calls("POST", "/api/create")), 3)
+        self.assertEqual(set(creates), {"tiny:f16", "tiny:q8_0", "tiny:q4_K_M"})
+        self.assertNotIn("quantize", creates["tiny:f16"])
+        self.assertEqual(creates["tiny:q8_0"]["quantize"], "q8_0")
+        self.assertEqual(creates["tiny:q4_K_M"]["quantize"], "q4_K_M")
+        # Blobs envoyés une seule fois pour toutes les variantes
+        self.assertEqual(len(stub.calls("POST", "/api/blobs/")), 2)
+
+        self.assertEqual(list(results), ["f16", "q8_0", "q4_K_M"])
+        for result in results.values():
+            self.assertEqual(result["reference"], "f16")
+            self.assertIsNone(result["error"])
+            self.assertEqual(result["size"], 8192 + 516)
+            self.assertEqual(result["load_time"], 0.005)
+            self.assertAlmostEqual(result["tokens_per_s"], 100.0)
+        self.assertEqual((results["f16"]["agreement"], results["f16"]["identical"]), (1.0, 2))
+        self.assertEqual((results["q8_0"]["agreement"], results["q8_0"]["identical"]), (1.0, 2))
+        # 5 mots communs sur 6 + 6 : 10/12 pour p1, identique pour p2
+        self.assertAlmostEqual(results["q4_K_M"]["agreement"], (10 / 12 + 1.0) / 2)
+        self.assertEqual(results["q4_K_M"]["identical"], 1)
+
+        # Génération déterministe, puis déchargement de chaque variante
+        generations = stub.calls("POST", "/api/generate")
+        self.assertTrue(all(call[2]["options"] == app.SWEEP_OPTIONS for call in generations if "prompt" in call[2]))
+        self.assertEqual(sorted(call[2]["model"] for call in generations if "prompt" not in call[2]),
+                         ["tiny:f16", "tiny:q4_K_M", "tiny:q8_0"])
+
+        table = app.format_quant_sweep(list(results.values()))
+        self.assertIn("Accord / f16", table)
+        self.assertIn("91.7 %", table)
+        self.assertIn("1/2", table)
+
+    def test_failed_variant_becomes_an_error_row(self):
+        def create_error(payload):
+            return "quantization failed" if payload.get("quantize") == "q8_0" else None
+
+        stub, results = self.sweep(["q8_0", "q4_0", "q4_K_M"], create_error)
+
+        self.assertEqual(results["q8_0"]["error"], "Erreur API Ollama /api/create (500): "
+                                                    '{"error": "quantization failed"}')
+        self.assertIsNone(results["q8_0"]["agreement"])
+        self.assertNotIn("tiny:q8_0", stub.models)
+        # La plus précise des variantes réussies devient la référence
+        self.assertEqual({result["reference"] for result in results.values()}, {"q4_K_M"})
+        self.assertEqual((results["q4_K_M"]["agreement"], results["q4_K_M"]["identical"]), (1.0, 2))
+        self.assertEqual((results["q4_0"]["agreement"], results["q4_0"]["identical"]), (1.0, 2))
+        self.assertIn("erreur: Erreur API Ollama /api/create (500)", app.format_quant_sweep(list(results.values())))
+
+        with self.assertRaisesRegex(Exception, "Aucune variante"):
+            self.sweep(["q8_0"], create_error)
+
+    def test_rejects_several_unquantized_variants(self):
+        stub = StubOllama().start()
+        self.addCleanup(stub.stop)
+        for quants in (["f16", "F32"], ["bf16", "q4_0", "f16"]):
+            with self.subTest(quants=quants), self.assertRaisesRegex(Exception, "Une seule variante non quantifiée"):
+                app.run_quant_sweep(stub.url, "tiny", self.modelfile, ["p1"], quants=quants, log=lambda *args: None)
+        self.assertEqual(stub.calls("POST", "/api/blobs/") + stub.calls("POST", "/api/create"), [])
+
+        with self.assertRaisesRegex(Exception, "Quantification inconnue: q3"):
+            app.run_quant_sweep(stub.url, "tiny", self.modelfile, ["p1"], quants=["q3"])
+
+
+if __name__ == "__main__":
+    unittest.main()